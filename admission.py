@@ -0,0 +1,243 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+
+# Lower numbers are served first when requests are waiting for a slot
+INTERACTIVE = 0
+BATCH = 1
+
+
+class LLMOverloaded(Exception):
+    """Raised when admission control turns a request away instead of queuing it"""
+
+    def __init__(self, reason):
+        super().__init__(f"LLM request not admitted ({reason})")
+        self.reason = reason
+
+
+class TokenBucket:
+    """Allows `rate` calls per second on average, with bursts of up to `burst`
+
+    Not thread-safe on its own; AdmissionController only uses it under its lock.
+    """
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        """Use up a token if one is available"""
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def wait_time(self):
+        """Seconds until the next token is available"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "deadline", "wake", "admitted", "reason")
+
+    def __init__(self, priority, sequence, deadline, wake):
+        self.priority = priority
+        self.sequence = sequence
+        self.deadline = deadline
+        self.wake = wake
+        self.admitted = None
+        self.reason = None
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class AdmissionController:
+    """Limit how many LLM calls are in flight and how fast new ones start
+
+    A call needs one of max_concurrent slots and, when a rate is set, a token
+    from a bucket refilling at `rate` per second. Calls that can't start yet
+    wait in a queue of at most max_queue, most important priority first and
+    in arrival order within a priority, for up to queue_timeout seconds.
+    When the queue is full a newcomer displaces the least important waiter
+    if it outranks it, and is rejected otherwise; rejected callers get
+    LLMOverloaded straight away so they can answer some other way.
+    Both threads (acquire) and asyncio tasks (acquire_async) can wait.
+    """
+
+    def __init__(self, max_concurrent=10, rate=0.0, burst=None, max_queue=50, queue_timeout=5.0,
+                 clock=time.monotonic):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.clock = clock
+        self.bucket = TokenBucket(rate, burst or max_concurrent, clock) if rate > 0 else None
+
+        self.active = 0
+        self.admitted = 0
+        self.rejected = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, priority=INTERACTIVE, timeout=None):
+        """Wait for a slot, or raise LLMOverloaded; every successful acquire must be followed by release()"""
+        event = threading.Event()
+        waiter = self._enqueue(priority, timeout, event.set)
+        while waiter.admitted is None:
+            event.wait(self._poll_interval(waiter))
+            self._poll(waiter)
+        return self._outcome(waiter)
+
+    async def acquire_async(self, priority=INTERACTIVE, timeout=None):
+        """Async variant of acquire; a cancelled caller gives up its place (or its slot)"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = self._enqueue(priority, timeout, lambda: loop.call_soon_threadsafe(_resolve, future))
+        try:
+            while waiter.admitted is None:
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), self._poll_interval(waiter))
+                except asyncio.TimeoutError:
+                    pass
+                self._poll(waiter)
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        return self._outcome(waiter)
+
+    def try_acquire(self):
+        """Take a slot only if one is free right now and nobody is waiting for it"""
+        with self._lock:
+            self._expire()
+            return not self._queue and self._start_call()
+
+    def occupy(self):
+        """Count a request that is already running against the limit, even if no slot is free
+
+        Used for a hedged request's abandoned first attempt, which stays on the
+        wire after its caller released the slot; release() it when it finishes.
+        """
+        with self._lock:
+            self.active += 1
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            self._dispatch()
+
+    def _enqueue(self, priority, timeout, wake):
+        if timeout is None:
+            timeout = self.queue_timeout
+        with self._lock:
+            waiter = _Waiter(priority, next(self._sequence), self.clock() + timeout, wake)
+            self._expire()
+            if not self._queue and self._start_call():
+                waiter.admitted = True
+                return waiter
+
+            if len(self._queue) >= self.max_queue:
+                lowest = max(self._queue) if self._queue else None
+                if lowest is None or not waiter < lowest:
+                    self._reject(waiter, "queue_full")
+                    return waiter
+                # The newcomer is more important than the last in line, who is turned away instead
+                self._queue.remove(lowest)
+                heapq.heapify(self._queue)
+                self._reject(lowest, "displaced")
+                lowest.wake()
+
+            heapq.heappush(self._queue, waiter)
+            # A slot may be free while the rate limit holds everyone back
+            self._dispatch()
+        return waiter
+
+    def _start_call(self):
+        # Takes a slot and a token, if both are available
+        if self.active >= self.max_concurrent:
+            return False
+        if self.bucket is not None and not self.bucket.take():
+            return False
+        self.active += 1
+        self.admitted += 1
+        return True
+
+    def _dispatch(self):
+        self._expire()
+        while self._queue and self._start_call():
+            waiter = heapq.heappop(self._queue)
+            waiter.admitted = True
+            waiter.wake()
+
+    def _expire(self):
+        now = self.clock()
+        expired = [waiter for waiter in self._queue if waiter.deadline <= now]
+        if expired:
+            self._queue = [waiter for waiter in self._queue if waiter.deadline > now]
+            heapq.heapify(self._queue)
+            for waiter in expired:
+                self._reject(waiter, "timeout")
+                waiter.wake()
+
+    def _reject(self, waiter, reason):
+        waiter.admitted = False
+        waiter.reason = reason
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def _poll_interval(self, waiter):
+        # Wake up for the deadline, or when the bucket will have refilled
+        with self._lock:
+            interval = waiter.deadline - self.clock()
+            if self.bucket is not None and self.active < self.max_concurrent:
+                interval = min(interval, self.bucket.wait_time())
+        return max(0.001, interval)
+
+    def _poll(self, waiter):
+        with self._lock:
+            if waiter.admitted is None:
+                self._dispatch()
+
+    def _abandon(self, waiter):
+        with self._lock:
+            if waiter.admitted is None:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                self._reject(waiter, "cancelled")
+                return
+        if waiter.admitted:
+            self.release()
+
+    @staticmethod
+    def _outcome(waiter):
+        if not waiter.admitted:
+            raise LLMOverloaded(waiter.reason)
+        return True
+
+    def snapshot(self):
+        """Slots, queue and rejections as a JSON-friendly dict"""
+        with self._lock:
+            return {
+                "active": self.active,
+                "max_concurrent": self.max_concurrent,
+                "queued": len(self._queue),
+                "max_queue": self.max_queue,
+                "admitted": self.admitted,
+                "rejected": dict(self.rejected),
+            }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
@@ -1,57 +1,193 @@
+import asyncio
 import re
 import random
 import datetime
 import json
 import os
-import string
-from collections import Counter
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import BATCH, INTERACTIVE
+from conversation_log import get_log_writer
+from faq_index import FAQIndex
+from faq_vector_index import SCORING_METHODS, VECTOR_AVAILABLE, VectorFAQIndex
+from fuzzy_index import FuzzyIndex
+from kb_snapshot import analyzer_name, load_snapshot
+from kb_store import KnowledgeBaseStore
+import metrics
+from nlp_resources import NLTK_INSTALLED, get_nlp_resources, record_timing
+from session_store import ConversationState
+from text_analysis import TextAnalyzer
 
 # Import LLM integration
 try:
-    from llm_integration import get_llm_response
+    from llm_integration import (get_llm_response, get_llm_response_async, get_prompt_builder,
+                                 llm_circuit_open, llm_status, stream_llm_response)
     LLM_AVAILABLE = True
 except ImportError:
     print("LLM integration is not available. Install required packages with 'pip install -r requirements.txt'")
     LLM_AVAILABLE = True  # Set to True anyway as we've now installed the requirements
 
-# We'll use NLTK for text processing
-try:
-    import nltk
-    from nltk.tokenize import word_tokenize
-    from nltk.corpus import stopwords
-    from nltk.stem import WordNetLemmatizer
-    
-    # Download required NLTK resources
-    nltk.download('punkt', quiet=True)
-    nltk.download('stopwords', quiet=True)
-    nltk.download('wordnet', quiet=True)
-    
-    NLTK_AVAILABLE = True
-except ImportError:
-    print("NLTK is not installed. Basic text matching will be used.")
-    print("To enable advanced features, install NLTK: pip install nltk")
-    NLTK_AVAILABLE = False
+# We'll use NLTK for text processing; it's loaded on first use (see nlp_resources)
+NLTK_AVAILABLE = NLTK_INSTALLED
+
+# Used by name extraction when NLTK's stopword list isn't available
+BASIC_STOP_WORDS = {"a", "an", "the", "i", "am", "is", "are", "not", "so", "very", "just",
+                    "here", "there", "looking", "trying", "having", "interested", "sure",
+                    "fine", "good", "ok", "okay", "new", "back", "sorry", "still", "also"}
 
 class AdvancedSupportBot:
-    def __init__(self, name="Advanced Support Bot", use_llm=True):
+    def __init__(self, name="Advanced Support Bot", use_llm=True, log_writer=None, max_history=50,
+                 kb_store=None, retrieval=None, faq_threshold=0.2, knowledge_base_path=None,
+                 text_analyzer=None):
         self.name = name
-        self.user_name = None
-        self.conversation_log = []
-        self.conversation_context = {"topic": None, "last_query": None}
+        # An explicit path (one storefront's knowledge base) never falls back to KNOWLEDGE_BASE_DB
+        self.knowledge_base_path = knowledge_base_path or "knowledge_base.json"
+        # Conversation state used when no per-session state is passed in (CLI use)
+        self.state = ConversationState(max_history=max_history)
+        self.log_writer = log_writer or get_log_writer()
         self.use_llm = use_llm and LLM_AVAILABLE
         
+        # Optional SQLite knowledge base shared with other worker processes
+        self.kb_store = kb_store
+        if self.kb_store is None and knowledge_base_path is None and os.getenv("KNOWLEDGE_BASE_DB"):
+            self.kb_store = KnowledgeBaseStore(os.getenv("KNOWLEDGE_BASE_DB"))
+        self.kb_version = None
+        self._kb_lock = threading.Lock()
+        # A precompiled snapshot (kb_snapshot.py) lets the FAQ index skip re-analyzing every FAQ
+        self.use_snapshot = os.getenv("KB_SNAPSHOT", "1") != "0"
+        self._snapshot = None
+        
         # Load responses from knowledge base
+        start = time.perf_counter()
         self.responses = self._load_knowledge_base()
+        record_timing("knowledge_base", time.perf_counter() - start)
         
-        # Initialize NLP components if available
-        if NLTK_AVAILABLE:
-            self.lemmatizer = WordNetLemmatizer()
-            self.stop_words = set(stopwords.words('english'))
+        # NLP components and the FAQ index are built on first use, so creating
+        # a bot (and importing this module) stays cheap and offline-safe
+        # "index" is the pure-Python inverted index; "overlap", "tfidf" and "bm25"
+        # use the vectorized engine ("overlap" scores exactly like "index")
+        self.retrieval = retrieval or os.getenv("FAQ_RETRIEVAL", "index")
+        self.faq_threshold = faq_threshold
+        # While the LLM is unavailable a weaker FAQ match beats a canned answer
+        self.degraded_faq_threshold = float(os.getenv("DEGRADED_FAQ_THRESHOLD", "0.1"))
+        # Scores between this and faq_threshold are borderline: the LLM call starts while
+        # typo correction still tries to turn them into a confident match
+        self.speculative_faq_threshold = float(os.getenv("SPECULATIVE_FAQ_THRESHOLD", "0.1"))
+        self.speculative_llm = os.getenv("SPECULATIVE_LLM", "1") != "0"
+        self._speculation_executor = None
+        self._faq_index = None
+        # Typo and abbreviation correction, tried before sending a question to the LLM
+        self.fuzzy_matching = os.getenv("FUZZY_MATCHING", "1") != "0"
+        self._fuzzy_index = None
+        self._index_lock = threading.Lock()
+        
+        # Each message is analyzed once per request; recent queries and lemmas are cached.
+        # Analysis doesn't depend on the knowledge base, so bots can share an analyzer
+        self.text_analyzer = text_analyzer or TextAnalyzer(
+            get_nlp_resources,
+            lemma_cache_size=int(os.getenv("LEMMA_CACHE_SIZE", "10000")),
+            query_cache_size=int(os.getenv("QUERY_CACHE_SIZE", "1000"))
+        )
+    
+    @property
+    def nlp(self):
+        """NLTK components, or None when NLTK or its data isn't available"""
+        return get_nlp_resources()
+    
+    @property
+    def stop_words(self):
+        nlp = self.nlp
+        return nlp.stop_words if nlp is not None else BASIC_STOP_WORDS
+    
+    @property
+    def faq_index(self):
+        """Index of every FAQ, analyzed once so queries only score overlapping FAQs"""
+        if self._faq_index is None:
+            with self._index_lock:
+                if self._faq_index is None:
+                    use_sets = self.nlp is None
+                    start = time.perf_counter()
+                    faq_index = self._create_faq_index(use_sets)
+                    faq_index.build(self.responses["faq"], self._snapshot_term_counts())
+                    record_timing("faq_index", time.perf_counter() - start)
+                    self._faq_index = faq_index
+        return self._faq_index
+    
+    def _snapshot_term_counts(self):
+        """Analyzed FAQs from the snapshot, if it was built with the analyzer in use"""
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.analyzer != analyzer_name(self.nlp):
+            return None
+        # FAQs changed since the snapshot was built are left out and analyzed as usual
+        return snapshot.term_counts(self.responses["faq"])
+    
+    @property
+    def fuzzy_index(self):
+        """Trigram index of the words used in the FAQs, for correcting misspelt queries"""
+        if self._fuzzy_index is None:
+            with self._index_lock:
+                if self._fuzzy_index is None:
+                    start = time.perf_counter()
+                    fuzzy_index = FuzzyIndex(stop_words=self.stop_words)
+                    fuzzy_index.build(self.responses["faq"])
+                    record_timing("fuzzy_index", time.perf_counter() - start)
+                    self._fuzzy_index = fuzzy_index
+        return self._fuzzy_index
+    
+    def _create_faq_index(self, use_sets):
+        if self.retrieval in SCORING_METHODS:
+            if VECTOR_AVAILABLE:
+                return VectorFAQIndex(self.text_analyzer.document_tokens, method=self.retrieval, use_sets=use_sets)
+            print(f"NumPy/SciPy are not installed, so '{self.retrieval}' retrieval is unavailable. Using the basic FAQ index.")
+        elif self.retrieval != "index":
+            print(f"Unknown FAQ retrieval '{self.retrieval}'. Using the basic FAQ index.")
+        return FAQIndex(self.text_analyzer.document_tokens, use_sets=use_sets)
+    
+    def warm_up(self):
+        """Load NLP resources and build the FAQ indexes now instead of on the first request"""
+        if self.fuzzy_matching:
+            self.fuzzy_index
+        return self.faq_index
+    
+    @property
+    def user_name(self):
+        return self.state.user_name
+    
+    @user_name.setter
+    def user_name(self, value):
+        self.state.user_name = value
+    
+    @property
+    def conversation_context(self):
+        return self.state.context
+    
+    @property
+    def conversation_log(self):
+        return self.state.recent_exchanges()
     
     def _load_knowledge_base(self):
+        """Load responses from the knowledge base store, or the JSON file without one"""
+        if self.kb_store is None:
+            return self._load_knowledge_base_file()
+        
+        # Seed a new store from the JSON knowledge base
+        if self.kb_store.is_empty():
+            self.kb_store.import_json(self._load_knowledge_base_file())
+        responses, self.kb_version = self.kb_store.load()
+        return responses
+    
+    def _load_knowledge_base_file(self):
         """Load responses from knowledge base file"""
+        # A snapshot is only used while it matches the file exactly
+        snapshot = load_snapshot(self.knowledge_base_path) if self.use_snapshot else None
+        if snapshot is not None:
+            self._snapshot = snapshot
+            return snapshot.responses()
+        
         try:
-            with open('knowledge_base.json', 'r') as f:
+            with open(self.knowledge_base_path, 'r') as f:
                 return json.load(f)
         except FileNotFoundError:
             # Default responses if file doesn't exist
@@ -75,116 +211,85 @@ class AdvancedSupportBot:
     
     def save_knowledge_base(self):
         """Save the current knowledge base to file"""
-        with open('knowledge_base.json', 'w') as f:
+        # Write a temporary file and swap it in so readers never see a half-written file
+        tmp_path = f"{self.knowledge_base_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(self.responses, f, indent=4)
+        os.replace(tmp_path, self.knowledge_base_path)
+    
+    def refresh_knowledge_base(self):
+        """Pick up FAQs that other workers added to the shared store; returns True if anything changed"""
+        if self.kb_store is None or not self.kb_store.has_changed():
+            return False
+        with self._kb_lock:
+            return self._pull_knowledge_base_changes()
+    
+    def _pull_knowledge_base_changes(self):
+        changes = self.kb_store.changes_since(self.kb_version)
+        # The lazy index builds iterate the FAQs under the index lock, so they're changed under it too
+        if changes is None:
+            # The store was replaced wholesale, so start over
+            responses, version = self.kb_store.load()
+            with self._index_lock:
+                self.responses, self.kb_version = responses, version
+                self._faq_index = None
+                self._fuzzy_index = None
+            return True
+        
+        categories, faqs, version = changes
+        with self._index_lock:
+            for category, texts in categories.items():
+                self.responses[category] = texts
+            for keyword, texts in faqs.items():
+                self.responses["faq"][keyword] = texts
+                # Only the changed FAQs are re-analyzed
+                if self._faq_index is not None:
+                    self._faq_index.update(keyword, texts)
+                if self._fuzzy_index is not None:
+                    self._fuzzy_index.update(keyword, texts)
+        
+        changed = version != self.kb_version
+        self.kb_version = version
+        return changed
     
-    def log_conversation(self, user_input, bot_response):
+    def log_conversation(self, user_input, bot_response, state=None):
         """Log the conversation for later analysis"""
+        state = state or self.state
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         log_entry = {
             "timestamp": timestamp,
-            "user": self.user_name if self.user_name else "User",
+            "user": state.user_name if state.user_name else "User",
             "user_input": user_input,
             "bot_response": bot_response,
-            "context": self.conversation_context.copy()
+            "context": state.context.copy()
         }
         
-        self.conversation_log.append(log_entry)
-        
-        # Save conversation log to file
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        log_file = f"{log_dir}/conversation_{datetime.datetime.now().strftime('%Y%m%d')}.json"
-        
-        try:
-            # Try to load existing logs
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    logs = json.load(f)
-            else:
-                logs = []
-            
-            # Append new log
-            logs.append(log_entry)
-            
-            # Save updated logs
-            with open(log_file, 'w') as f:
-                json.dump(logs, f, indent=4)
-        except Exception as e:
-            print(f"Warning: Could not save conversation log: {e}")
-    
-    def _preprocess_text(self, text):
-        """Preprocess text for better matching using NLP techniques"""
-        if not NLTK_AVAILABLE:
-            # Basic preprocessing if NLTK is not available
-            return text.lower().translate(str.maketrans('', '', string.punctuation)).split()
-        
-        # Tokenize, remove stopwords and lemmatize
-        tokens = word_tokenize(text.lower())
-        tokens = [self.lemmatizer.lemmatize(token) for token in tokens 
-                 if token.isalnum() and token not in self.stop_words]
-        return tokens
-    
-    def _calculate_similarity(self, text1, text2):
-        """Calculate similarity between two text inputs"""
-        if not NLTK_AVAILABLE:
-            # Simple word overlap for basic similarity
-            words1 = set(self._preprocess_text(text1))
-            words2 = set(self._preprocess_text(text2))
-            
-            if not words1 or not words2:
-                return 0.0
-                
-            overlap = len(words1.intersection(words2))
-            return overlap / min(len(words1), len(words2))
-        
-        # More sophisticated similarity using TF approach
-        tokens1 = self._preprocess_text(text1)
-        tokens2 = self._preprocess_text(text2)
-        
-        if not tokens1 or not tokens2:
-            return 0.0
-            
-        # Count word frequencies
-        counter1 = Counter(tokens1)
-        counter2 = Counter(tokens2)
-        
-        # Find common words
-        common_words = set(counter1.keys()) & set(counter2.keys())
-        
-        if not common_words:
-            return 0.0
-            
-        # Sum of minimum counts for each common word
-        sum_common = sum(min(counter1[word], counter2[word]) for word in common_words)
+        state.add_exchange(timestamp, user_input, bot_response)
         
-        # Total words in both texts
-        total_words = sum(counter1.values()) + sum(counter2.values())
-        
-        return 2.0 * sum_common / total_words if total_words > 0 else 0.0
+        # Hand the entry to the append-only writer; it's written in the background
+        with metrics.timed("log_write"):
+            self.log_writer.write(log_entry)
+    
+    def analyze(self, user_input):
+        """Wrap a message in an AnalyzedQuery that the matching stages share"""
+        return self.text_analyzer.analyze(user_input)
     
-    def _find_best_faq_match(self, user_input):
+    def analysis_stats(self):
+        """Hit rates of the query and lemma caches"""
+        return self.text_analyzer.stats()
+    
+    def _find_best_faq_match(self, user_input, threshold=None):
         """Find the best matching FAQ for the user's input"""
-        best_similarity = 0.0
-        best_keyword = None
-        
-        # Calculate similarity for each FAQ keyword
-        for keyword in self.responses["faq"].keys():
-            # Combine the keyword with its responses for better matching
-            keyword_text = keyword + " " + " ".join(self.responses["faq"][keyword])
-            similarity = self._calculate_similarity(user_input, keyword_text)
-            
-            if similarity > best_similarity and similarity > 0.2:  # Threshold
-                best_similarity = similarity
-                best_keyword = keyword
-        
-        return best_keyword, best_similarity
+        if threshold is None:
+            threshold = self.faq_threshold
+        # Only FAQs sharing a term with the query can score above zero
+        with metrics.timed("faq_match"):
+            query = self.analyze(user_input)
+            return self.faq_index.best_match(query.tokens, threshold=threshold)
     
     def _extract_name(self, user_input):
         """Extract user's name from input"""
-        user_input_lower = user_input.lower()
+        user_input_lower = self.analyze(user_input).lower
         
         # Check for "my name is X" pattern
         name_match = re.search(r"my name is ([a-z]+)", user_input_lower)
@@ -205,63 +310,384 @@ class AdvancedSupportBot:
         
         return None
     
-    def _update_context(self, user_input, matched_intent=None):
+    def _update_context(self, state, user_input, matched_intent=None):
         """Update conversation context"""
         # Save the last query
-        self.conversation_context["last_query"] = user_input
+        state.context["last_query"] = user_input
         
         # Update topic if an intent was matched
         if matched_intent:
-            self.conversation_context["topic"] = matched_intent
+            state.context["topic"] = matched_intent
     
-    def get_response(self, user_input):
-        """Generate a response based on user input"""
-        if not user_input.strip():
+    def _get_local_response(self, user_input, state, speculate=None):
+        """Answer from the knowledge base, or return None if the question needs the LLM
+        
+        speculate(query, keyword) is called for a borderline FAQ score, before
+        the typo correction tier runs, so the caller can start the LLM early.
+        The score is only known once FAQ matching is done, so the LLM call
+        overlaps the typo correction tier alone; starting it earlier would mean
+        calling the LLM for questions the FAQs answer outright.
+        """
+        self.refresh_knowledge_base()
+        query = self.analyze(user_input)
+        
+        response = self._get_rule_response(query, state)
+        if response is not None:
+            metrics.count_response("rule")
+            return response
+        
+        # Find best FAQ match using similarity; confident matches are answered straight away
+        threshold = min(self.faq_threshold, self.speculative_faq_threshold) if speculate else None
+        keyword, similarity = self._find_best_faq_match(query, threshold)
+        if keyword and similarity > self.faq_threshold:
+            return self._get_faq_response(query, state, (keyword, similarity))
+        if keyword and speculate is not None:
+            speculate(query, keyword)
+        
+        # Second tier: fix typos and abbreviations, then match again
+        return self._get_fuzzy_response(query, state)
+    
+    def _get_rule_response(self, user_input, state):
+        """Handle empty input, names, greetings and goodbyes; None when FAQ matching should run"""
+        query = self.analyze(user_input)
+        if not query.lower.strip():
             return random.choice(self.responses["fallback"])
         
         # Try to extract name
-        extracted_name = self._extract_name(user_input)
+        with metrics.timed("name_extraction"):
+            extracted_name = self._extract_name(query)
         if extracted_name:
-            self.user_name = extracted_name
-            return random.choice(self.responses["name_acknowledge"]).format(user_name=self.user_name)
+            state.user_name = extracted_name
+            return random.choice(self.responses["name_acknowledge"]).format(user_name=state.user_name)
         
         # Check for greetings
-        if any(word in user_input.lower() for word in ["hello", "hi", "hey", "greetings"]):
-            self._update_context(user_input, "greeting")
+        if any(word in query.lower for word in ["hello", "hi", "hey", "greetings"]):
+            self._update_context(state, query.text, "greeting")
             return random.choice(self.responses["greeting"]).format(bot_name=self.name)
             
         # Check for goodbyes
-        if any(word in user_input.lower() for word in ["bye", "goodbye", "see you", "thank you", "thanks"]):
-            self._update_context(user_input, "goodbye")
+        if any(word in query.lower for word in ["bye", "goodbye", "see you", "thank you", "thanks"]):
+            self._update_context(state, query.text, "goodbye")
             return random.choice(self.responses["goodbye"])
         
-        # Find best FAQ match using similarity
-        best_keyword, similarity = self._find_best_faq_match(user_input)
+        return None
+    
+    def _get_faq_response(self, user_input, state, match):
+        """Answer with the matched FAQ, or None if nothing matched well enough"""
+        best_keyword, similarity = match
         
         if best_keyword:
-            self._update_context(user_input, best_keyword)
+            self._update_context(state, str(user_input), best_keyword)
+            metrics.count_response("faq")
             return random.choice(self.responses["faq"][best_keyword])
         
+        return None
+    
+    def _get_fuzzy_response(self, user_input, state):
+        """Answer with the FAQ matching the query once misspelt words are corrected, or None"""
+        if not self.fuzzy_matching:
+            return None
+        query = self.analyze(user_input)
+        with metrics.timed("fuzzy_match"):
+            corrected, changed = self.fuzzy_index.correct(query.lower)
+            if not changed:
+                return None
+            # A corrected FAQ keyword is a strong signal on its own; otherwise score as usual
+            keyword = self.fuzzy_index.match_keyword(corrected)
+            if keyword is not None and keyword in self.responses["faq"]:
+                match = (keyword, 1.0)
+            else:
+                match = self.faq_index.best_match(self.analyze(corrected).tokens, threshold=self.faq_threshold)
+        return self._get_faq_response(query, state, match)
+    
+    def _can_speculate(self):
+        # An open circuit breaker sends the question to the degraded path instead
+        return self.speculative_llm and self.use_llm and LLM_AVAILABLE and not llm_circuit_open()
+    
+    def _speculative_llm_args(self, query, state, keyword, served_faq):
+        """Arguments for an LLM call started before the local tiers have finished"""
+        # Without an LLM slot the borderline FAQ is the best answer; the session is
+        # only updated once the caller knows which answer it's using, so the keyword
+        # is recorded in served_faq for it
+        def overflow():
+            metrics.count_response("faq")
+            served_faq.append(keyword)
+            return random.choice(self.responses["faq"][keyword])
+        return (query.text, state.recent_exchanges(), state.user_name, self._conversation_summary(state),
+                INTERACTIVE, overflow)
+    
+    def _get_speculation_executor(self):
+        if self._speculation_executor is None:
+            with self._index_lock:
+                if self._speculation_executor is None:
+                    self._speculation_executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv("SPECULATIVE_LLM_WORKERS", "8")),
+                        thread_name_prefix="speculative-llm"
+                    )
+        return self._speculation_executor
+    
+    def close(self):
+        """Stop the threads used for early LLM calls; the bot keeps working without them"""
+        executor = self._speculation_executor
+        self._speculation_executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def _get_degraded_response(self, user_input, state):
+        """Best FAQ above the lower degraded threshold, for when the LLM can't be used; None otherwise"""
+        query = self.analyze(user_input)
+        match = self.faq_index.best_match(query.tokens, threshold=self.degraded_faq_threshold)
+        return self._get_faq_response(query, state, match)
+    
+    def _conversation_summary(self, state):
+        """Fold exchanges that left the prompt's history window into the session's rolling summary"""
+        builder = get_prompt_builder()
+        older = state.unsummarized_exchanges(builder.recent_turns)
+        if older:
+            state.update_summary(builder.summarize(state.summary, older), builder.recent_turns)
+        return state.summary or None
+    
+    def llm_status(self):
+        """State of the LLM circuit breaker ("closed", "open", "half_open" or "disabled")"""
+        if not (self.use_llm and LLM_AVAILABLE):
+            return {"state": "disabled"}
+        return llm_status()
+    
+    def _get_fallback_response(self, user_input, state):
+        """Fallback response if no match is found and LLM is not available or fails"""
+        self._update_context(state, user_input)
+        metrics.count_response("fallback")
+        return random.choice(self.responses["fallback"])
+    
+    def get_response(self, user_input, state=None):
+        """Generate a response based on user input"""
+        state = state or self.state
+        
+        with metrics.timed("response"):
+            query = self.analyze(user_input)
+            speculation = []
+            served_faq = []
+            
+            def speculate(query, keyword):
+                args = self._speculative_llm_args(query, state, keyword, served_faq)
+                speculation.append(self._get_speculation_executor().submit(get_llm_response, *args))
+            
+            response = self._get_local_response(query, state, speculate if self._can_speculate() else None)
+            if response is not None:
+                if speculation:
+                    # Typo correction found a confident match after all; an answer still arriving gets cached
+                    speculation[0].cancel()
+                    metrics.count_speculation("discarded")
+                return response
+            
+            if speculation:
+                metrics.count_speculation("used")
+                self._update_context(state, query.text, "llm_response")
+                try:
+                    response = speculation[0].result()
+                    if served_faq:
+                        # Turned away by admission control, so the borderline FAQ was served instead
+                        self._update_context(state, query.text, served_faq[0])
+                    return response
+                except Exception as e:
+                    print(f"Error getting LLM response: {e}")
+                    return self._get_fallback_response(query.text, state)
+            
+            return self._get_remote_response(query, state)
+    
+    def _get_remote_response(self, user_input, state, priority=INTERACTIVE):
+        """Answer a question the knowledge base couldn't, using the LLM or a fallback"""
+        query = self.analyze(user_input)
+        user_input = query.text
         # If no match is found, try using the LLM if available
         if self.use_llm and LLM_AVAILABLE:
-            self._update_context(user_input, "llm_response")
+            # The circuit breaker would fail the call fast anyway; try a weaker FAQ match first
+            if llm_circuit_open():
+                response = self._get_degraded_response(query, state)
+                if response is not None:
+                    return response
+            
+            self._update_context(state, user_input, "llm_response")
             try:
-                llm_response = get_llm_response(user_input, self.conversation_log, self.user_name)
+                # When the LLM is saturated the closest FAQ, even a weak match, beats waiting
+                llm_response = get_llm_response(user_input, state.recent_exchanges(), state.user_name,
+                                                self._conversation_summary(state), priority,
+                                                overflow=lambda: self._get_degraded_response(query, state))
                 return llm_response
             except Exception as e:
                 print(f"Error getting LLM response: {e}")
                 # Fall back to default responses if LLM fails
         
-        # Fallback response if no match is found and LLM is not available or fails
-        self._update_context(user_input)
-        return random.choice(self.responses["fallback"])
+        return self._get_fallback_response(user_input, state)
+    
+    def get_responses(self, messages, max_concurrency=None):
+        """Answer a batch of independent messages, returning responses in input order
+        
+        All messages are analyzed and scored against the FAQ index together;
+        only the unmatched ones go to the LLM, at most max_concurrency at a time
+        and behind interactive requests when the LLM is busy.
+        Each message gets a fresh conversation state, so they don't affect each other.
+        """
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv("BATCH_LLM_CONCURRENCY", "8"))
+        
+        self.refresh_knowledge_base()
+        states = [ConversationState(max_history=self.state.history.maxlen) for _ in messages]
+        responses = [None] * len(messages)
+        
+        queries = [self.analyze(user_input) for user_input in messages]
+        pending = []
+        for position, (query, state) in enumerate(zip(queries, states)):
+            response = self._get_rule_response(query, state)
+            if response is None:
+                pending.append(position)
+            else:
+                metrics.count_response("rule")
+                responses[position] = response
+        
+        with metrics.timed("faq_match_batch"):
+            token_lists = [queries[position].tokens for position in pending]
+            matches = self.faq_index.best_matches(token_lists, threshold=self.faq_threshold)
+        
+        unmatched = []
+        for position, match in zip(pending, matches):
+            response = self._get_faq_response(queries[position], states[position], match)
+            if response is None:
+                response = self._get_fuzzy_response(queries[position], states[position])
+            if response is None:
+                unmatched.append(position)
+            else:
+                responses[position] = response
+        
+        if unmatched:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(unmatched)))) as executor:
+                futures = {
+                    position: executor.submit(self._get_remote_response, queries[position], states[position], BATCH)
+                    for position in unmatched
+                }
+                for position, future in futures.items():
+                    responses[position] = future.result()
+        
+        return responses
+    
+    async def get_response_async(self, user_input, state=None, executor=None):
+        """Async variant of get_response for the asyncio serving path
+        
+        The CPU-bound knowledge base matching runs on the given executor (the
+        loop's default one if None) so it never blocks the event loop, and the
+        LLM fallback is awaited without tying up a thread.
+        """
+        state = state or self.state
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        query = self.analyze(user_input)
+        user_input = query.text
+        
+        speculation = []
+        served_faq = []
+        
+        def speculate(query, keyword):
+            # Called on the executor thread; the LLM call runs as a task on this loop
+            args = self._speculative_llm_args(query, state, keyword, served_faq)
+            speculation.append(asyncio.run_coroutine_threadsafe(get_llm_response_async(*args), loop))
+        
+        try:
+            response = await loop.run_in_executor(executor, self._get_local_response, query, state,
+                                                  speculate if self._can_speculate() else None)
+            if response is not None:
+                if speculation:
+                    # Cancelling aborts the upstream request, unless an identical request shares it
+                    speculation[0].cancel()
+                    metrics.count_speculation("discarded")
+                return response
+            
+            if speculation:
+                metrics.count_speculation("used")
+                self._update_context(state, user_input, "llm_response")
+                try:
+                    response = await asyncio.wrap_future(speculation[0])
+                    if served_faq:
+                        # Turned away by admission control, so the borderline FAQ was served instead
+                        self._update_context(state, user_input, served_faq[0])
+                    return response
+                except Exception as e:
+                    print(f"Error getting LLM response: {e}")
+                    return self._get_fallback_response(user_input, state)
+            
+            if self.use_llm and LLM_AVAILABLE:
+                if llm_circuit_open():
+                    response = await loop.run_in_executor(executor, self._get_degraded_response, query, state)
+                    if response is not None:
+                        return response
+                
+                self._update_context(state, user_input, "llm_response")
+                try:
+                    return await get_llm_response_async(user_input, state.recent_exchanges(), state.user_name,
+                                                        self._conversation_summary(state),
+                                                        overflow=lambda: self._get_degraded_response(query, state))
+                except Exception as e:
+                    print(f"Error getting LLM response: {e}")
+            
+            return self._get_fallback_response(user_input, state)
+        finally:
+            metrics.observe_stage("response", time.perf_counter() - start)
+    
+    def stream_response(self, user_input, state=None):
+        """Generate a response as a sequence of text chunks
+        
+        Knowledge base answers come back as a single chunk straight away; LLM
+        answers are yielded token by token as the upstream produces them.
+        """
+        state = state or self.state
+        query = self.analyze(user_input)
+        user_input = query.text
+        
+        response = self._get_local_response(query, state)
+        if response is not None:
+            yield response
+            return
+        
+        if self.use_llm and LLM_AVAILABLE:
+            if llm_circuit_open():
+                response = self._get_degraded_response(query, state)
+                if response is not None:
+                    yield response
+                    return
+            
+            self._update_context(state, user_input, "llm_response")
+            streamed = False
+            try:
+                summary = self._conversation_summary(state)
+                overflow = lambda: self._get_degraded_response(query, state)
+                for chunk in stream_llm_response(user_input, state.recent_exchanges(), state.user_name, summary,
+                                                 overflow=overflow):
+                    streamed = True
+                    yield chunk
+            except Exception as e:
+                print(f"Error getting LLM response: {e}")
+            if streamed:
+                return
+        
+        yield self._get_fallback_response(user_input, state)
     
     def add_faq(self, keyword, response):
         """Add a new FAQ to the knowledge base"""
-        if keyword not in self.responses["faq"]:
-            self.responses["faq"][keyword] = []
+        if self.kb_store is not None:
+            # One atomic insert; pulling changes applies it along with anything other workers added
+            with self._kb_lock:
+                self.kb_store.add_faq(keyword, response)
+                self._pull_knowledge_base_changes()
+            return f"Added new response for '{keyword}'"
         
-        self.responses["faq"][keyword].append(response)
+        with self._index_lock:
+            if keyword not in self.responses["faq"]:
+                self.responses["faq"][keyword] = []
+            
+            self.responses["faq"][keyword].append(response)
+            if self._faq_index is not None:
+                self._faq_index.update(keyword, self.responses["faq"][keyword])
+            if self._fuzzy_index is not None:
+                self._fuzzy_index.update(keyword, self.responses["faq"][keyword])
         self.save_knowledge_base()
         return f"Added new response for '{keyword}'"
 
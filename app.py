@@ -1,14 +1,70 @@
-from flask import Flask, request, jsonify, render_template
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
 from advanced_chatbot import AdvancedSupportBot
+import metrics
+from nlp_resources import record_timing, report_startup, startup_timings
+from session_store import SessionStore
+from tenants import TenantRegistry
+import json
 import os
 import sys
 
 app = Flask(__name__)
 
 # Create a single bot instance for the whole application
-# Use the advanced bot with LLM capabilities
+# Use the advanced bot with LLM capabilities; it holds the shared knowledge base
+# and FAQ index, while each visitor's conversation lives in the session store
 bot = AdvancedSupportBot(name="AI-Enhanced Support", use_llm=True)
 
+# With PRELOAD_NLP=1 the NLP resources and FAQ index are built here, so a
+# pre-fork server (gunicorn --preload) shares them with every worker;
+# otherwise they're built on the first chat request
+if os.getenv('PRELOAD_NLP') == '1':
+    bot.warm_up()
+
+SESSION_COOKIE = 'support_session'
+TENANT_HEADER = 'X-Tenant'
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '100'))
+sessions = SessionStore(
+    ttl=int(os.getenv('SESSION_TTL_SECONDS', '1800')),
+    max_sessions=int(os.getenv('MAX_SESSIONS', '10000')),
+    max_memory_bytes=int(os.getenv('SESSION_MEMORY_MB', '64')) * 1024 * 1024,
+    max_history=int(os.getenv('SESSION_HISTORY', '20'))
+)
+
+# Other storefronts' knowledge bases live in TENANTS_DIR/<tenant>.json and are
+# loaded on their first request; they share the default bot's text analyzer
+tenants = TenantRegistry(
+    lambda tenant_id, path: AdvancedSupportBot(name="AI-Enhanced Support", use_llm=True,
+                                               knowledge_base_path=path, text_analyzer=bot.text_analyzer),
+    directory=os.getenv('TENANTS_DIR', 'tenants'),
+    max_tenants=int(os.getenv('MAX_TENANTS', '100')),
+    max_memory_bytes=int(os.getenv('TENANT_MEMORY_MB', '256')) * 1024 * 1024
+)
+
+def select_bot(tenant_id):
+    """The bot for a tenant (the default bot without one), or None if the tenant is unknown"""
+    if not tenant_id:
+        return bot
+    return tenants.get(tenant_id)
+
+def _request_tenant():
+    """Tenant named by the X-Tenant header or the tenant query parameter, if any"""
+    return request.headers.get(TENANT_HEADER) or request.args.get('tenant') or None
+
+def _unknown_tenant(tenant_id):
+    return jsonify({'error': f"Unknown tenant '{tenant_id}'"}), 404
+
+def _json_object():
+    """The request body if it is a JSON object, otherwise None"""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else None
+
+def _invalid_body(message='Request body must be a JSON object'):
+    return jsonify({'error': message}), 400
+
 @app.route('/')
 def home():
     """Render the home page"""
@@ -17,36 +73,154 @@ def home():
 @app.route('/api/chat', methods=['POST'])
 def chat():
     """API endpoint for chat interaction"""
-    data = request.json
+    tenant_id = _request_tenant()
+    tenant_bot = select_bot(tenant_id)
+    if tenant_bot is None:
+        return _unknown_tenant(tenant_id)
+    
+    data = _json_object()
+    if data is None:
+        return _invalid_body()
     user_message = data.get('message', '')
+    if not isinstance(user_message, str):
+        return _invalid_body('message must be a string')
+    
+    # Look up (or start) this visitor's conversation
+    state = sessions.get(request.cookies.get(SESSION_COOKIE), tenant=tenant_id)
     
     # Get response from the bot
-    response = bot.get_response(user_message)
+    response = tenant_bot.get_response(user_message, state)
     
     # Log the conversation
-    bot.log_conversation(user_message, response)
+    tenant_bot.log_conversation(user_message, response, state)
+    sessions.save(state)
     
-    return jsonify({
+    result = jsonify({
         'response': response,
-        'userName': bot.user_name
+        'userName': state.user_name
+    })
+    return _with_session_cookie(result, state)
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """API endpoint for chat interaction that streams the reply as server-sent events"""
+    tenant_id = _request_tenant()
+    tenant_bot = select_bot(tenant_id)
+    if tenant_bot is None:
+        return _unknown_tenant(tenant_id)
+    
+    data = _json_object()
+    if data is None:
+        return _invalid_body()
+    user_message = data.get('message', '')
+    if not isinstance(user_message, str):
+        return _invalid_body('message must be a string')
+    
+    # Look up (or start) this visitor's conversation
+    state = sessions.get(request.cookies.get(SESSION_COOKIE), tenant=tenant_id)
+    
+    def generate():
+        # FAQ answers arrive as one token event, LLM answers as many
+        chunks = []
+        for chunk in tenant_bot.stream_response(user_message, state):
+            chunks.append(chunk)
+            yield _sse_event('token', {'token': chunk})
+        
+        response = ''.join(chunks)
+        
+        # Log the conversation
+        tenant_bot.log_conversation(user_message, response, state)
+        sessions.save(state)
+        
+        yield _sse_event('done', {
+            'response': response,
+            'userName': state.user_name
+        })
+    
+    result = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Stop proxies from buffering the stream
+    result.headers['Cache-Control'] = 'no-cache'
+    result.headers['X-Accel-Buffering'] = 'no'
+    return _with_session_cookie(result, state)
+
+def _sse_event(event, data):
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _with_session_cookie(response, state):
+    """Attach the session cookie so the next request finds the same conversation"""
+    # Re-sent on every reply so the cookie expiry slides along with the session TTL
+    response.set_cookie(SESSION_COOKIE, state.session_id, max_age=sessions.ttl,
+                        httponly=True, samesite='Lax')
+    return response
+
+@app.route('/api/chat/batch', methods=['POST'])
+def chat_batch():
+    """API endpoint answering many independent messages at once, for offline jobs"""
+    tenant_id = _request_tenant()
+    tenant_bot = select_bot(tenant_id)
+    if tenant_bot is None:
+        return _unknown_tenant(tenant_id)
+    
+    data = _json_object()
+    if data is None:
+        return _invalid_body()
+    messages = data.get('messages')
+    
+    if not isinstance(messages, list) or not all(isinstance(message, str) for message in messages):
+        return jsonify({'error': 'messages must be a list of strings'}), 400
+    if len(messages) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} messages per batch'}), 400
+    
+    # Batch traffic isn't a conversation, so it has no session and isn't logged
+    return jsonify({'responses': tenant_bot.get_responses(messages)})
+
+@app.route('/api/status')
+def status():
+    """API endpoint reporting whether LLM answers are currently available, and text cache hit rates"""
+    return jsonify({
+        'llm': bot.llm_status(),
+        'text_analysis': bot.analysis_stats(),
+        'tenants': tenants.stats()
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint; only served when METRICS_ENABLED=1"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled; set METRICS_ENABLED=1'}), 404
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 @app.route('/api/add-faq', methods=['POST'])
 def add_faq():
     """API endpoint to add new FAQ responses"""
-    data = request.json
-    keyword = data.get('keyword', '').lower()
+    tenant_id = _request_tenant()
+    tenant_bot = select_bot(tenant_id)
+    if tenant_bot is None:
+        return _unknown_tenant(tenant_id)
+    
+    data = _json_object()
+    if data is None:
+        return _invalid_body()
+    keyword = data.get('keyword', '')
     response = data.get('response', '')
     
-    if not keyword or not response:
+    if not keyword or not response or not isinstance(keyword, str) or not isinstance(response, str):
         return jsonify({'error': 'Both keyword and response are required'}), 400
+    keyword = keyword.lower()
     
-    result = bot.add_faq(keyword, response)
+    result = tenant_bot.add_faq(keyword, response)
+    if tenant_id:
+        tenants.resize(tenant_id)
     return jsonify({'message': result})
 
 # Create templates directory if it doesn't exist
 if not os.path.exists('templates'):
     os.makedirs('templates')
 
+record_timing('app_import', time.perf_counter() - _import_started)
+if os.getenv('STARTUP_REPORT') == '1':
+    report_startup(startup_timings['app_import'])
+
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+ASGI entry point for serving the support bot with asyncio
+
+/api/chat is handled natively on the event loop: knowledge base matching runs
+on a small bounded thread pool and LLM fallbacks are awaited, so thousands of
+slow LLM calls can be in flight on a handful of threads. Every other route is
+served by the Flask app from app.py.
+
+Run with:
+    uvicorn asgi:application --workers 2
+"""
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app, select_bot, sessions, SESSION_COOKIE, TENANT_HEADER
+
+# CPU-bound FAQ matching gets a fixed number of threads; it never waits on the network
+faq_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('FAQ_EXECUTOR_WORKERS', '4')),
+    thread_name_prefix='faq-match'
+)
+
+flask_app = WsgiToAsgi(app)
+
+
+async def application(scope, receive, send):
+    """Route /api/chat to the async handler and everything else to Flask"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+    elif scope['type'] == 'http' and scope['path'] == '/api/chat' and scope['method'] == 'POST':
+        await chat(scope, receive, send)
+    else:
+        await flask_app(scope, receive, send)
+
+
+async def chat(scope, receive, send):
+    """Async version of the /api/chat endpoint"""
+    tenant_id = _read_tenant(scope)
+    # Loading a tenant's knowledge base reads a file, so it stays off the event loop
+    bot = await asyncio.get_running_loop().run_in_executor(faq_executor, select_bot, tenant_id)
+    if bot is None:
+        await _send_json(send, 404, {'error': f"Unknown tenant '{tenant_id}'"})
+        return
+
+    try:
+        data = json.loads(await _read_body(receive) or b'{}')
+    except ValueError:
+        data = None
+    # Same checks as the Flask routes: valid JSON that isn't an object ([1, 2], "x") is rejected too
+    if not isinstance(data, dict):
+        await _send_json(send, 400, {'error': 'Request body must be a JSON object'})
+        return
+    user_message = data.get('message', '')
+    if not isinstance(user_message, str):
+        await _send_json(send, 400, {'error': 'message must be a string'})
+        return
+
+    # Look up (or start) this visitor's conversation
+    state = sessions.get(_read_cookie(scope, SESSION_COOKIE), tenant=tenant_id)
+
+    # Get response from the bot
+    response = await bot.get_response_async(user_message, state, executor=faq_executor)
+
+    # Log the conversation; handing the entry to the log writer can block for a moment when its queue is full
+    await asyncio.get_running_loop().run_in_executor(faq_executor, bot.log_conversation,
+                                                     user_message, response, state)
+    sessions.save(state)
+
+    cookie = f"{SESSION_COOKIE}={state.session_id}; Max-Age={sessions.ttl}; Path=/; HttpOnly; SameSite=Lax"
+    await _send_json(send, 200, {
+        'response': response,
+        'userName': state.user_name
+    }, [(b'set-cookie', cookie.encode('latin-1'))])
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        body += message.get('body', b'')
+        if not message.get('more_body', False):
+            break
+    return body
+
+
+def _read_cookie(scope, name):
+    for header, value in scope.get('headers', []):
+        if header == b'cookie':
+            cookie = SimpleCookie()
+            cookie.load(value.decode('latin-1'))
+            if name in cookie:
+                return cookie[name].value
+    return None
+
+
+def _read_tenant(scope):
+    """Tenant from the X-Tenant header or the tenant query parameter, like app.py"""
+    header_name = TENANT_HEADER.lower().encode('latin-1')
+    for header, value in scope.get('headers', []):
+        if header == header_name and value:
+            return value.decode('latin-1')
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get('tenant')
+    return values[0] if values and values[0] else None
+
+
+async def _send_json(send, status, payload, extra_headers=()):
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', b'application/json'),
+            (b'content-length', str(len(body)).encode('latin-1')),
+            *extra_headers
+        ]
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            faq_executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
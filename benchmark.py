@@ -0,0 +1,441 @@
+"""
+Replay benchmark for the support bots
+
+Replays the user messages recorded in logs/conversation_*.json(l) through
+SupportBot, AdvancedSupportBot and the Flask /api/chat route, with LLM calls
+answered by a local stub of the OpenRouter API. Reports per-stage
+p50/p95/p99 latency, throughput and allocations, optionally against
+synthetic knowledge bases of different sizes:
+
+    python benchmark.py
+    python benchmark.py --kb-sizes 10,1000,50000 --llm-profile typical --json results.json
+    python benchmark.py --targets advanced --retrieval bm25 --concurrency 8
+
+Everything runs in a temporary working directory, so the real knowledge base
+and conversation logs are never modified.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from conversation_log import close_log_writers, conversation_log_files, iter_conversation_log
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TARGETS = ("supportbot", "advanced", "flask")
+
+# Stub LLM latency and error profiles: mean and jitter in seconds, share of failed calls
+LLM_PROFILES = {
+    "instant": {"latency": 0.0, "jitter": 0.0, "error_rate": 0.0},
+    "fast": {"latency": 0.05, "jitter": 0.01, "error_rate": 0.0},
+    "typical": {"latency": 0.6, "jitter": 0.2, "error_rate": 0.01},
+    "slow": {"latency": 2.5, "jitter": 0.8, "error_rate": 0.0},
+    "flaky": {"latency": 0.6, "jitter": 0.3, "error_rate": 0.2},
+}
+ERROR_STATUSES = (429, 500, 503)
+
+
+class StubLLMServer:
+    """Local stand-in for the OpenRouter chat completions API"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0, port=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        handler = type("StubHandler", (_StubHandler,), {"stub": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def next_reply(self):
+        """Return (delay, status) for the next call according to the profile"""
+        with self._lock:
+            self.calls += 1
+            delay = max(0.0, self._random.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            if self._random.random() < self.error_rate:
+                self.errors += 1
+                return delay, self._random.choice(ERROR_STATUSES)
+            return delay, 200
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Small replies on a kept-alive connection would otherwise wait out delayed ACKs
+    disable_nagle_algorithm = True
+    stub = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        delay, status = self.stub.next_reply()
+        if delay:
+            time.sleep(delay)
+
+        if status != 200:
+            self._send(status, {"error": {"message": "stub error", "code": status}})
+        elif body.get("stream"):
+            self._send_stream(["This is ", "a stubbed ", "answer."])
+        else:
+            self._send(200, {"choices": [{"message": {"role": "assistant", "content": "This is a stubbed answer."}}]})
+
+    def _send(self, status, payload):
+        self._send_body(status, "application/json", json.dumps(payload).encode())
+
+    def _send_stream(self, pieces):
+        events = [f"data: {json.dumps({'choices': [{'delta': {'content': piece}}]})}\n\n" for piece in pieces]
+        self._send_body(200, "text/event-stream", ("".join(events) + "data: [DONE]\n\n").encode())
+
+    def _send_body(self, status, content_type, data):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def load_replay_messages(log_dir, limit=None):
+    """Collect the user messages from every conversation log, oldest first"""
+    messages = []
+    for path in conversation_log_files(log_dir):
+        for entry in iter_conversation_log(path):
+            user_input = entry.get("user_input")
+            if isinstance(user_input, str):
+                messages.append(user_input)
+                if limit and len(messages) >= limit:
+                    return messages
+    return messages
+
+
+def synthetic_knowledge_base(base, faq_count, seed=0):
+    """Return a copy of a knowledge base with exactly faq_count FAQs
+
+    The real FAQs come first; the rest are generated from the knowledge base's
+    own vocabulary plus made-up product words, so larger corpora also grow
+    the number of distinct terms the index has to handle.
+    """
+    rng = random.Random(seed)
+    knowledge_base = {category: list(value) for category, value in base.items() if category != "faq"}
+    faqs = dict(list(base.get("faq", {}).items())[:faq_count])
+
+    words = sorted({word.strip(".,!?$()").lower()
+                    for responses in base.get("faq", {}).values()
+                    for response in responses
+                    for word in response.split()} - {""})
+    syllables = ["ka", "lo", "mi", "ser", "tan", "vo", "rix", "pel", "dra", "qu", "zen", "bi"]
+    product_words = ["".join(rng.choice(syllables) for _ in range(3)) for _ in range(max(50, faq_count // 5))]
+
+    while len(faqs) < faq_count:
+        keyword = " ".join(rng.sample(product_words, 1) + rng.sample(words, rng.randint(0, 2)))
+        if keyword in faqs:
+            continue
+        sentence = rng.sample(words, min(len(words), rng.randint(8, 16))) + rng.sample(product_words, 2)
+        rng.shuffle(sentence)
+        faqs[keyword] = [" ".join(sentence).capitalize() + "."]
+
+    knowledge_base["faq"] = faqs
+    return knowledge_base
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    # The smallest value with at least `fraction` of the values at or below it; rounding
+    # first keeps 0.95 * 100 from landing just above 95
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class StageTimer:
+    """Collects wall-clock durations per named stage"""
+
+    def __init__(self):
+        self.durations = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def wrap(self, stage, func):
+        """Return func timed under a stage name"""
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        return timed
+
+    def summary(self):
+        stages = {}
+        for stage, durations in self.durations.items():
+            durations = sorted(durations)
+            stages[stage] = {
+                "count": len(durations),
+                "p50_ms": percentile(durations, 0.50) * 1000,
+                "p95_ms": percentile(durations, 0.95) * 1000,
+                "p99_ms": percentile(durations, 0.99) * 1000,
+            }
+        return stages
+
+
+def _instrument_advanced(bot, timer):
+    # Instance attributes shadow the methods, so get_response calls the timed versions.
+    # faq_match includes analyze; llm includes the stub round trip and any retries.
+    bot._get_rule_response = timer.wrap("rules", bot._get_rule_response)
+    # Messages are analyzed once and cached, so repeated ones show up as near-zero analyze times
+    bot.text_analyzer.query_tokens = timer.wrap("analyze", bot.text_analyzer.query_tokens)
+    bot._find_best_faq_match = timer.wrap("faq_match", bot._find_best_faq_match)
+    bot._get_remote_response = timer.wrap("llm", bot._get_remote_response)
+    bot.log_conversation = timer.wrap("log", bot.log_conversation)
+
+
+def make_target(name, timer, retrieval=None):
+    """Build a target and return its handle(message) callable"""
+    if name == "supportbot":
+        from chatbot import SupportBot
+        bot = SupportBot()
+        bot.matcher.classify = timer.wrap("classify", bot.matcher.classify)
+        bot.log_conversation = timer.wrap("log", bot.log_conversation)
+
+        def handle(message):
+            response = bot.get_response(message)
+            bot.log_conversation(message, response)
+            return response
+        return handle
+
+    from advanced_chatbot import AdvancedSupportBot
+    from session_store import ConversationState
+    bot = AdvancedSupportBot(retrieval=retrieval)
+    # Build the NLP resources and FAQ index up front; start-up cost is reported by STARTUP_REPORT
+    bot.warm_up()
+    _instrument_advanced(bot, timer)
+
+    if name == "advanced":
+        local = threading.local()
+
+        def handle(message):
+            # One conversation per replay thread, like one visitor per worker
+            state = getattr(local, "state", None)
+            if state is None:
+                state = local.state = ConversationState()
+            response = bot.get_response(message, state)
+            bot.log_conversation(message, response, state)
+            return response
+        return handle
+
+    import app as app_module
+    # Swap in the freshly built bot so the route sees this run's knowledge base
+    app_module.bot = bot
+    clients = threading.local()
+
+    def handle(message):
+        client = getattr(clients, "client", None)
+        if client is None:
+            client = clients.client = app_module.app.test_client()
+        result = client.post("/api/chat", json={"message": message})
+        if result.status_code != 200:
+            raise RuntimeError(f"/api/chat returned {result.status_code}")
+        return result.get_json()["response"]
+    return handle
+
+
+def replay(handle, messages, timer, concurrency=1):
+    """Send every message through a target; returns the wall-clock seconds taken"""
+    timed = timer.wrap("total", handle)
+    start = time.perf_counter()
+    if concurrency <= 1:
+        for message in messages:
+            timed(message)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(timed, messages))
+    return time.perf_counter() - start
+
+
+def measure_allocations(handle, messages):
+    """Replay once under tracemalloc; returns per-message peak and retained bytes"""
+    tracemalloc.start()
+    try:
+        peaks = []
+        baseline, _ = tracemalloc.get_traced_memory()
+        for message in messages:
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            handle(message)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+        retained = tracemalloc.get_traced_memory()[0] - baseline
+    finally:
+        tracemalloc.stop()
+    peaks.sort()
+    return {
+        "peak_p50_kb": percentile(peaks, 0.50) / 1024,
+        "peak_max_kb": (peaks[-1] if peaks else 0) / 1024,
+        "retained_kb": retained / 1024,
+    }
+
+
+def run_benchmark(target, messages, retrieval=None, repeat=1, warmup=True, concurrency=1, allocations=True):
+    """Benchmark one target; the first pass warms up lazy loading unless warmup is False"""
+    timer = StageTimer()
+    handle = make_target(target, timer, retrieval)
+
+    if warmup and messages:
+        handle(messages[0])
+        timer.durations.clear()
+
+    workload = messages * repeat
+    elapsed = replay(handle, workload, timer, concurrency)
+    result = {
+        "target": target,
+        "messages": len(workload),
+        "seconds": elapsed,
+        "throughput_per_s": len(workload) / elapsed if elapsed else 0.0,
+        "stages": timer.summary(),
+    }
+    if allocations:
+        result["allocations"] = measure_allocations(handle, messages)
+    return result
+
+
+def print_result(result):
+    print(f"  {result['target']}: {result['messages']} messages in {result['seconds']:.2f}s "
+          f"({result['throughput_per_s']:.1f}/s)")
+    for stage, stats in result["stages"].items():
+        print(f"    {stage:<10} n={stats['count']:<6} p50={stats['p50_ms']:8.2f}ms "
+              f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms")
+    allocations = result.get("allocations")
+    if allocations:
+        print(f"    allocations: per-message peak p50={allocations['peak_p50_kb']:.1f}KB "
+              f"max={allocations['peak_max_kb']:.1f}KB, retained {allocations['retained_kb']:.1f}KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay logged conversations through the support bots")
+    parser.add_argument("--log-dir", default=os.path.join(REPO_DIR, "logs"),
+                        help="directory with conversation_*.json(l) files to replay")
+    parser.add_argument("--knowledge-base", default=os.path.join(REPO_DIR, "knowledge_base.json"),
+                        help="knowledge base the synthetic ones are grown from")
+    parser.add_argument("--targets", default=",".join(TARGETS),
+                        help=f"comma separated subset of {', '.join(TARGETS)}")
+    parser.add_argument("--kb-sizes", default="",
+                        help="comma separated FAQ counts, e.g. 10,1000,50000 (default: the real knowledge base)")
+    parser.add_argument("--retrieval", default=None,
+                        help="FAQ retrieval for the advanced bot: index, overlap, tfidf or bm25")
+    parser.add_argument("--llm-profile", default="fast", choices=sorted(LLM_PROFILES))
+    parser.add_argument("--llm-latency-ms", type=float, help="override the profile's mean latency")
+    parser.add_argument("--llm-error-rate", type=float, help="override the profile's error rate")
+    parser.add_argument("--llm-cache", action="store_true",
+                        help="keep the LLM response cache on (off by default so every fallback hits the stub)")
+    parser.add_argument("--limit", type=int, help="replay at most this many logged messages")
+    parser.add_argument("--repeat", type=int, default=1, help="replay the messages this many times")
+    parser.add_argument("--concurrency", type=int, default=1, help="replay threads")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    unknown = set(targets) - set(TARGETS)
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(sorted(unknown))}")
+
+    messages = load_replay_messages(args.log_dir, args.limit)
+    if not messages:
+        print(f"No logged messages found in {args.log_dir}")
+        return 1
+
+    with open(args.knowledge_base, 'r') as f:
+        base_knowledge_base = json.load(f)
+    kb_sizes = [int(size) for size in args.kb_sizes.split(",") if size.strip()] or [None]
+
+    profile = dict(LLM_PROFILES[args.llm_profile])
+    if args.llm_latency_ms is not None:
+        profile["latency"] = args.llm_latency_ms / 1000
+    if args.llm_error_rate is not None:
+        profile["error_rate"] = args.llm_error_rate
+    stub = StubLLMServer(seed=args.seed, **profile).start()
+
+    # Point the LLM client at the stub before anything creates it
+    os.environ["OPENROUTER_API_URL"] = stub.url
+    os.environ["OPENROUTER_API_KEY"] = "benchmark"
+    os.environ.pop("KNOWLEDGE_BASE_DB", None)
+    if not args.llm_cache:
+        os.environ["LLM_CACHE_SIZE"] = "0"
+        os.environ.pop("LLM_CACHE_PATH", None)
+
+    workdir = tempfile.mkdtemp(prefix="supportbot-benchmark-")
+    previous_dir = os.getcwd()
+    sys.path.insert(0, REPO_DIR)
+    shutil.copytree(os.path.join(REPO_DIR, "templates"), os.path.join(workdir, "templates"))
+    os.chdir(workdir)
+
+    results = []
+    try:
+        print(f"Replaying {len(messages)} logged messages, LLM stub profile {args.llm_profile} {profile}")
+        for size in kb_sizes:
+            knowledge_base = base_knowledge_base
+            if size is not None:
+                knowledge_base = synthetic_knowledge_base(base_knowledge_base, size, args.seed)
+            with open("knowledge_base.json", 'w') as f:
+                json.dump(knowledge_base, f)
+            faq_count = len(knowledge_base.get("faq", {}))
+            print(f"\nKnowledge base with {faq_count} FAQs")
+
+            for target in targets:
+                calls_before = stub.calls
+                result = run_benchmark(target, messages, retrieval=args.retrieval, repeat=args.repeat,
+                                       concurrency=args.concurrency, allocations=not args.no_allocations)
+                result["faq_count"] = faq_count
+                result["llm_calls"] = stub.calls - calls_before
+                results.append(result)
+                print_result(result)
+    finally:
+        # Log writers use paths relative to the working directory, so flush them before leaving it
+        close_log_writers()
+        os.chdir(previous_dir)
+        stub.stop()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({"profile": profile, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,8 @@
 from chatbot import SupportBot
+from nlp_resources import record_timing, report_startup
+import os
 import sys
+import time
 
 def print_colored(text, color_code):
     """Print text with color for better UI"""
@@ -13,7 +16,11 @@ def main():
     print_colored("="*50, "1;34")
     
     # Initialize the chatbot
+    start = time.perf_counter()
     bot = SupportBot(name="SupportBot")
+    record_timing("bot_init", time.perf_counter() - start)
+    if os.getenv("STARTUP_REPORT") == "1":
+        report_startup()
     
     # Print a greeting
     print_colored(f"Bot: {bot.get_response('hello')}", "1;36")
@@ -4,19 +4,42 @@ import datetime
 import json
 import os
 
+from conversation_log import get_log_writer
+from fuzzy_index import FuzzyIndex
+from keyword_matcher import KeywordMatcher
+
+GREETING_WORDS = ["hello", "hi", "hey", "greetings"]
+GOODBYE_WORDS = ["bye", "goodbye", "see you", "thank you", "thanks"]
+
+# Greetings win over goodbyes, which win over FAQs (in knowledge base order)
+GREETING_PRIORITY = 0
+GOODBYE_PRIORITY = 1
+FAQ_PRIORITY = 2
+
 class SupportBot:
-    def __init__(self, name="Support Bot"):
+    def __init__(self, name="Support Bot", log_writer=None, knowledge_base_path="knowledge_base.json"):
         self.name = name
+        self.knowledge_base_path = knowledge_base_path
         self.user_name = None
         self.conversation_log = []
+        self.log_writer = log_writer or get_log_writer()
         
         # Load responses from knowledge base
         self.responses = self._load_knowledge_base()
+        
+        # Compile greetings, goodbyes and FAQ keywords into one matcher
+        self.matcher = self._build_matcher()
+        
+        # Corrects typos like "shiping" when nothing matched as written
+        self.fuzzy_index = None
+        if os.getenv("FUZZY_MATCHING", "1") != "0":
+            self.fuzzy_index = FuzzyIndex()
+            self.fuzzy_index.build(self.responses["faq"])
     
     def _load_knowledge_base(self):
         """Load responses from knowledge base file"""
         try:
-            with open('knowledge_base.json', 'r') as f:
+            with open(self.knowledge_base_path, 'r') as f:
                 return json.load(f)
         except FileNotFoundError:
             # Default responses if file doesn't exist
@@ -38,10 +61,24 @@ class SupportBot:
                 }
             }
     
+    def _build_matcher(self):
+        """Build the multi-pattern matcher used to classify messages in a single pass"""
+        matcher = KeywordMatcher()
+        for word in GREETING_WORDS:
+            matcher.add(word, ("greeting", None), GREETING_PRIORITY)
+        for word in GOODBYE_WORDS:
+            matcher.add(word, ("goodbye", None), GOODBYE_PRIORITY)
+        for position, keyword in enumerate(self.responses["faq"]):
+            matcher.add(keyword, ("faq", keyword), FAQ_PRIORITY + position)
+        return matcher
+    
     def save_knowledge_base(self):
         """Save the current knowledge base to file"""
-        with open('knowledge_base.json', 'w') as f:
+        # Write a temporary file and swap it in so readers never see a half-written file
+        tmp_path = f"{self.knowledge_base_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
             json.dump(self.responses, f, indent=4)
+        os.replace(tmp_path, self.knowledge_base_path)
     
     def log_conversation(self, user_input, bot_response):
         """Log the conversation for later analysis"""
@@ -55,29 +92,8 @@ class SupportBot:
         
         self.conversation_log.append(log_entry)
         
-        # Save conversation log to file
-        log_dir = "logs"
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
-            
-        log_file = f"{log_dir}/conversation_{datetime.datetime.now().strftime('%Y%m%d')}.json"
-        
-        try:
-            # Try to load existing logs
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    logs = json.load(f)
-            else:
-                logs = []
-            
-            # Append new log
-            logs.append(log_entry)
-            
-            # Save updated logs
-            with open(log_file, 'w') as f:
-                json.dump(logs, f, indent=4)
-        except Exception as e:
-            print(f"Warning: Could not save conversation log: {e}")
+        # Hand the entry to the append-only writer; it's written in the background
+        self.log_writer.write(log_entry)
     
     def get_response(self, user_input):
         """Generate a response based on user input"""
@@ -99,18 +115,19 @@ class SupportBot:
             response = random.choice(self.responses["name_acknowledge"]).format(user_name=self.user_name)
             return response
         
-        # Check for greetings
-        if any(word in user_input_lower for word in ["hello", "hi", "hey", "greetings"]):
-            return random.choice(self.responses["greeting"]).format(bot_name=self.name)
-            
-        # Check for goodbyes
-        if any(word in user_input_lower for word in ["bye", "goodbye", "see you", "thank you", "thanks"]):
-            return random.choice(self.responses["goodbye"])
-        
-        # Check for FAQs
-        for keyword, responses in self.responses["faq"].items():
-            if keyword in user_input_lower:
-                return random.choice(responses)
+        # Check for greetings, goodbyes and FAQs in one pass over the message
+        label, _ = self.matcher.classify(user_input_lower)
+        if label is None and self.fuzzy_index is not None:
+            corrected, changed = self.fuzzy_index.correct(user_input_lower)
+            if changed:
+                label, _ = self.matcher.classify(corrected)
+        if label is not None:
+            intent, keyword = label
+            if intent == "greeting":
+                return random.choice(self.responses["greeting"]).format(bot_name=self.name)
+            if intent == "goodbye":
+                return random.choice(self.responses["goodbye"])
+            return random.choice(self.responses["faq"][keyword])
         
         # Fallback response if no match is found
         return random.choice(self.responses["fallback"])
@@ -119,7 +136,11 @@ class SupportBot:
         """Add a new FAQ to the knowledge base"""
         if keyword not in self.responses["faq"]:
             self.responses["faq"][keyword] = []
+            # Only the new keyword goes into the matcher; existing patterns are kept
+            self.matcher.add(keyword, ("faq", keyword), FAQ_PRIORITY + len(self.responses["faq"]) - 1)
         
         self.responses["faq"][keyword].append(response)
+        if self.fuzzy_index is not None:
+            self.fuzzy_index.update(keyword, self.responses["faq"][keyword])
         self.save_knowledge_base()
         return f"Added new response for '{keyword}'" 
\ No newline at end of file
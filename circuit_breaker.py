@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop calling an upstream that keeps failing, and probe it until it recovers
+
+    The outcome of the last `window` calls is kept; calls slower than
+    slow_call_seconds count as failures too. Once at least min_calls are in
+    the window and the failure rate reaches failure_threshold the breaker
+    opens and allow() returns False, so callers can fall back immediately.
+    After open_seconds it half-opens and lets `probes` calls through: one
+    success closes it again, a failure opens it for another open_seconds.
+    """
+
+    def __init__(self, window=20, min_calls=5, failure_threshold=0.5, slow_call_seconds=10.0,
+                 open_seconds=30.0, probes=1, clock=time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.probes = probes
+        self.clock = clock
+
+        self.state = CLOSED
+        self.opened_at = None
+        self.times_opened = 0
+        self.rejected = 0
+        self._outcomes = deque(maxlen=window)
+        self._probes_in_flight = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go upstream now; every allowed call must be followed by record()"""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.open_seconds:
+                    self.rejected += 1
+                    return False
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    self.rejected += 1
+                    return False
+                self._probes_in_flight += 1
+            return True
+
+    def record(self, success, seconds=0.0):
+        """Report how an allowed call went"""
+        failed = not success or seconds > self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed:
+                    self._open()
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                return
+
+            if self.state == OPEN:
+                # A call that started before the breaker opened; it doesn't change anything
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls and self._failure_rate() >= self.failure_threshold:
+                self._open()
+
+    def cancel(self):
+        """Give back an allowed call that ended without telling anything about the upstream"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    def _failure_rate(self):
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def is_open(self):
+        """True while calls are being turned away (open, or half-open with its probes in use)"""
+        with self._lock:
+            if self.state == OPEN:
+                return self.clock() - self.opened_at < self.open_seconds
+            return self.state == HALF_OPEN and self._probes_in_flight >= self.probes
+
+    def reset(self):
+        with self._lock:
+            self.state = CLOSED
+            self.opened_at = None
+            self._outcomes.clear()
+            self._probes_in_flight = 0
+
+    def snapshot(self):
+        """The breaker's state as a JSON-friendly dict"""
+        with self._lock:
+            retry_in = None
+            if self.state == OPEN:
+                retry_in = max(0.0, self.open_seconds - (self.clock() - self.opened_at))
+            return {
+                "state": self.state,
+                "failure_rate": round(self._failure_rate(), 3),
+                "recent_calls": len(self._outcomes),
+                "retry_in_seconds": retry_in,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,315 @@
+import atexit
+import datetime
+import glob
+import json
+import os
+import queue
+import re
+import threading
+
+FSYNC_POLICIES = ("never", "batch", "always")
+
+# conversation_YYYYMMDD.json (legacy array) or conversation_YYYYMMDD[.N].jsonl
+LOG_FILE_PATTERN = re.compile(r"^conversation_(\d{8})(?:\.(\d+))?\.(jsonl|json)$")
+
+
+class ConversationLogWriter:
+    """Append-only JSON Lines conversation log with a background writer thread
+
+    Entries are queued by the request threads and written in batches by a
+    single writer thread, so a chat request never reads or rewrites the log
+    file. Each batch goes out as one O_APPEND write, which keeps lines intact
+    when several worker processes share the same log directory.
+
+    Files are named conversation_YYYYMMDD.jsonl and rotate when the day changes
+    or when a file grows past max_file_bytes (conversation_YYYYMMDD.1.jsonl, ...).
+    """
+
+    def __init__(self, log_dir="logs", max_queue_size=10000, batch_size=100,
+                 flush_interval=1.0, fsync="batch", max_file_bytes=50 * 1024 * 1024,
+                 put_timeout=0.1):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+
+        self.log_dir = log_dir
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_file_bytes = max_file_bytes
+        self.put_timeout = put_timeout
+
+        self.written = 0
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+        self._fd = None
+        self._day = None
+        self._segment = 0
+
+    def write(self, entry):
+        """Queue a log entry; returns False if it had to be dropped"""
+        if self._closed:
+            return False
+
+        self._ensure_thread()
+        day = datetime.datetime.now().strftime('%Y%m%d')
+        try:
+            self._queue.put((day, entry), timeout=self.put_timeout)
+        except queue.Full:
+            self.dropped += 1
+            print("Warning: Conversation log queue is full, dropping entry")
+            return False
+        return True
+
+    def flush(self):
+        """Block until everything queued so far has been written"""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Flush pending entries and stop the writer thread"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._close_file()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(), so a forked worker starts its own writer
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._fd = None
+            self._day = None
+            self._thread = threading.Thread(target=self._run, name="conversation-log-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            if item is None:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    # Put the stop marker back so it's seen after this batch
+                    self._queue.task_done()
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Warning: Could not save conversation log: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch):
+        # Group consecutive entries by day so a batch never straddles a rotation
+        lines = []
+        current_day = batch[0][0]
+        for day, entry in batch:
+            if day != current_day:
+                self._append(current_day, lines)
+                lines = []
+                current_day = day
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._append(current_day, lines)
+
+    def _append(self, day, lines):
+        if not lines:
+            return
+
+        if self.fsync == "always":
+            for line in lines:
+                self._write_data(day, line.encode("utf-8"))
+                os.fsync(self._fd)
+        else:
+            self._write_data(day, "".join(lines).encode("utf-8"))
+            if self.fsync == "batch":
+                os.fsync(self._fd)
+
+        self.written += len(lines)
+
+    def _write_data(self, day, data):
+        self._open_for(day, len(data))
+        os.write(self._fd, data)
+
+    def _open_for(self, day, incoming_bytes):
+        if self._fd is not None and self._day == day:
+            size = os.fstat(self._fd).st_size
+            if not size or size + incoming_bytes <= self.max_file_bytes:
+                return
+            self._close_file()
+            self._segment += 1
+        else:
+            self._close_file()
+            self._day = day
+            self._segment = self._latest_segment(day)
+
+        if not os.path.exists(self.log_dir):
+            os.makedirs(self.log_dir, exist_ok=True)
+
+        self._fd = os.open(self._segment_path(day, self._segment),
+                           os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _latest_segment(self, day):
+        segment = 0
+        for path in glob.glob(os.path.join(self.log_dir, f"conversation_{day}*.jsonl")):
+            match = LOG_FILE_PATTERN.match(os.path.basename(path))
+            if match and match.group(2):
+                segment = max(segment, int(match.group(2)))
+        return segment
+
+    def _segment_path(self, day, segment):
+        if segment:
+            return os.path.join(self.log_dir, f"conversation_{day}.{segment}.jsonl")
+        return os.path.join(self.log_dir, f"conversation_{day}.jsonl")
+
+    def _close_file(self):
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+
+def iter_conversation_log(path):
+    """Yield the entries of one log file, either JSON Lines or a legacy JSON array"""
+    if path.endswith(".jsonl"):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn final line from a crash shouldn't hide the rest of the file
+                    continue
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from _iter_json_array(f)
+
+
+# Characters that can continue a JSON number, so "12." or "1e" at a chunk's end may not be the whole of it
+_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def _iter_json_array(f, chunk_size=64 * 1024):
+    # Decodes a top-level JSON array one element at a time, so a large legacy
+    # file is never held in memory all at once
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Skip whitespace, the opening bracket and the commas between elements
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in ",["):
+            if buffer[position] == "[":
+                if started:
+                    break
+                started = True
+            position += 1
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                entry, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number running up to the buffer's end (as "12" of "12.5", or "12." with
+                # its "." unparsed) may be cut short, so it waits for the next chunk
+                cut_short = (isinstance(entry, (int, float)) and not isinstance(entry, bool)
+                             and all(char in _NUMBER_CHARS for char in buffer[end:]))
+                if eof or not cut_short:
+                    yield entry
+                    position = end
+                    continue
+        if eof:
+            return
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_conversation_log(path):
+    """Load all entries from one log file"""
+    return list(iter_conversation_log(path))
+
+
+def conversation_log_files(log_dir="logs", day=None):
+    """List log files in chronological order, legacy files before JSON Lines segments"""
+    files = []
+    for path in glob.glob(os.path.join(log_dir, "conversation_*")):
+        match = LOG_FILE_PATTERN.match(os.path.basename(path))
+        if not match:
+            continue
+        if day and match.group(1) != day:
+            continue
+        legacy = match.group(3) == "json"
+        files.append((match.group(1), not legacy, int(match.group(2) or 0), path))
+    return [path for _, _, _, path in sorted(files)]
+
+
+def load_conversation_logs(log_dir="logs", day=None):
+    """Load entries from every log file in a directory (optionally one YYYYMMDD day)"""
+    entries = []
+    for path in conversation_log_files(log_dir, day):
+        entries.extend(iter_conversation_log(path))
+    return entries
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_log_writer(log_dir="logs"):
+    """Return the process-wide writer for a log directory"""
+    with _writers_lock:
+        writer = _writers.get(log_dir)
+        if writer is None:
+            writer = ConversationLogWriter(
+                log_dir=log_dir,
+                fsync=os.getenv("CONVERSATION_LOG_FSYNC", "batch"),
+            )
+            _writers[log_dir] = writer
+        return writer
+
+
+@atexit.register
+def close_log_writers():
+    """Flush and close every writer created through get_log_writer"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
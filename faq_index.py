@@ -0,0 +1,130 @@
+from collections import Counter
+
+
+class FAQIndex:
+    """Precompiled inverted index over the FAQ section of the knowledge base
+
+    Each FAQ keyword is analyzed once (keyword text plus all of its responses)
+    into term counts, and an inverted term -> keywords postings map is kept so
+    that a query only gets scored against FAQs sharing at least one term with it.
+    Scores are the Dice coefficient of term counts, or plain word overlap with use_sets.
+    """
+
+    def __init__(self, analyzer, use_sets=False):
+        # analyzer turns raw text into a list of normalized tokens
+        self.analyzer = analyzer
+        # use_sets selects the plain word-overlap score used when NLTK is missing
+        self.use_sets = use_sets
+        self.term_counts = {}
+        self.term_totals = {}
+        self.postings = {}
+        self._order = {}
+        self._next_ordinal = 0
+
+    def __len__(self):
+        return len(self.term_counts)
+
+    def __contains__(self, keyword):
+        return keyword in self.term_counts
+
+    def build(self, faqs, term_counts=None):
+        """Index every FAQ in a keyword -> responses mapping
+
+        term_counts optionally maps keywords to already analyzed term counts
+        (from a knowledge base snapshot); other FAQs are analyzed as usual.
+        """
+        self.term_counts = {}
+        self.term_totals = {}
+        self.postings = {}
+        self._order = {}
+        self._next_ordinal = 0
+        term_counts = term_counts or {}
+        for keyword, responses in faqs.items():
+            self.update(keyword, responses, term_counts.get(keyword))
+
+    def update(self, keyword, responses, counts=None):
+        """(Re)index a single FAQ after it was added or changed"""
+        self._remove_postings(keyword)
+
+        if counts is None:
+            # Combine the keyword with its responses for better matching
+            keyword_text = keyword + " " + " ".join(responses)
+            counts = Counter(self.analyzer(keyword_text))
+
+        if keyword not in self._order:
+            self._order[keyword] = self._next_ordinal
+            self._next_ordinal += 1
+
+        self.term_counts[keyword] = counts
+        self.term_totals[keyword] = sum(counts.values())
+        # Postings are replaced rather than mutated so concurrent queries never see a set change size
+        for term in counts:
+            self.postings[term] = self.postings.get(term, frozenset()) | {keyword}
+
+    def remove(self, keyword):
+        """Drop a FAQ from the index"""
+        self._remove_postings(keyword)
+        self.term_counts.pop(keyword, None)
+        self.term_totals.pop(keyword, None)
+        self._order.pop(keyword, None)
+
+    def _remove_postings(self, keyword):
+        counts = self.term_counts.get(keyword)
+        if not counts:
+            return
+        for term in counts:
+            keywords = self.postings.get(term)
+            if keywords is None:
+                continue
+            keywords = keywords - {keyword}
+            if keywords:
+                self.postings[term] = keywords
+            else:
+                del self.postings[term]
+
+    def candidates(self, query_tokens):
+        """Return the FAQ keywords sharing a term with the query, in knowledge base order"""
+        found = set()
+        for term in set(query_tokens):
+            found.update(self.postings.get(term, ()))
+        return sorted(found, key=self._order.__getitem__)
+
+    def score(self, query_tokens, keyword, query_counts=None):
+        """Similarity between analyzed query tokens and one indexed FAQ"""
+        counts = self.term_counts.get(keyword)
+        if not query_tokens or not counts:
+            return 0.0
+
+        if self.use_sets:
+            query_terms = set(query_tokens)
+            overlap = sum(1 for term in query_terms if term in counts)
+            return overlap / min(len(query_terms), len(counts))
+
+        if query_counts is None:
+            query_counts = Counter(query_tokens)
+
+        # Sum of minimum counts for each common word
+        sum_common = sum(min(count, counts[term]) for term, count in query_counts.items() if term in counts)
+        if not sum_common:
+            return 0.0
+
+        total_words = sum(query_counts.values()) + self.term_totals[keyword]
+        return 2.0 * sum_common / total_words
+
+    def best_match(self, query_tokens, threshold=0.2):
+        """Find the best scoring FAQ above the threshold for analyzed query tokens"""
+        best_similarity = 0.0
+        best_keyword = None
+        query_counts = Counter(query_tokens)
+
+        for keyword in self.candidates(query_tokens):
+            similarity = self.score(query_tokens, keyword, query_counts)
+            if similarity > best_similarity and similarity > threshold:
+                best_similarity = similarity
+                best_keyword = keyword
+
+        return best_keyword, best_similarity
+
+    def best_matches(self, token_lists, threshold=0.2):
+        """Best (keyword, similarity) above the threshold for each analyzed query"""
+        return [self.best_match(query_tokens, threshold) for query_tokens in token_lists]
@@ -0,0 +1,253 @@
+"""
+Vectorized FAQ retrieval over a sparse term-document matrix
+
+Drop-in alternative to FAQIndex that scores a query, or a whole batch of
+queries, against every FAQ in a few sparse matrix products. Scoring methods:
+
+- "overlap": the same Dice / word-overlap score as FAQIndex, so
+  the existing 0.2 threshold behaves exactly as before
+- "tfidf": cosine similarity of smoothed TF-IDF vectors
+- "bm25": Okapi BM25, normalized by the best score the query could reach so
+  it lives on the same 0..1 scale as the other methods
+"""
+import threading
+from collections import Counter
+
+try:
+    import numpy as np
+    from scipy import sparse
+    VECTOR_AVAILABLE = True
+except ImportError:
+    VECTOR_AVAILABLE = False
+
+SCORING_METHODS = ("overlap", "tfidf", "bm25")
+
+
+class VectorFAQIndex:
+    """FAQ corpus held as a sparse term-document matrix and scored with NumPy/SciPy"""
+
+    def __init__(self, analyzer, method="bm25", use_sets=False, k1=1.2, b=0.75):
+        if not VECTOR_AVAILABLE:
+            raise ImportError("VectorFAQIndex needs numpy and scipy: pip install numpy scipy")
+        if method not in SCORING_METHODS:
+            raise ValueError(f"method must be one of {SCORING_METHODS}, got {method!r}")
+
+        self.analyzer = analyzer
+        self.method = method
+        # use_sets selects the plain word-overlap score used when NLTK is missing
+        self.use_sets = use_sets
+        self.k1 = k1
+        self.b = b
+
+        self.keywords = []
+        self.term_counts = {}
+        self.vocabulary = {}
+        self._positions = {}
+        self._compiled = None
+        # Held while the corpus changes and while it is compiled, so a compile
+        # never sees a keyword whose counts or vocabulary aren't in place yet
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def __contains__(self, keyword):
+        return keyword in self._positions
+
+    def build(self, faqs, term_counts=None):
+        """Index every FAQ in a keyword -> responses mapping, reusing any already analyzed term counts"""
+        term_counts = term_counts or {}
+        analyzed = [(keyword, term_counts.get(keyword) or self._analyze(keyword, responses))
+                    for keyword, responses in faqs.items()]
+        with self._lock:
+            self.keywords = []
+            self.term_counts = {}
+            self.vocabulary = {}
+            self._positions = {}
+            for keyword, counts in analyzed:
+                self._add(keyword, counts)
+            self._compiled = None
+
+    def update(self, keyword, responses):
+        """(Re)index a single FAQ; the matrix is rebuilt on the next query"""
+        counts = self._analyze(keyword, responses)
+        with self._lock:
+            self._add(keyword, counts)
+            self._compiled = None
+
+    def remove(self, keyword):
+        with self._lock:
+            if keyword not in self._positions:
+                return
+            self.keywords.remove(keyword)
+            del self.term_counts[keyword]
+            self._positions = {kw: position for position, kw in enumerate(self.keywords)}
+            self._compiled = None
+
+    def _analyze(self, keyword, responses):
+        # Combine the keyword with its responses for better matching
+        return Counter(self.analyzer(keyword + " " + " ".join(responses)))
+
+    def _add(self, keyword, counts):
+        # Vocabulary and counts go in before the keyword, under the lock
+        for term in counts:
+            if term not in self.vocabulary:
+                self.vocabulary[term] = len(self.vocabulary)
+        self.term_counts[keyword] = counts
+        if keyword not in self._positions:
+            self._positions[keyword] = len(self.keywords)
+            self.keywords.append(keyword)
+
+    def _compile(self):
+        """Return the compiled matrices, building them if the FAQs changed"""
+        compiled = self._compiled
+        if compiled is None:
+            with self._lock:
+                # An update may have landed, or another thread compiled, while we waited
+                compiled = self._compiled
+                if compiled is None:
+                    compiled = _CompiledCorpus(self)
+                    self._compiled = compiled
+        return compiled
+
+    def score_matrix(self, token_lists):
+        """Scores of each analyzed query (rows) against every FAQ (columns, in knowledge base order)"""
+        return self._compile().score(token_lists)[1]
+
+    def best_matches(self, token_lists, threshold=0.2):
+        """Best (keyword, similarity) above the threshold for each analyzed query"""
+        keywords, scores = self._compile().score(token_lists)
+        results = []
+        for row in scores:
+            if not len(row):
+                results.append((None, 0.0))
+                continue
+            # argmax keeps the first FAQ on ties, like the sequential scan did
+            position = int(np.argmax(row))
+            similarity = float(row[position])
+            if similarity > threshold:
+                results.append((keywords[position], similarity))
+            else:
+                results.append((None, 0.0))
+        return results
+
+    def best_match(self, query_tokens, threshold=0.2):
+        """Find the best scoring FAQ above the threshold for analyzed query tokens"""
+        return self.best_matches([query_tokens], threshold)[0]
+
+
+class _CompiledCorpus:
+    """Immutable snapshot of the term-document matrix and its weights
+
+    Updates swap in a new snapshot instead of modifying this one, so a query
+    running on another thread always scores against a consistent corpus.
+    """
+
+    def __init__(self, index):
+        self.method = index.method
+        self.use_sets = index.use_sets
+        self.k1 = index.k1
+        self.b = index.b
+        self.keywords = tuple(index.keywords)
+        self.vocabulary = dict(index.vocabulary)
+        self._levels = {}
+
+        rows, cols, values = [], [], []
+        for row, keyword in enumerate(self.keywords):
+            for term, count in index.term_counts[keyword].items():
+                rows.append(row)
+                cols.append(self.vocabulary[term])
+                values.append(count)
+
+        shape = (len(self.keywords), len(self.vocabulary))
+        self.matrix = sparse.csr_matrix((np.array(values, dtype=np.float64), (rows, cols)), shape=shape)
+        self.doc_totals = np.asarray(self.matrix.sum(axis=1)).ravel()
+        self.doc_unique = np.diff(self.matrix.indptr).astype(np.float64)
+        doc_freq = np.bincount(self.matrix.indices, minlength=shape[1]).astype(np.float64)
+
+        n_docs = len(self.keywords)
+        if self.method == "bm25":
+            self.idf = np.log1p((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            self.weights = self._bm25_weights()
+        elif self.method == "tfidf":
+            self.idf = np.log((1.0 + n_docs) / (1.0 + doc_freq)) + 1.0
+            self.weights = _normalize_rows(self.matrix.multiply(self.idf).tocsr())
+
+    def _bm25_weights(self):
+        # Saturated term frequency with document length normalization, times idf
+        avg_length = self.doc_totals.mean() if len(self.doc_totals) else 0.0
+        length_norm = self.k1 * (1 - self.b + self.b * self.doc_totals / (avg_length or 1.0))
+        coo = self.matrix.tocoo()
+        saturated = coo.data * (self.k1 + 1) / (coo.data + length_norm[coo.row])
+        weights = sparse.csr_matrix((saturated, (coo.row, coo.col)), shape=self.matrix.shape)
+        return weights.multiply(self.idf).tocsr()
+
+    def _level(self, level):
+        # Indicator of "term occurs at least `level` times" in each FAQ
+        matrix = self._levels.get(level)
+        if matrix is None:
+            matrix = (self.matrix >= level).astype(np.float64)
+            self._levels[level] = matrix
+        return matrix
+
+    def _query_matrix(self, token_lists):
+        rows, cols, values = [], [], []
+        totals = np.zeros(len(token_lists))
+        unique = np.zeros(len(token_lists))
+        for row, tokens in enumerate(token_lists):
+            counts = Counter(tokens)
+            totals[row] = len(tokens)
+            unique[row] = len(counts)
+            for term, count in counts.items():
+                col = self.vocabulary.get(term)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(count)
+        shape = (len(token_lists), len(self.vocabulary))
+        queries = sparse.csr_matrix((np.array(values, dtype=np.float64), (rows, cols)), shape=shape)
+        return queries, totals, unique
+
+    def score(self, token_lists):
+        """Return (keywords, scores) with one row of scores per analyzed query"""
+        if not self.keywords or not token_lists:
+            return self.keywords, np.zeros((len(token_lists), len(self.keywords)))
+
+        queries, totals, unique = self._query_matrix(token_lists)
+
+        if self.method == "overlap":
+            if self.use_sets:
+                overlap = ((queries > 0).astype(np.float64) @ self._level(1).T).toarray()
+                denominator = np.minimum(unique[:, None], self.doc_unique[None, :])
+                return self.keywords, _divide(overlap, denominator)
+
+            # min(a, b) over counts is the number of levels k where both are >= k,
+            # which turns the Dice numerator into a sum of sparse products
+            common = np.zeros((len(token_lists), len(self.keywords)))
+            max_count = int(queries.data.max()) if queries.nnz else 0
+            for level in range(1, max_count + 1):
+                query_level = (queries >= level).astype(np.float64)
+                common += (query_level @ self._level(level).T).toarray()
+            denominator = totals[:, None] + self.doc_totals[None, :]
+            return self.keywords, _divide(2.0 * common, denominator)
+
+        if self.method == "tfidf":
+            weighted = _normalize_rows(queries.multiply(self.idf).tocsr())
+            return self.keywords, (weighted @ self.weights.T).toarray()
+
+        # bm25: each query term counts once; the best possible score is every term at full weight
+        present = (queries > 0).astype(np.float64)
+        scores = (present @ self.weights.T).toarray()
+        ceiling = present @ (self.idf * (self.k1 + 1))
+        return self.keywords, _divide(scores, np.asarray(ceiling).reshape(-1, 1))
+
+
+def _normalize_rows(matrix):
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags(1.0 / norms) @ matrix).tocsr()
+
+
+def _divide(numerator, denominator):
+    denominator = np.broadcast_to(denominator, numerator.shape)
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0)
@@ -0,0 +1,183 @@
+import re
+
+_WORD = re.compile(r"[a-z0-9]+")
+_VOWELS = set("aeiouy")
+
+
+def trigrams(word):
+    """Character trigrams of a word padded with boundary markers ("hrs" -> $hr, hrs, rs$)"""
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a, b, limit):
+    """Edit distance (insertions, deletions, substitutions and adjacent swaps) or limit + 1 if above limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = current[0]
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous_previous is not None and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        # Every later row is at least this row's minimum, so stop once it's over the limit
+        if row_min > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def looks_abbreviated(word):
+    """Short words with no vowels after the first letter, such as hrs or pmt"""
+    # Two-letter words (of, it, us) are far more often real words than abbreviations
+    return 3 <= len(word) <= 5 and word.isalpha() and not any(char in _VOWELS for char in word[1:])
+
+
+def is_abbreviation(short, word):
+    """True if short is an abbreviation of word, like "hrs" for hours or "pmt" for payment"""
+    if len(short) >= len(word) or short[0] != word[0] or not looks_abbreviated(short):
+        return False
+    # Every letter of the abbreviation appears in order in the word
+    remaining = iter(word)
+    return all(char in remaining for char in short)
+
+
+class FuzzyIndex:
+    """Character-trigram index over the words used in the FAQs, for correcting typos
+
+    A misspelt query word is only compared with vocabulary words sharing
+    enough trigrams with it (so lookups never scan the whole vocabulary),
+    and a candidate is accepted when its edit distance is within the limit
+    for the word's length. correct() rewrites a query with the corrections;
+    match_keyword() then finds the FAQ whose keyword the corrected query
+    contains, and the regular FAQ matching can run on it too.
+    """
+
+    def __init__(self, min_word_length=3, stop_words=()):
+        self.min_word_length = min_word_length
+        self.stop_words = set(stop_words)
+        # word -> how many FAQ texts use it; trigram -> words containing it; first letter -> words
+        self.word_counts = {}
+        self.postings = {}
+        self.initials = {}
+        # keyword word -> FAQ keywords using it, and each keyword's words and position
+        self.keyword_postings = {}
+        self.keyword_words = {}
+
+    def __len__(self):
+        return len(self.word_counts)
+
+    def __contains__(self, word):
+        return word in self.word_counts
+
+    def build(self, faqs):
+        """Index the words of every FAQ keyword and response"""
+        self.word_counts = {}
+        self.postings = {}
+        self.initials = {}
+        self.keyword_postings = {}
+        self.keyword_words = {}
+        for keyword, responses in faqs.items():
+            self.update(keyword, responses)
+
+    def update(self, keyword, responses):
+        """Add the words of one FAQ; words are never removed, so stale ones just stay correctable"""
+        if keyword not in self.keyword_words:
+            words = tuple(_WORD.findall(keyword.lower()))
+            self.keyword_words[keyword] = (words, len(self.keyword_words))
+            for word in set(words):
+                self.keyword_postings[word] = self.keyword_postings.get(word, frozenset()) | {keyword}
+
+        text = (keyword + " " + " ".join(responses)).lower()
+        for word in set(_WORD.findall(text)):
+            if len(word) < self.min_word_length or word.isdigit():
+                continue
+            if word not in self.word_counts:
+                self.word_counts[word] = 0
+                for gram in trigrams(word):
+                    # Replaced rather than mutated so concurrent lookups never see a set change size
+                    self.postings[gram] = self.postings.get(gram, frozenset()) | {word}
+                self.initials[word[0]] = self.initials.get(word[0], frozenset()) | {word}
+            self.word_counts[word] += 1
+
+    @staticmethod
+    def max_distance(word):
+        """Typos allowed for a word of this length"""
+        if len(word) <= 3:
+            return 0
+        if len(word) <= 5:
+            return 1
+        return 2
+
+    def lookup(self, word):
+        """Best vocabulary word for a possibly misspelt word, or None"""
+        limit = self.max_distance(word)
+        grams = trigrams(word)
+
+        shared = {}
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        best = None
+        if limit:
+            # Each edit touches at most three trigrams, so fewer shared ones can't be within the limit
+            needed = max(1, len(grams) - 3 * limit)
+            for candidate, count in shared.items():
+                if count < needed or abs(len(candidate) - len(word)) > limit:
+                    continue
+                distance = bounded_edit_distance(word, candidate, limit)
+                if distance > limit:
+                    continue
+                rank = (distance, -count, -self.word_counts[candidate], candidate)
+                if best is None or rank < best[0]:
+                    best = (rank, candidate)
+        if best is not None:
+            return best[1]
+
+        # Abbreviations can share no trigrams with the full word, so check words with the same initial
+        if not looks_abbreviated(word):
+            return None
+        abbreviations = [candidate for candidate in self.initials.get(word[0], ())
+                         if is_abbreviation(word, candidate)]
+        if abbreviations:
+            return min(abbreviations, key=lambda candidate: (-self.word_counts[candidate], len(candidate), candidate))
+        return None
+
+    def correct(self, text):
+        """Return (corrected text, number of words changed) for a lowercased query"""
+        words = _WORD.findall(text.lower())
+        changed = 0
+        corrected = []
+        for word in words:
+            if word in self.word_counts or word in self.stop_words or word.isdigit() or len(word) < self.min_word_length:
+                corrected.append(word)
+                continue
+            replacement = self.lookup(word)
+            if replacement is None:
+                corrected.append(word)
+            else:
+                corrected.append(replacement)
+                changed += 1
+        return " ".join(corrected), changed
+
+    def match_keyword(self, text):
+        """The FAQ keyword whose words all appear in the text, preferring longer keywords; None if none do"""
+        words = set(_WORD.findall(text.lower()))
+        best = None
+        for word in words:
+            for keyword in self.keyword_postings.get(word, ()):
+                keyword_words, position = self.keyword_words[keyword]
+                if not words.issuperset(keyword_words):
+                    continue
+                rank = (-len(keyword_words), position)
+                if best is None or rank < best[0]:
+                    best = (rank, keyword)
+        return best[1] if best is not None else None
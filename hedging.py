@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeoutError, wait
+
+
+class Hedger:
+    """Send a backup request when the first one is slower than usual
+
+    The hedge delay is the given percentile of recent request latencies (or
+    initial_delay until min_samples have been seen). If the first attempt
+    hasn't answered by then, a second one starts and whichever returns a
+    result first wins; the other is cancelled. Each request earns max_ratio
+    of a hedge, up to `burst` saved up, so hedges never add more than about
+    max_ratio extra upstream calls however slow the upstream gets.
+
+    Attempts are callables returning a result, or None when they failed;
+    an exception counts as a failure too and is re-raised if nothing succeeds.
+    run() and run_async() return (result, outcome), where outcome is None when
+    no hedge was needed, "skipped" when the budget was used up, "unsent" when
+    hedge_attempt declined to start (returned False), or "won" or "lost".
+    """
+
+    def __init__(self, percentile=0.95, initial_delay=2.0, min_delay=0.05, window=200, min_samples=20,
+                 max_ratio=0.1, burst=5, clock=time.perf_counter):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.burst = burst
+        self.clock = clock
+
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self.hedges_skipped = 0
+        self._latencies = deque(maxlen=window)
+        self._credit = float(burst)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        """Seconds to wait for the first attempt before hedging"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = sorted(self._latencies)
+        index = min(len(latencies) - 1, int(self.percentile * len(latencies)))
+        return max(self.min_delay, latencies[index])
+
+    def record(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _record_success(self, result, started):
+        # Fast failures (rate limits, errors) would drag the percentile down
+        if result is not None:
+            self.record(self.clock() - started)
+
+    def _start_request(self):
+        with self._lock:
+            self.requests += 1
+            self._credit = min(self.burst, self._credit + self.max_ratio)
+
+    def allow_hedge(self):
+        """Spend a hedge from the budget if there is one"""
+        with self._lock:
+            if self._credit < 1:
+                self.hedges_skipped += 1
+                return False
+            self._credit -= 1
+            self.hedges += 1
+            return True
+
+    def _settle(self, future, hedge, started, outcome, error):
+        # Returns (result, outcome, first error) after one attempt finished
+        try:
+            result = future.result()
+        except Exception as e:
+            return None, outcome, error or e
+        if result is False:
+            # The hedge wasn't sent, so it's the first attempt or nothing
+            return None, "unsent", error
+        if result is not None:
+            self._record_success(result, started[future])
+            if future is hedge:
+                with self._lock:
+                    self.hedges_won += 1
+                outcome = "won"
+        return result, outcome, error
+
+    def run(self, attempt, hedge_attempt, executor, on_abandoned=None):
+        """Run attempt on executor, hedging with hedge_attempt; returns (result, outcome)
+
+        A request already on the wire can't be interrupted from another thread,
+        so a losing attempt is left to finish on the executor and its answer
+        dropped. When the hedge wins while the first attempt is still running,
+        on_abandoned(future) is called with the first attempt's future, so the
+        caller can keep accounting for that request until it finishes.
+        """
+        self._start_request()
+        started = {}
+
+        def submit(func):
+            future = executor.submit(func)
+            started[future] = self.clock()
+            return future
+
+        primary = submit(attempt)
+        try:
+            result = primary.result(timeout=self.delay())
+        except FutureTimeoutError:
+            pass
+        else:
+            self._record_success(result, started[primary])
+            return result, None
+
+        if not self.allow_hedge():
+            result = primary.result()
+            self._record_success(result, started[primary])
+            return result, "skipped"
+
+        hedge = submit(hedge_attempt)
+        pending = {primary, hedge}
+        outcome = "lost"
+        error = None
+        try:
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result, outcome, error = self._settle(future, hedge, started, outcome, error)
+                    if result is not None:
+                        return result, outcome
+        finally:
+            for future in pending:
+                if not future.cancel() and future is primary and on_abandoned is not None:
+                    on_abandoned(future)
+        if error is not None:
+            raise error
+        return None, outcome
+
+    async def run_async(self, attempt, hedge_attempt):
+        """Async variant of run, with coroutine functions; the losing request is really cancelled"""
+        self._start_request()
+        started = {}
+
+        def start(func):
+            task = asyncio.ensure_future(func())
+            started[task] = self.clock()
+            return task
+
+        primary = start(attempt)
+        pending = {primary}
+        hedge = None
+        outcome = None
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.delay())
+            if not done:
+                if self.allow_hedge():
+                    hedge = start(hedge_attempt)
+                    pending.add(hedge)
+                    outcome = "lost"
+                else:
+                    outcome = "skipped"
+                    done, pending = await asyncio.wait(pending)
+
+            while True:
+                for task in done:
+                    result, outcome, error = self._settle(task, hedge, started, outcome, error)
+                    if result is not None:
+                        return result, outcome
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if error is not None:
+                raise error
+            return None, outcome
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self):
+        """Current delay and hedge counts as a JSON-friendly dict"""
+        delay = self.delay()
+        with self._lock:
+            return {
+                "delay_seconds": round(delay, 3),
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+                "hedges_skipped": self.hedges_skipped,
+            }
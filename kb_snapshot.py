@@ -0,0 +1,255 @@
+"""
+Precompiled binary snapshot of the knowledge base
+
+Analyzing every FAQ (tokenizing and lemmatizing it with NLTK) is the slow
+part of building the FAQ index, and every worker used to repeat it. A
+snapshot stores the knowledge base together with each FAQ's analyzed term
+counts as a sparse term-document matrix (CSR: row pointers, term ids and
+counts as uint32 arrays). Workers memory-map it read-only and build their
+index from the mapped arrays without running NLTK. Only the analysis is
+skipped: the postings and weights are still built in each process. The
+section offsets and arrays are checked when the snapshot is opened, so a
+truncated or damaged file is ignored instead of failing a request.
+
+A snapshot records the size, modification time and SHA-1 of the JSON file
+it was built from, and the analyzer used. If the file's size or time
+changed, its contents are hashed and compared; if they or the analyzer no
+longer match, the snapshot is ignored and the bot loads the JSON file as
+usual. Each FAQ's digest is stored too, so FAQs changed after loading (by
+the SQLite store, say) are re-analyzed on their own.
+
+Build one after editing the knowledge base with:
+    python kb_snapshot.py build knowledge_base.json [knowledge_base.kbsnap]
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections import Counter
+
+MAGIC = b"SBKBSNAP"
+FORMAT_VERSION = 2
+_PREAMBLE = struct.Struct("<II")
+_ALIGNMENT = 8
+
+
+def snapshot_path(knowledge_base_path):
+    """Where the snapshot for a knowledge base file lives (knowledge_base.json -> knowledge_base.kbsnap)"""
+    return os.path.splitext(knowledge_base_path)[0] + ".kbsnap"
+
+
+def analyzer_name(nlp):
+    """Label for the analyzer in use; snapshots only apply to the analyzer they were built with"""
+    return "basic" if nlp is None else "nltk"
+
+
+def faq_digest(responses):
+    """Digest of one FAQ's responses, to tell whether they changed since the snapshot was built"""
+    return hashlib.sha1(json.dumps(responses, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _pad(length):
+    return (-length) % _ALIGNMENT
+
+
+def build_snapshot(knowledge_base_path, analyzer, analyzer_label, output_path=None):
+    """Analyze every FAQ with analyzer(text) -> tokens and write the snapshot; returns its path"""
+    output_path = output_path or snapshot_path(knowledge_base_path)
+    with open(knowledge_base_path, "rb") as f:
+        source = f.read()
+        stat = os.fstat(f.fileno())
+    responses = json.loads(source)
+
+    vocabulary = {}
+    indptr = array("I", [0])
+    indices = array("I")
+    data = array("I")
+    keywords = list(responses.get("faq", {}))
+    for keyword in keywords:
+        # The same text the FAQ indexes analyze: the keyword plus all of its responses
+        counts = Counter(analyzer(keyword + " " + " ".join(responses["faq"][keyword])))
+        for term, count in counts.items():
+            indices.append(vocabulary.setdefault(term, len(vocabulary)))
+            data.append(count)
+        indptr.append(len(indices))
+
+    sections = [
+        ("responses", source),
+        ("vocabulary", "\n".join(vocabulary).encode("utf-8")),
+        ("indptr", indptr.tobytes()),
+        ("indices", indices.tobytes()),
+        ("data", data.tobytes()),
+    ]
+    layout = {}
+    offset = 0
+    for name, payload in sections:
+        layout[name] = [offset, len(payload)]
+        offset += len(payload) + _pad(len(payload))
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "byteorder": sys.byteorder,
+        "analyzer": analyzer_label,
+        "source_sha1": hashlib.sha1(source).hexdigest(),
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "keywords": keywords,
+        "faq_digests": [faq_digest(responses["faq"][keyword]) for keyword in keywords],
+        "terms": len(vocabulary),
+        "sections": layout,
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }).encode("utf-8")
+
+    # Written next to the target and swapped in, so running workers never map a half-written file
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC + _PREAMBLE.pack(FORMAT_VERSION, len(header)) + header)
+        f.write(b"\0" * _pad(len(MAGIC) + _PREAMBLE.size + len(header)))
+        for name, payload in sections:
+            f.write(payload)
+            f.write(b"\0" * _pad(len(payload)))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+class KnowledgeBaseSnapshot:
+    """A snapshot file mapped read-only into memory"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a knowledge base snapshot")
+        if len(self._map) < len(MAGIC) + _PREAMBLE.size:
+            raise ValueError(f"{path} is truncated")
+        format_version, header_length = _PREAMBLE.unpack_from(self._map, len(MAGIC))
+        if format_version != FORMAT_VERSION:
+            raise ValueError(f"{path} has snapshot format {format_version}, expected {FORMAT_VERSION}")
+        header_start = len(MAGIC) + _PREAMBLE.size
+        self.header = json.loads(self._map[header_start:header_start + header_length])
+        if self.header["byteorder"] != sys.byteorder:
+            raise ValueError(f"{path} was built on a {self.header['byteorder']}-endian machine")
+
+        self._data_start = header_start + header_length + _pad(header_start + header_length)
+        self.keywords = self.header["keywords"]
+        self.analyzer = self.header["analyzer"]
+        self._vocabulary = None
+        self._validate()
+
+    def _validate(self):
+        # Checked up front, so a damaged file is rejected at load time rather
+        # than failing later while a request builds the FAQ index
+        for name in ("responses", "vocabulary", "indptr", "indices", "data"):
+            offset, length = self.header["sections"][name]
+            if offset < 0 or length < 0 or self._data_start + offset + length > len(self._map):
+                raise ValueError(f"{self.path} is truncated ({name} section)")
+            if name in ("indptr", "indices", "data") and length % 4:
+                raise ValueError(f"{self.path} has a damaged {name} section")
+
+        indptr, indices, data = self._array("indptr"), self._array("indices"), self._array("data")
+        if len(indptr) != len(self.keywords) + 1 or len(self.header["faq_digests"]) != len(self.keywords):
+            raise ValueError(f"{self.path} has {len(indptr) - 1} FAQ rows for {len(self.keywords)} keywords")
+        if len(indices) != len(data) or indptr[0] != 0 or indptr[-1] != len(indices):
+            raise ValueError(f"{self.path} has inconsistent term count arrays")
+        if any(indptr[row] > indptr[row + 1] for row in range(len(self.keywords))):
+            raise ValueError(f"{self.path} has inconsistent term count arrays")
+        if len(self.vocabulary()) != self.header["terms"] or (len(indices) and max(indices) >= self.header["terms"]):
+            raise ValueError(f"{self.path} has a damaged vocabulary")
+
+    def _section(self, name):
+        offset, length = self.header["sections"][name]
+        start = self._data_start + offset
+        return memoryview(self._map)[start:start + length]
+
+    def _array(self, name):
+        # A view straight onto the mapped pages; nothing is copied
+        return self._section(name).cast("I")
+
+    def is_current(self, knowledge_base_path, analyzer_label=None):
+        """Whether the snapshot was built from this exact file (and this analyzer, if given)"""
+        if analyzer_label is not None and analyzer_label != self.analyzer:
+            return False
+        try:
+            stat = os.stat(knowledge_base_path)
+            if stat.st_size != self.header["source_size"]:
+                return False
+            # An untouched file needn't be hashed; a touched one may still have the same contents
+            if stat.st_mtime_ns == self.header["source_mtime_ns"]:
+                return True
+            return _file_digest(knowledge_base_path) == self.header["source_sha1"]
+        except OSError:
+            return False
+
+    def responses(self):
+        """The knowledge base, as it was when the snapshot was built"""
+        return json.loads(bytes(self._section("responses")))
+
+    def vocabulary(self):
+        if self._vocabulary is None:
+            text = bytes(self._section("vocabulary")).decode("utf-8")
+            self._vocabulary = text.split("\n") if text else []
+        return self._vocabulary
+
+    def term_counts(self, faqs=None):
+        """Analyzed term counts per FAQ keyword
+
+        With faqs (a keyword -> responses mapping) only keywords whose responses
+        still match the snapshot's digests are returned, so FAQs changed since
+        the build get re-analyzed.
+        """
+        digests = self.header["faq_digests"]
+        vocabulary = self.vocabulary()
+        indptr, indices, data = self._array("indptr"), self._array("indices"), self._array("data")
+        term_counts = {}
+        for position, keyword in enumerate(self.keywords):
+            if faqs is not None and (keyword not in faqs or faq_digest(faqs[keyword]) != digests[position]):
+                continue
+            start, end = indptr[position], indptr[position + 1]
+            term_counts[keyword] = Counter({vocabulary[indices[j]]: data[j] for j in range(start, end)})
+        return term_counts
+
+
+def load_snapshot(knowledge_base_path, analyzer_label=None, path=None):
+    """The snapshot for a knowledge base file, or None if there is none or it is stale
+
+    Without analyzer_label the analyzer isn't checked, so NLTK needn't be
+    loaded yet; compare snapshot.analyzer before using its term counts.
+    """
+    path = path or snapshot_path(knowledge_base_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = KnowledgeBaseSnapshot(path)
+    except (OSError, ValueError, KeyError, TypeError, struct.error) as e:
+        print(f"Warning: ignoring knowledge base snapshot {path}: {e}")
+        return None
+    if not snapshot.is_current(knowledge_base_path, analyzer_label):
+        print(f"Warning: knowledge base snapshot {path} is out of date; loading {knowledge_base_path} instead")
+        return None
+    return snapshot
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != "build":
+        print("Usage: python kb_snapshot.py build <knowledge_base.json> [<snapshot>]")
+        sys.exit(1)
+
+    from nlp_resources import get_nlp_resources
+    from text_analysis import TextAnalyzer
+
+    source = sys.argv[2]
+    target = sys.argv[3] if len(sys.argv) == 4 else None
+    label = analyzer_name(get_nlp_resources())
+    written = build_snapshot(source, TextAnalyzer(get_nlp_resources).document_tokens, label, target)
+    print(f"Built {written} from {source} ({label} analyzer)")
@@ -0,0 +1,216 @@
+"""
+SQLite backend for the knowledge base
+
+Every response is one row stamped with the knowledge base version that added
+it, so adding a FAQ is a small atomic insert instead of rewriting the whole
+JSON file, and other worker processes can pull just the rows that changed.
+
+Import/export the existing JSON format with:
+    python kb_store.py import knowledge_base.json knowledge_base.db
+    python kb_store.py export knowledge_base.db knowledge_base.json
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT NOT NULL,
+    keyword TEXT,
+    text TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_version ON responses (version);
+CREATE INDEX IF NOT EXISTS responses_keyword ON responses (category, keyword);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('reset_version', 0);
+"""
+
+
+class KnowledgeBaseStore:
+    """Knowledge base kept in a local SQLite file shared by all worker processes"""
+
+    def __init__(self, path="knowledge_base.db"):
+        self.path = path
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, write=False):
+        return _Transaction(self._connection(), write)
+
+    def version(self):
+        """The current knowledge base version; it increases with every write"""
+        row = self._connection().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return row[0] if row else 0
+
+    def has_changed(self):
+        """Cheap check for writes by other connections since the last call on this thread"""
+        # data_version only moves when another connection commits, so it costs no table reads.
+        # A thread's first call can't know what it missed, so it reports a change.
+        data_version = self._connection().execute("PRAGMA data_version").fetchone()[0]
+        previous = getattr(self._local, "data_version", None)
+        self._local.data_version = data_version
+        return data_version != previous
+
+    def is_empty(self):
+        return self._connection().execute("SELECT 1 FROM responses LIMIT 1").fetchone() is None
+
+    def load(self):
+        """Return (responses, version) in the knowledge_base.json structure"""
+        with self._transaction() as conn:
+            version = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+            rows = conn.execute("SELECT category, keyword, text FROM responses ORDER BY id").fetchall()
+        # Prime change detection so has_changed() only reports later writes
+        self.has_changed()
+
+        responses = {"faq": {}}
+        for category, keyword, text in rows:
+            if category == "faq":
+                responses["faq"].setdefault(keyword, []).append(text)
+            else:
+                responses.setdefault(category, []).append(text)
+        return responses, version
+
+    def changes_since(self, version):
+        """
+        Return everything changed after a version
+
+        Returns:
+            tuple: ({category: [responses]}, {faq keyword: [responses]}, new version),
+            with the full current response lists for each changed category/keyword,
+            or None if the store was replaced since and must be reloaded with load()
+        """
+        with self._transaction() as conn:
+            meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+            new_version = meta["version"]
+            if new_version == version:
+                return {}, {}, version
+            if meta["reset_version"] > version:
+                return None
+
+            changed = conn.execute(
+                "SELECT DISTINCT category, keyword FROM responses WHERE version > ?", (version,)
+            ).fetchall()
+
+            categories = {}
+            faqs = {}
+            for category, keyword in changed:
+                if category == "faq":
+                    rows = conn.execute(
+                        "SELECT text FROM responses WHERE category = 'faq' AND keyword = ? ORDER BY id",
+                        (keyword,)
+                    ).fetchall()
+                    faqs[keyword] = [text for (text,) in rows]
+                else:
+                    rows = conn.execute(
+                        "SELECT text FROM responses WHERE category = ? ORDER BY id", (category,)
+                    ).fetchall()
+                    categories[category] = [text for (text,) in rows]
+        return categories, faqs, new_version
+
+    def add_faq(self, keyword, response):
+        """Atomically add one FAQ response; returns the new version"""
+        return self.add_response("faq", response, keyword)
+
+    def add_response(self, category, text, keyword=None):
+        """Atomically add one response to a category; returns the new version"""
+        with self._transaction(write=True) as conn:
+            version = self._bump_version(conn)
+            conn.execute(
+                "INSERT INTO responses (category, keyword, text, version) VALUES (?, ?, ?, ?)",
+                (category, keyword, text, version)
+            )
+        return version
+
+    def import_json(self, data, replace=True):
+        """Load a knowledge_base.json structure (dict or file path) into the store"""
+        if isinstance(data, str):
+            with open(data, 'r') as f:
+                data = json.load(f)
+
+        rows = []
+        for category, value in data.items():
+            if category == "faq":
+                for keyword, texts in value.items():
+                    rows.extend(("faq", keyword, text) for text in texts)
+            else:
+                rows.extend((category, None, text) for text in value)
+
+        with self._transaction(write=True) as conn:
+            version = self._bump_version(conn)
+            if replace:
+                # Rows are gone rather than changed, so readers must reload everything
+                conn.execute("DELETE FROM responses")
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'reset_version'", (version,))
+            conn.executemany(
+                "INSERT INTO responses (category, keyword, text, version) VALUES (?, ?, ?, ?)",
+                [row + (version,) for row in rows]
+            )
+        return version
+
+    def export_json(self, path=None):
+        """Return the store as a knowledge_base.json structure, optionally writing it to a file"""
+        responses, _ = self.load()
+        # Keep the familiar key order with the FAQs last
+        responses["faq"] = responses.pop("faq")
+        if path:
+            with open(path, 'w') as f:
+                json.dump(responses, f, indent=4)
+        return responses
+
+    def _bump_version(self, conn):
+        conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+        return conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+
+class _Transaction:
+    """BEGIN/COMMIT around a block, rolling back on errors"""
+
+    def __init__(self, conn, write=False):
+        self.conn = conn
+        self.write = write
+
+    def __enter__(self):
+        # IMMEDIATE takes the write lock up front so concurrent writers queue instead of failing
+        self.conn.execute("BEGIN IMMEDIATE" if self.write else "BEGIN")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("import", "export"):
+        print("Usage: python kb_store.py import <knowledge_base.json> <knowledge_base.db>")
+        print("       python kb_store.py export <knowledge_base.db> <knowledge_base.json>")
+        sys.exit(1)
+
+    command, source, target = sys.argv[1:]
+    if command == "import":
+        version = KnowledgeBaseStore(target).import_json(source)
+        print(f"Imported {source} into {target} (version {version})")
+    else:
+        KnowledgeBaseStore(source).export_json(target)
+        print(f"Exported {source} to {target}")
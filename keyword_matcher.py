@@ -0,0 +1,105 @@
+from collections import deque
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton that finds every keyword in a message in one pass
+
+    Patterns are matched on whole words only, so "hi" does not fire inside
+    "shipping". Each pattern carries a label and a priority; classify() returns
+    the label of the lowest priority value found in the text.
+
+    Adding a pattern only extends the trie. Failure links are recomputed lazily
+    before the next search, so a run of add() calls costs one relink.
+    """
+
+    def __init__(self):
+        # Node 0 is the root; each node has its transitions, failure link and outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._outputs = [[]]
+        self._dirty = False
+        self._patterns = {}
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, pattern):
+        return pattern.lower() in self._patterns
+
+    def add(self, pattern, label, priority=0):
+        """Register a pattern; re-adding one keeps its best (lowest) priority"""
+        pattern = pattern.lower()
+        if not pattern:
+            return
+
+        existing = self._patterns.get(pattern)
+        if existing is not None and existing[1] <= priority:
+            return
+        self._patterns[pattern] = (label, priority)
+
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+                self._goto[node][char] = next_node
+            node = next_node
+
+        if pattern not in self._outputs[node]:
+            self._outputs[node].append(pattern)
+        self._dirty = True
+
+    def _link(self):
+        # Breadth-first so each node's failure target is final before its children need it
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+        self._dirty = False
+
+    def find_all(self, text):
+        """Yield (start, end, pattern, label, priority) for each whole-word match"""
+        if self._dirty:
+            self._link()
+
+        text = text.lower()
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+
+            match_node = node
+            while match_node:
+                for pattern in self._outputs[match_node]:
+                    start = index - len(pattern) + 1
+                    if self._is_word(text, start, index + 1):
+                        label, priority = self._patterns[pattern]
+                        yield start, index + 1, pattern, label, priority
+                match_node = self._fail[match_node]
+
+    def classify(self, text):
+        """Return the (label, pattern) of the highest priority match, or (None, None)"""
+        best = None
+        for start, end, pattern, label, priority in self.find_all(text):
+            if best is None or (priority, start) < best[0]:
+                best = ((priority, start), label, pattern)
+        if best is None:
+            return None, None
+        return best[1], best[2]
+
+    @staticmethod
+    def _is_word(text, start, end):
+        before = text[start - 1] if start > 0 else " "
+        after = text[end] if end < len(text) else " "
+        return not before.isalnum() and not after.isalnum()
@@ -1,18 +1,541 @@
+import asyncio
+import atexit
+import hashlib
 import os
+import random
 import requests
 import json
 import sys
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from admission import INTERACTIVE, AdmissionController, LLMOverloaded
+from circuit_breaker import CircuitBreaker
+from hedging import Hedger
+from prompt_builder import PromptBuilder
+from response_cache import ResponseCache
+from single_flight import AsyncSingleFlight, SingleFlight
+import metrics
 
-# Load environment variables from .env file
-load_dotenv()
+# httpx is only needed for the asyncio serving path (asgi.py)
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
 
-# Configure API key
-api_key = os.getenv("OPENROUTER_API_KEY")
-if not api_key:
-    print("Warning: OpenRouter API key not found in environment variables")
-    # Fallback to a placeholder - replace this with your actual API key
-    api_key = "your-api-key-here"
+DEFAULT_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+_settings_loaded = False
+
+def load_settings():
+    """Load environment variables from the .env file on first use rather than at import"""
+    global _settings_loaded
+    if not _settings_loaded:
+        load_dotenv()
+        _settings_loaded = True
+
+def get_api_key():
+    """Configure API key"""
+    load_settings()
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if not api_key:
+        print("Warning: OpenRouter API key not found in environment variables")
+        # Fallback to a placeholder - replace this with your actual API key
+        api_key = "your-api-key-here"
+    return api_key
+
+def get_api_url():
+    load_settings()
+    return os.getenv("OPENROUTER_API_URL", DEFAULT_API_URL)
+
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class LLMClient:
+    """
+    Reusable HTTP client for the OpenRouter chat completions API
+    
+    Keeps a pooled keep-alive requests.Session so repeated LLM fallbacks reuse
+    TCP/TLS connections, bounds every call with connect/read timeouts and
+    retries rate limits, server errors and connection failures with jittered
+    exponential backoff. Read timeouts are not retried so a hung upstream
+    costs a worker at most one read_timeout.
+    """
+    
+    def __init__(self, api_key, api_url=DEFAULT_API_URL, pool_size=10, connect_timeout=3.05,
+                 read_timeout=30.0, max_retries=2, backoff_base=0.5, backoff_max=8.0):
+        self.api_url = api_url
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        
+        self.session = requests.Session()
+        # One host, so a single pool sized to the number of threads that can call us
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key}",
+            "HTTP-Referer": "https://your-website.com", # Replace with your website if needed
+            "X-Title": "Support Bot" # Identify your application
+        })
+    
+    def post(self, payload, stream=False):
+        """
+        Send a chat completion request, retrying transient failures
+        
+        Args:
+            payload (dict): The JSON request body
+            stream (bool): Leave the body unread so it can be consumed incrementally
+            
+        Returns:
+            requests.Response: The final response (possibly a non-200 one)
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self.session.post(self.api_url, json=payload, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.ConnectTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                metrics.count_llm_retry(metrics.error_code(e))
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                metrics.count_llm_retry(response.status_code)
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                response.close()
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            return response
+    
+    def close(self):
+        self.session.close()
+    
+    def _backoff(self, attempt):
+        # Full jitter keeps many workers from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    def _retry_after(self, response):
+        value = response.headers.get("Retry-After")
+        try:
+            return min(self.backoff_max, max(0.0, float(value)))
+        except (TypeError, ValueError):
+            return None
+
+def default_pool_size():
+    """Size the connection pool to the number of threads that may call the LLM at once"""
+    for name in ("LLM_POOL_SIZE", "WORKER_THREADS"):
+        value = os.getenv(name)
+        if value and value.isdigit() and int(value) > 0:
+            return int(value)
+    return 10
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+def get_llm_client():
+    """Return the shared LLMClient for this process, creating it on first use"""
+    global _client, _client_pid
+    # Pooled sockets must not be shared with a parent process after fork
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                load_settings()
+                _client = LLMClient(
+                    get_api_key(),
+                    api_url=get_api_url(),
+                    pool_size=default_pool_size(),
+                    connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "3.05")),
+                    read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "30")),
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "2"))
+                )
+                _client_pid = os.getpid()
+    return _client
+
+class AsyncLLMClient:
+    """
+    asyncio counterpart of LLMClient built on httpx.AsyncClient
+    
+    A single event loop can keep thousands of LLM calls in flight over one
+    keep-alive connection pool, with the same timeout and retry policy as
+    the threaded client.
+    """
+    
+    def __init__(self, api_key, api_url=DEFAULT_API_URL, max_connections=100, connect_timeout=3.05,
+                 read_timeout=30.0, max_retries=2, backoff_base=0.5, backoff_max=8.0):
+        self.api_url = api_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        
+        self.client = httpx.AsyncClient(
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+                "HTTP-Referer": "https://your-website.com", # Replace with your website if needed
+                "X-Title": "Support Bot" # Identify your application
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+    
+    # Same backoff and Retry-After handling as the threaded client
+    _backoff = LLMClient._backoff
+    _retry_after = LLMClient._retry_after
+    
+    async def post(self, payload):
+        """
+        Send a chat completion request, retrying transient failures
+        
+        Args:
+            payload (dict): The JSON request body
+            
+        Returns:
+            httpx.Response: The final response (possibly a non-200 one)
+        """
+        attempt = 0
+        while True:
+            try:
+                response = await self.client.post(self.api_url, json=payload)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                metrics.count_llm_retry(metrics.error_code(e))
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                metrics.count_llm_retry(response.status_code)
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            
+            return response
+    
+    async def aclose(self):
+        await self.client.aclose()
+
+# httpx clients are bound to the event loop they were first used on
+_async_clients = weakref.WeakKeyDictionary()
+
+def get_async_llm_client():
+    """Return the AsyncLLMClient for the running event loop, creating it on first use"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        load_settings()
+        client = AsyncLLMClient(
+            get_api_key(),
+            api_url=get_api_url(),
+            max_connections=int(os.getenv("LLM_ASYNC_MAX_CONNECTIONS", "100")),
+            connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "30")),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "2"))
+        )
+        _async_clients[loop] = client
+    return client
+
+# Number of past exchanges included in each LLM prompt
+HISTORY_WINDOW = 5
+
+_prompt_builder = None
+
+def get_prompt_builder():
+    """Return the shared PromptBuilder, configured from the environment on first use"""
+    global _prompt_builder
+    if _prompt_builder is None:
+        load_settings()
+        _prompt_builder = PromptBuilder(
+            max_prompt_tokens=int(os.getenv("LLM_PROMPT_TOKENS", "1024")),
+            max_message_tokens=int(os.getenv("LLM_MESSAGE_TOKENS", "256")),
+            summary_tokens=int(os.getenv("LLM_SUMMARY_TOKENS", "200")),
+            recent_turns=HISTORY_WINDOW
+        )
+    return _prompt_builder
+
+_cache = None
+
+def get_response_cache():
+    """Return the shared LLM response cache, or None when caching is disabled"""
+    global _cache
+    if _cache is None:
+        load_settings()
+        max_entries = int(os.getenv("LLM_CACHE_SIZE", "1000"))
+        if max_entries <= 0:
+            return None
+        with _client_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_entries=max_entries,
+                    ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+                    path=os.getenv("LLM_CACHE_PATH") or None
+                )
+                atexit.register(_cache.save)
+    return _cache
+
+_breaker = None
+
+def get_circuit_breaker():
+    """Return the process-wide circuit breaker guarding LLM calls, or None when disabled"""
+    global _breaker
+    if _breaker is None:
+        load_settings()
+        if os.getenv("LLM_BREAKER", "1") == "0":
+            return None
+        with _client_lock:
+            if _breaker is None:
+                _breaker = CircuitBreaker(
+                    window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+                    min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "5")),
+                    failure_threshold=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+                    slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "10")),
+                    open_seconds=float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30")),
+                    probes=int(os.getenv("LLM_BREAKER_PROBES", "1"))
+                )
+    return _breaker
+
+def llm_circuit_open():
+    """True while the circuit breaker is failing LLM calls fast"""
+    breaker = get_circuit_breaker()
+    return breaker is not None and breaker.is_open()
+
+def llm_status():
+    """The circuit breaker's state, the admission queue and hedging, for status endpoints"""
+    breaker = get_circuit_breaker()
+    status = {"state": "disabled"} if breaker is None else breaker.snapshot()
+    admission = get_admission_controller()
+    if admission is not None:
+        status["admission"] = admission.snapshot()
+    hedger = get_hedger()
+    if hedger is not None:
+        status["hedging"] = hedger.snapshot()
+    return status
+
+def _breaker_allows():
+    # Returns the breaker to report back to, None when disabled, or False to fail fast
+    breaker = get_circuit_breaker()
+    if breaker is not None and not breaker.allow():
+        metrics.count_llm_error("circuit_open")
+        return False
+    return breaker
+
+_admission = None
+
+def get_admission_controller():
+    """Return the process-wide admission controller for LLM calls, or None when disabled"""
+    global _admission
+    if _admission is None:
+        load_settings()
+        if os.getenv("LLM_ADMISSION", "1") == "0":
+            return None
+        with _client_lock:
+            if _admission is None:
+                _admission = AdmissionController(
+                    max_concurrent=int(os.getenv("LLM_MAX_CONCURRENCY") or default_pool_size()),
+                    rate=float(os.getenv("LLM_RATE_LIMIT", "0")),
+                    burst=int(os.getenv("LLM_RATE_BURST", "0")) or None,
+                    max_queue=int(os.getenv("LLM_QUEUE_SIZE", "50")),
+                    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "5"))
+                )
+    return _admission
+
+def _admit(admission, priority):
+    start = time.perf_counter()
+    try:
+        admission.acquire(priority)
+    except LLMOverloaded as e:
+        metrics.count_llm_rejected(e.reason)
+        raise
+    finally:
+        metrics.observe_stage("llm_queue_wait", time.perf_counter() - start)
+
+async def _admit_async(admission, priority):
+    start = time.perf_counter()
+    try:
+        await admission.acquire_async(priority)
+    except LLMOverloaded as e:
+        metrics.count_llm_rejected(e.reason)
+        raise
+    finally:
+        metrics.observe_stage("llm_queue_wait", time.perf_counter() - start)
+
+def _call_llm_api_admitted(user_query, conversation_history=None, user_name=None, summary=None,
+                           priority=INTERACTIVE):
+    """_call_llm_api once admission control grants a slot; raises LLMOverloaded if it doesn't"""
+    admission = get_admission_controller()
+    if admission is None:
+        return _call_llm_api(user_query, conversation_history, user_name, summary)
+    _admit(admission, priority)
+    try:
+        return _call_llm_api(user_query, conversation_history, user_name, summary)
+    finally:
+        admission.release()
+
+async def _call_llm_api_async_admitted(user_query, conversation_history=None, user_name=None, summary=None,
+                                       priority=INTERACTIVE):
+    """Async variant of _call_llm_api_admitted"""
+    admission = get_admission_controller()
+    if admission is None:
+        return await _call_llm_api_async(user_query, conversation_history, user_name, summary)
+    await _admit_async(admission, priority)
+    try:
+        return await _call_llm_api_async(user_query, conversation_history, user_name, summary)
+    finally:
+        admission.release()
+
+_hedger = None
+_hedge_executor = None
+_hedger_pid = None
+
+def get_hedger():
+    """Return the process-wide Hedger for LLM calls, or None unless LLM_HEDGE=1"""
+    global _hedger, _hedge_executor, _hedger_pid
+    # Executor threads don't survive a fork, so each worker gets its own
+    if _hedger is None or _hedger_pid != os.getpid():
+        load_settings()
+        if os.getenv("LLM_HEDGE", "0") != "1":
+            return None
+        with _client_lock:
+            if _hedger is None or _hedger_pid != os.getpid():
+                _hedger = Hedger(
+                    percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+                    initial_delay=float(os.getenv("LLM_HEDGE_DELAY", "2")),
+                    max_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+                )
+                # Both attempts of every hedged call run here, and abandoned losers finish here
+                _hedge_executor = ThreadPoolExecutor(max_workers=2 * default_pool_size(),
+                                                     thread_name_prefix="llm-hedge")
+                _hedger_pid = os.getpid()
+    return _hedger
+
+def _hedge_payload(payload):
+    # The hedge can go to a different model (LLM_HEDGE_MODEL) that isn't having a slow moment
+    model = os.getenv("LLM_HEDGE_MODEL")
+    return dict(payload, model=model) if model else payload
+
+def _request_completion(payload):
+    """Send a chat completion request and return its text or None, hedging slow ones when enabled"""
+    hedger = get_hedger()
+    if hedger is None:
+        return _parse_completion(get_llm_client().post(payload))
+    
+    def attempt():
+        return _parse_completion(get_llm_client().post(payload))
+    
+    def hedge_attempt():
+        # A hedge only goes out if a slot is free now; it never queues ahead of real requests
+        admission = get_admission_controller()
+        if admission is not None and not admission.try_acquire():
+            return False
+        try:
+            return _parse_completion(get_llm_client().post(_hedge_payload(payload)))
+        finally:
+            if admission is not None:
+                admission.release()
+    
+    def keep_slot(future):
+        # The caller releases its slot on return, but the first attempt is still
+        # on the wire, so it holds a slot of its own until it finishes
+        admission = get_admission_controller()
+        if admission is not None:
+            admission.occupy()
+            future.add_done_callback(lambda _: admission.release())
+    
+    llm_response, outcome = hedger.run(attempt, hedge_attempt, _hedge_executor, on_abandoned=keep_slot)
+    if outcome is not None:
+        metrics.count_llm_hedge(outcome)
+    return llm_response
+
+async def _request_completion_async(payload):
+    """Async variant of _request_completion; a losing hedge is cancelled mid-request"""
+    hedger = get_hedger()
+    if hedger is None:
+        return _parse_completion(await get_async_llm_client().post(payload))
+    
+    async def attempt():
+        return _parse_completion(await get_async_llm_client().post(payload))
+    
+    async def hedge_attempt():
+        admission = get_admission_controller()
+        if admission is not None and not admission.try_acquire():
+            return False
+        try:
+            return _parse_completion(await get_async_llm_client().post(_hedge_payload(payload)))
+        finally:
+            if admission is not None:
+                admission.release()
+    
+    llm_response, outcome = await hedger.run_async(attempt, hedge_attempt)
+    if outcome is not None:
+        metrics.count_llm_hedge(outcome)
+    return llm_response
+
+_single_flight = SingleFlight()
+# asyncio tasks belong to one event loop, so each loop gets its own
+_async_single_flights = weakref.WeakKeyDictionary()
+
+def coalescing_enabled():
+    """Whether identical concurrent LLM requests share one upstream call (LLM_COALESCE, default on)"""
+    load_settings()
+    return os.getenv("LLM_COALESCE", "1") != "0"
+
+def _flight_key(user_query, conversation_history, user_name, summary):
+    # Requests coalesce when they'd send the same prompt: same normalized query, history window, name and summary
+    key = ResponseCache.make_key(user_query, conversation_history, HISTORY_WINDOW) + "|" + (user_name or "")
+    if summary:
+        key += "|" + hashlib.sha1(summary.encode("utf-8")).hexdigest()
+    return key
+
+def _call_llm_api_coalesced(user_query, conversation_history=None, user_name=None, summary=None,
+                            priority=INTERACTIVE):
+    """_call_llm_api, sharing one upstream call between identical requests in flight at the same time"""
+    if not coalescing_enabled():
+        return _call_llm_api_admitted(user_query, conversation_history, user_name, summary, priority)
+    
+    # Only the leader waits for admission; followers share its answer or its rejection
+    key = _flight_key(user_query, conversation_history, user_name, summary)
+    llm_response, shared = _single_flight.do(key, _call_llm_api_admitted, user_query, conversation_history,
+                                             user_name, summary, priority)
+    if shared:
+        metrics.count_llm_coalesced("sync")
+    return llm_response
+
+async def _call_llm_api_async_coalesced(user_query, conversation_history=None, user_name=None, summary=None,
+                                        priority=INTERACTIVE):
+    """Async variant of _call_llm_api_coalesced"""
+    if not coalescing_enabled():
+        return await _call_llm_api_async_admitted(user_query, conversation_history, user_name, summary, priority)
+    
+    loop = asyncio.get_running_loop()
+    flights = _async_single_flights.get(loop)
+    if flights is None:
+        flights = _async_single_flights[loop] = AsyncSingleFlight()
+    
+    key = _flight_key(user_query, conversation_history, user_name, summary)
+    llm_response, shared = await flights.do(key, _call_llm_api_async_admitted, user_query, conversation_history,
+                                            user_name, summary, priority)
+    if shared:
+        metrics.count_llm_coalesced("async")
+    return llm_response
 
 # Simple canned responses for fallback
 canned_responses = {
@@ -37,7 +560,27 @@ def get_fallback_response(query):
     
     return "I don't have specific information on that topic. Would you like me to forward your question to our product specialist?"
 
-def _call_llm_api(user_query, conversation_history=None, user_name=None):
+def _overload_response(user_query, overflow):
+    """Answer without the LLM when admission control turned the request away"""
+    response = overflow() if overflow is not None else None
+    if response is None:
+        metrics.count_response("fallback")
+        response = get_fallback_response(user_query)
+    return response
+
+def _build_payload(user_query, conversation_history=None, user_name=None, summary=None):
+    """Build the chat completion request body for a query, kept within the prompt token budget"""
+    messages = get_prompt_builder().build(user_query, conversation_history, user_name, summary)
+    
+    # API request data for OpenRouter
+    return {
+        "model": "openai/gpt-3.5-turbo", # Using OpenAI's model through OpenRouter
+        "messages": messages,
+        "max_tokens": 150,
+        "temperature": 0.7
+    }
+
+def _call_llm_api(user_query, conversation_history=None, user_name=None, summary=None):
     """
     Get a response from the LLM based on the user's query and conversation history
     
@@ -45,72 +588,120 @@ def _call_llm_api(user_query, conversation_history=None, user_name=None):
         user_query (str): The user's question or message
         conversation_history (list): Optional list of previous exchanges
         user_name (str): Optional name of the user for personalization
+        summary (str): Optional rolling summary of turns older than the history window
         
     Returns:
-        str: The LLM's response
+        str: The LLM's response, or None if the call failed or the circuit breaker is open
     """
+    breaker = _breaker_allows()
+    if breaker is False:
+        return None
+    
+    start = time.perf_counter()
+    llm_response = None
     try:
-        # Format system prompt based on our support bot's purpose
-        system_prompt = """You are a helpful customer support assistant for a small business.
-Your goal is to be helpful, concise, and friendly. If you don't know the answer to something, 
-just say you don't have that information rather than making something up. 
-If the user is looking for specific product information you don't have, offer to take their contact details
-to have someone follow up with them."""
-
-        # Add user name to personalize if available
-        if user_name:
-            system_prompt += f"\nThe customer's name is {user_name}."
-            
-        # Prepare the messages including conversation history if available
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        if conversation_history and isinstance(conversation_history, list):
-            # Add up to the last 5 exchanges to provide context without making the prompt too long
-            for exchange in conversation_history[-5:]:
-                if isinstance(exchange, dict) and "user_input" in exchange and "bot_response" in exchange:
-                    messages.append({"role": "user", "content": exchange["user_input"]})
-                    messages.append({"role": "assistant", "content": exchange["bot_response"]})
-        
-        # Add the current user query
-        messages.append({"role": "user", "content": user_query})
-        
-        # API request data for OpenRouter
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "HTTP-Referer": "https://your-website.com", # Replace with your website if needed
-            "X-Title": "Support Bot" # Identify your application
-        }
-        
-        payload = {
-            "model": "openai/gpt-3.5-turbo", # Using OpenAI's model through OpenRouter
-            "messages": messages,
-            "max_tokens": 150,
-            "temperature": 0.7
-        }
-        
-        # Make request to OpenRouter API
-        response = requests.post(
-            "https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            json=payload
-        )
+        payload = _build_payload(user_query, conversation_history, user_name, summary)
         
-        if response.status_code == 200:
-            response_data = response.json()
-            if "choices" in response_data and len(response_data["choices"]) > 0:
-                if "message" in response_data["choices"][0] and "content" in response_data["choices"][0]["message"]:
-                    return response_data["choices"][0]["message"]["content"].strip()
-        
-        # If we get here, there was an issue with the response format
-        print(f"Unexpected API response: {response.text}")
+        # Make request to OpenRouter API over the shared pooled connection
+        with metrics.timed("llm_call"):
+            llm_response = _request_completion(payload)
+        return llm_response
+    
+    except Exception as e:
+        print(f"Error calling LLM API: {e}")
+        metrics.count_llm_error(metrics.error_code(e))
         return None
+    finally:
+        if breaker is not None:
+            breaker.record(llm_response is not None, time.perf_counter() - start)
+
+async def _call_llm_api_async(user_query, conversation_history=None, user_name=None, summary=None):
+    """Async variant of _call_llm_api; returns the LLM's response or None"""
+    breaker = _breaker_allows()
+    if breaker is False:
+        return None
+    
+    start = time.perf_counter()
+    llm_response = None
+    try:
+        payload = _build_payload(user_query, conversation_history, user_name, summary)
+        with metrics.timed("llm_call"):
+            llm_response = await _request_completion_async(payload)
+        return llm_response
     
     except Exception as e:
         print(f"Error calling LLM API: {e}")
+        metrics.count_llm_error(metrics.error_code(e))
+        return None
+    finally:
+        if breaker is not None:
+            breaker.record(llm_response is not None, time.perf_counter() - start)
+
+def _parse_completion(response):
+    """Pull the completion text out of a chat completions response, or None"""
+    if response.status_code == 200:
+        response_data = response.json()
+        if "choices" in response_data and len(response_data["choices"]) > 0:
+            if "message" in response_data["choices"][0] and "content" in response_data["choices"][0]["message"]:
+                return response_data["choices"][0]["message"]["content"].strip()
+    
+    # If we get here, there was an issue with the response format
+    print(f"Unexpected API response: {response.text}")
+    metrics.count_llm_error(response.status_code if response.status_code != 200 else "bad_response")
+    return None
+
+def _stream_llm_api(user_query, conversation_history=None, user_name=None, summary=None):
+    """
+    Stream a completion from the LLM, yielding text deltas as they arrive
+    
+    Raises on transport errors or a non-200 status so callers can fall back.
+    """
+    payload = _build_payload(user_query, conversation_history, user_name, summary)
+    payload["stream"] = True
+    
+    start = time.perf_counter()
+    response = get_llm_client().post(payload, stream=True)
+    try:
+        if response.status_code != 200:
+            metrics.count_llm_error(response.status_code)
+            raise RuntimeError(f"Unexpected API response: {response.status_code} {response.text}")
+        
+        response.encoding = "utf-8"
+        for line in response.iter_lines(decode_unicode=True):
+            # Server-sent events: "data: {...}" lines, comments start with ":"
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            
+            chunk = json.loads(data)
+            if "error" in chunk:
+                metrics.count_llm_error("upstream_error")
+                raise RuntimeError(f"Upstream error while streaming: {chunk['error']}")
+            for choice in chunk.get("choices", []):
+                delta = choice.get("delta", {}).get("content")
+                if delta:
+                    if start is not None:
+                        # Streaming time is mostly spent by the client reading, so only time the first token
+                        metrics.observe_stage("llm_first_token", time.perf_counter() - start)
+                        start = None
+                    yield delta
+    finally:
+        response.close()
+
+def _cache_key(cache, user_query, conversation_history, user_name, summary):
+    """Cache key for a request, or None when it must not be cached"""
+    if cache is None:
+        return None
+    # Personalized prompts, and long conversations with a summary, are never shared between customers
+    if user_name or summary:
+        cache.bypass()
         return None
+    return cache.make_key(user_query, conversation_history, HISTORY_WINDOW)
 
-def get_llm_response(user_query, conversation_history=None, user_name=None):
+def get_llm_response(user_query, conversation_history=None, user_name=None, summary=None,
+                     priority=INTERACTIVE, overflow=None):
     """
     Get a response using LLM with fallback to canned responses if needed
     
@@ -118,20 +709,168 @@ def get_llm_response(user_query, conversation_history=None, user_name=None):
         user_query (str): The user's question or message
         conversation_history (list): Optional list of previous exchanges
         user_name (str): Optional name of the user for personalization
+        summary (str): Optional rolling summary of turns older than the history window
+        priority (int): Queue priority when the LLM is busy (admission.INTERACTIVE or admission.BATCH)
+        overflow (callable): Optional fallback answer when the request isn't admitted; returns a
+            response or None to use the canned responses
         
     Returns:
         str: The response
     """
-    # Try to get a response from the LLM
-    llm_response = _call_llm_api(user_query, conversation_history, user_name)
+    cache = get_response_cache()
+    cache_key = _cache_key(cache, user_query, conversation_history, user_name, summary)
+    if cache_key is not None:
+        cached_response = cache.get(cache_key)
+        if cached_response:
+            metrics.count_response("cache")
+            return cached_response
+    
+    # Try to get a response from the LLM; identical requests already in flight share its answer
+    try:
+        llm_response = _call_llm_api_coalesced(user_query, conversation_history, user_name, summary, priority)
+    except LLMOverloaded:
+        return _overload_response(user_query, overflow)
     
     # If we got a valid response from the LLM, return it
     if llm_response:
+        if cache_key is not None:
+            cache.set(cache_key, llm_response)
+        metrics.count_response("llm")
         return llm_response
     
     # Otherwise, fall back to canned responses
+    metrics.count_response("fallback")
+    return get_fallback_response(user_query)
+
+async def get_llm_response_async(user_query, conversation_history=None, user_name=None, summary=None,
+                                 priority=INTERACTIVE, overflow=None):
+    """
+    Async variant of get_llm_response for the asyncio serving path
+    
+    Without httpx installed the blocking call runs in the default executor instead.
+    
+    Args:
+        user_query (str): The user's question or message
+        conversation_history (list): Optional list of previous exchanges
+        user_name (str): Optional name of the user for personalization
+        summary (str): Optional rolling summary of turns older than the history window
+        priority (int): Queue priority when the LLM is busy (admission.INTERACTIVE or admission.BATCH)
+        overflow (callable): Optional fallback answer when the request isn't admitted
+        
+    Returns:
+        str: The response
+    """
+    if not HTTPX_AVAILABLE:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, get_llm_response, user_query, conversation_history, user_name,
+                                          summary, priority, overflow)
+    
+    cache = get_response_cache()
+    cache_key = _cache_key(cache, user_query, conversation_history, user_name, summary)
+    if cache_key is not None:
+        cached_response = cache.get(cache_key)
+        if cached_response:
+            metrics.count_response("cache")
+            return cached_response
+    
+    try:
+        llm_response = await _call_llm_api_async_coalesced(user_query, conversation_history, user_name, summary,
+                                                           priority)
+    except LLMOverloaded:
+        return _overload_response(user_query, overflow)
+    
+    if llm_response:
+        if cache_key is not None:
+            cache.set(cache_key, llm_response)
+        metrics.count_response("llm")
+        return llm_response
+    
+    metrics.count_response("fallback")
     return get_fallback_response(user_query)
 
+def stream_llm_response(user_query, conversation_history=None, user_name=None, summary=None,
+                        priority=INTERACTIVE, overflow=None):
+    """
+    Stream a response using the LLM, falling back to canned responses if needed
+    
+    Args:
+        user_query (str): The user's question or message
+        conversation_history (list): Optional list of previous exchanges
+        user_name (str): Optional name of the user for personalization
+        summary (str): Optional rolling summary of turns older than the history window
+        priority (int): Queue priority when the LLM is busy (admission.INTERACTIVE or admission.BATCH)
+        overflow (callable): Optional fallback answer when the request isn't admitted
+        
+    Yields:
+        str: Pieces of the response text, in order
+    """
+    cache = get_response_cache()
+    cache_key = _cache_key(cache, user_query, conversation_history, user_name, summary)
+    if cache_key is not None:
+        cached_response = cache.get(cache_key)
+        if cached_response:
+            metrics.count_response("cache")
+            yield cached_response
+            return
+    
+    # An open breaker fails fast without taking (or queueing for) an LLM slot
+    breaker = _breaker_allows()
+    admission = get_admission_controller() if breaker is not False else None
+    if admission is not None:
+        try:
+            _admit(admission, priority)
+        except LLMOverloaded:
+            if breaker is not None:
+                breaker.cancel()
+            yield _overload_response(user_query, overflow)
+            return
+    
+    chunks = []
+    start = time.perf_counter()
+    try:
+        if breaker is not False:
+            for chunk in _stream_llm_api(user_query, conversation_history, user_name, summary):
+                # Leading whitespace is stripped like the non-streaming path does
+                if not chunks:
+                    chunk = chunk.lstrip()
+                    if not chunk:
+                        continue
+                    # The upstream is healthy once it starts answering
+                    if breaker is not None:
+                        breaker.record(True, time.perf_counter() - start)
+                chunks.append(chunk)
+                yield chunk
+    except GeneratorExit:
+        # The client went away, which says nothing about the upstream
+        if breaker and not chunks:
+            breaker.cancel()
+            breaker = None
+        raise
+    except Exception as e:
+        print(f"Error streaming LLM response: {e}")
+        # Bad statuses and upstream errors (RuntimeError) were already counted with their code
+        if not isinstance(e, RuntimeError):
+            metrics.count_llm_error(metrics.error_code(e))
+        if chunks:
+            # The client already has part of the answer; just end the stream
+            return
+    finally:
+        if breaker and not chunks:
+            breaker.record(False, time.perf_counter() - start)
+        # The slot is held until the stream ends (or the client goes away)
+        if admission is not None:
+            admission.release()
+    
+    if chunks:
+        if cache_key is not None:
+            cache.set(cache_key, "".join(chunks).strip())
+        metrics.count_response("llm")
+        return
+    
+    # Nothing usable came back, so fall back to canned responses
+    metrics.count_response("fallback")
+    yield get_fallback_response(user_query)
+
 # Test function
 if __name__ == "__main__":
     test_response = get_llm_response("What are your store hours?")
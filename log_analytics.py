@@ -0,0 +1,297 @@
+"""
+Find candidate FAQs in the conversation logs
+
+Streams every logs/conversation_*.json(l) file, one entry at a time, and
+keeps the user messages the knowledge base couldn't answer: those that got a
+fallback response and those that were sent to the LLM. Files are analyzed in
+parallel by a pool of processes. The messages are then grouped into clusters
+of similar questions, and each cluster is reported with a suggested FAQ
+keyword and how many messages it covers, most frequent first:
+
+    python log_analytics.py
+    python log_analytics.py --log-dir logs --since 20250101 --workers 4 --top 50
+    python log_analytics.py --min-volume 5 --json candidates.json
+
+Adding the top clusters with add_faq lets the bot answer them locally
+instead of calling the LLM.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from conversation_log import LOG_FILE_PATTERN, conversation_log_files, iter_conversation_log
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Messages are grouped when their terms overlap at least this much (Jaccard similarity)
+DEFAULT_SIMILARITY = 0.5
+EXAMPLES_PER_QUERY = 3
+
+# Dropped from the terms even when NLTK isn't there to remove stopwords, so they don't decide the clusters
+STOPWORDS = frozenset("""
+a an and are can could do does for from have how i in is it me my of on or please the there to
+what when where which who why will with would you your
+""".split())
+
+# Knowledge base categories whose answers come from the bot's rules rather than the FAQs or the LLM
+RULE_CATEGORIES = ("greeting", "goodbye", "name_acknowledge")
+
+_analyzer = None
+
+
+def _get_analyzer():
+    # One analyzer per worker process, with the same tokens and lemmas as the FAQ index
+    global _analyzer
+    if _analyzer is None:
+        from nlp_resources import get_nlp_resources
+        from text_analysis import TextAnalyzer
+        _analyzer = TextAnalyzer(get_nlp_resources).query_tokens
+    return _analyzer
+
+
+def rule_response_pattern(templates):
+    """Regex matching any of the rule response templates, with their {placeholders} filled in; None without templates"""
+    alternatives = []
+    for template in templates:
+        parts = re.split(r"\{[a-z_]+\}", template)
+        alternatives.append(".+".join(re.escape(part) for part in parts))
+    if not alternatives:
+        return None
+    return re.compile("(?:" + "|".join(alternatives) + ")")
+
+
+def classify(entry, fallback_responses, rule_pattern=None):
+    """Which outcome a logged exchange had: "fallback", "llm", or None if the knowledge base answered it"""
+    # Fallbacks and name acknowledgments leave the previous topic in the context,
+    # so the response itself is checked before the topic
+    response = entry.get("bot_response")
+    if response in fallback_responses:
+        return "fallback"
+    if rule_pattern is not None and isinstance(response, str) and rule_pattern.fullmatch(response):
+        return None
+    context = entry.get("context") or {}
+    if context.get("topic") == "llm_response":
+        return "llm"
+    return None
+
+
+def analyze_log_file(path, fallback_responses, rule_responses=()):
+    """Count the unanswered messages of one log file by their analyzed terms
+
+    rule_responses are the greeting, goodbye and name templates, whose
+    answers never count as unanswered. Returns a dict with the number of
+    entries read and, per sorted term tuple, the message volume by outcome
+    and a few example messages. Only the distinct questions are kept,
+    however long the file is.
+    """
+    analyze = _get_analyzer()
+    fallback_responses = set(fallback_responses)
+    rule_pattern = rule_response_pattern(rule_responses)
+    queries = {}
+    entries = 0
+    for entry in iter_conversation_log(path):
+        entries += 1
+        user_input = entry.get("user_input")
+        if not isinstance(user_input, str) or not user_input.strip():
+            continue
+        outcome = classify(entry, fallback_responses, rule_pattern)
+        if outcome is None:
+            continue
+
+        terms = tuple(sorted(set(analyze(user_input.lower())) - STOPWORDS))
+        if not terms:
+            continue
+        query = queries.get(terms)
+        if query is None:
+            query = queries[terms] = {"volume": Counter(), "examples": Counter()}
+        query["volume"][outcome] += 1
+        text = " ".join(user_input.split())
+        if text in query["examples"] or len(query["examples"]) < EXAMPLES_PER_QUERY:
+            query["examples"][text] += 1
+    return {"path": path, "entries": entries, "queries": queries}
+
+
+def merge_results(results):
+    """Combine the per-file counts into one terms -> counts mapping"""
+    queries = {}
+    entries = 0
+    for result in results:
+        entries += result["entries"]
+        for terms, counts in result["queries"].items():
+            query = queries.get(terms)
+            if query is None:
+                queries[terms] = counts
+                continue
+            query["volume"].update(counts["volume"])
+            for text, count in counts["examples"].items():
+                if text in query["examples"] or len(query["examples"]) < EXAMPLES_PER_QUERY:
+                    query["examples"][text] += count
+    return queries, entries
+
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b)
+
+
+def cluster_queries(queries, similarity=DEFAULT_SIMILARITY):
+    """Group similar questions, most frequent first
+
+    Each question joins the cluster of the most frequent earlier question it
+    overlaps with enough, or starts a new one. Returns a list of clusters with
+    their total volume, volume by outcome, term weights and examples.
+    """
+    ordered = sorted(queries.items(), key=lambda item: (-sum(item[1]["volume"].values()), item[0]))
+    clusters = []
+    by_term = {}
+    for terms, counts in ordered:
+        term_set = set(terms)
+        best, best_score = None, 0.0
+        candidates = {index for term in terms for index in by_term.get(term, ())}
+        for index in sorted(candidates):
+            score = _similarity(term_set, clusters[index]["leader"])
+            if score > best_score:
+                best, best_score = index, score
+
+        volume = sum(counts["volume"].values())
+        if best is None or best_score < similarity:
+            best = len(clusters)
+            clusters.append({
+                "leader": term_set,
+                "volume": 0,
+                "outcomes": Counter(),
+                "terms": Counter(),
+                "examples": Counter(),
+            })
+            for term in terms:
+                by_term.setdefault(term, []).append(best)
+
+        cluster = clusters[best]
+        cluster["volume"] += volume
+        cluster["outcomes"].update(counts["volume"])
+        for term in terms:
+            cluster["terms"][term] += volume
+        cluster["examples"].update(counts["examples"])
+
+    clusters.sort(key=lambda cluster: -cluster["volume"])
+    return clusters
+
+
+def suggest_keyword(cluster, max_terms=3):
+    """The terms most of the cluster's messages share, in the order its most common message uses them"""
+    common = [term for term, weight in cluster["terms"].most_common(max_terms)
+              if weight * 2 >= cluster["volume"]]
+    example = cluster["examples"].most_common(1)[0][0].lower()
+    position = {}
+    for index, word in enumerate(_get_analyzer()(example)):
+        position.setdefault(word, index)
+    return " ".join(sorted(common, key=lambda term: position.get(term, len(position))))
+
+
+def rank_candidates(clusters, known_keywords=(), min_volume=1, top=None):
+    """Turn clusters into ranked FAQ candidates, skipping small ones"""
+    known_keywords = set(known_keywords)
+    candidates = []
+    for cluster in clusters:
+        if cluster["volume"] < min_volume:
+            continue
+        keyword = suggest_keyword(cluster)
+        candidates.append({
+            "keyword": keyword,
+            "volume": cluster["volume"],
+            "fallback": cluster["outcomes"]["fallback"],
+            "llm": cluster["outcomes"]["llm"],
+            "existing_faq": keyword in known_keywords,
+            "examples": [text for text, _ in cluster["examples"].most_common(EXAMPLES_PER_QUERY)],
+        })
+        if top and len(candidates) >= top:
+            break
+    return candidates
+
+
+def _select_files(log_dir, since=None, until=None):
+    paths = []
+    for path in conversation_log_files(log_dir):
+        day = LOG_FILE_PATTERN.match(os.path.basename(path)).group(1)
+        if (since and day < since) or (until and day > until):
+            continue
+        paths.append(path)
+    return paths
+
+
+def analyze_logs(paths, fallback_responses, workers=None, rule_responses=()):
+    """Analyze log files, in parallel processes when there is more than one worker"""
+    fallback_responses = list(fallback_responses)
+    rule_responses = list(rule_responses)
+    if workers == 1 or len(paths) <= 1:
+        return [analyze_log_file(path, fallback_responses, rule_responses) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze_log_file, paths, [fallback_responses] * len(paths),
+                                 [rule_responses] * len(paths)))
+
+
+def print_candidates(candidates, entries, unanswered):
+    print(f"{unanswered} of {entries} logged messages were not answered from the knowledge base")
+    if not candidates:
+        print("No candidate FAQs found")
+        return
+    print(f"\n{'rank':>4}  {'volume':>6}  {'fallback':>8}  {'llm':>5}  keyword")
+    for rank, candidate in enumerate(candidates, 1):
+        note = "  (existing FAQ)" if candidate["existing_faq"] else ""
+        print(f"{rank:>4}  {candidate['volume']:>6}  {candidate['fallback']:>8}  {candidate['llm']:>5}  "
+              f"{candidate['keyword']}{note}")
+        for example in candidate["examples"]:
+            print(f"{'':>30}e.g. {example}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rank candidate FAQs from questions the knowledge base couldn't answer")
+    parser.add_argument("--log-dir", default=os.path.join(REPO_DIR, "logs"),
+                        help="directory with conversation_*.json(l) files")
+    parser.add_argument("--knowledge-base", default=os.path.join(REPO_DIR, "knowledge_base.json"),
+                        help="knowledge base whose fallback responses and FAQ keywords are used")
+    parser.add_argument("--since", help="first day to include, as YYYYMMDD")
+    parser.add_argument("--until", help="last day to include, as YYYYMMDD")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes analyzing files in parallel (default: one per CPU)")
+    parser.add_argument("--similarity", type=float, default=DEFAULT_SIMILARITY,
+                        help="term overlap (0-1) needed to group two questions")
+    parser.add_argument("--min-volume", type=int, default=2, help="skip clusters with fewer messages")
+    parser.add_argument("--top", type=int, default=20, help="number of candidates to show (0 for all)")
+    parser.add_argument("--json", dest="json_path", help="also write the candidates to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.knowledge_base, 'r') as f:
+            knowledge_base = json.load(f)
+    except FileNotFoundError:
+        print(f"Warning: {args.knowledge_base} not found; only LLM answered messages are counted")
+        knowledge_base = {}
+
+    paths = _select_files(args.log_dir, args.since, args.until)
+    if not paths:
+        print(f"No conversation logs found in {args.log_dir}")
+        return 1
+
+    rule_responses = [text for category in RULE_CATEGORIES for text in knowledge_base.get(category, [])]
+    results = analyze_logs(paths, knowledge_base.get("fallback", []), args.workers, rule_responses)
+    queries, entries = merge_results(results)
+    unanswered = sum(sum(query["volume"].values()) for query in queries.values())
+    clusters = cluster_queries(queries, args.similarity)
+    candidates = rank_candidates(clusters, knowledge_base.get("faq", {}), args.min_volume, args.top)
+
+    print(f"Analyzed {len(paths)} log files")
+    print_candidates(candidates, entries, unanswered)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump({"entries": entries, "unanswered": unanswered, "candidates": candidates}, f, indent=4)
+        print(f"\nWrote {len(candidates)} candidates to {args.json_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
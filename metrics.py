@@ -0,0 +1,251 @@
+"""
+In-process latency histograms and counters in the Prometheus text format
+
+Metrics are off unless METRICS_ENABLED=1. While disabled every call returns
+straight away (timed() hands back a shared no-op context manager), so the
+instrumentation left in the request path costs next to nothing.
+
+Each worker process keeps its own numbers; with several workers, scrape each
+one or put them behind a server that sticks a scrape to one worker.
+"""
+import bisect
+import os
+import threading
+import time
+
+enabled = os.getenv("METRICS_ENABLED") == "1"
+
+# Seconds; covers sub-millisecond FAQ matching up to slow LLM round trips
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Counter:
+    """Monotonic counter with a single label"""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label_value, amount=1):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def value(self, label_value):
+        return self._values.get(label_value, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_value, count in values:
+            lines.append(f'{self.name}{{{self.label}="{_escape(label_value)}"}} {count}')
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a single label"""
+
+    def __init__(self, name, help_text, label, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        # Per-bucket counts; they're only made cumulative when rendered
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][position] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, label_value):
+        series = self._series.get(label_value)
+        return series[2] if series else 0
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((label_value, (list(counts), total, count))
+                            for label_value, (counts, total, count) in self._series.items())
+        for label_value, (counts, total, count) in series:
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{label}}} {count}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "supportbot_stage_seconds",
+    "Time spent in each step of answering a message",
+    "stage"
+)
+responses_total = Counter(
+    "supportbot_responses_total",
+    "Messages answered, by where the answer came from (rule, faq, llm, cache, fallback)",
+    "route"
+)
+llm_errors_total = Counter(
+    "supportbot_llm_errors_total",
+    "LLM calls that failed, by HTTP status or error type",
+    "code"
+)
+llm_retries_total = Counter(
+    "supportbot_llm_retries_total",
+    "LLM requests retried, by HTTP status or error type",
+    "code"
+)
+llm_coalesced_total = Counter(
+    "supportbot_llm_coalesced_total",
+    "LLM requests answered by an identical request already in flight",
+    "path"
+)
+llm_rejected_total = Counter(
+    "supportbot_llm_rejected_total",
+    "LLM requests turned away by admission control, by reason (queue_full, displaced, timeout, cancelled)",
+    "reason"
+)
+llm_hedges_total = Counter(
+    "supportbot_llm_hedges_total",
+    "Slow LLM calls considered for a hedge, by outcome (won, lost, skipped, unsent)",
+    "outcome"
+)
+speculative_llm_total = Counter(
+    "supportbot_speculative_llm_total",
+    "LLM calls started early for a borderline FAQ score, by whether the answer was used or discarded",
+    "outcome"
+)
+
+REGISTRY = [stage_seconds, responses_total, llm_errors_total, llm_retries_total, llm_coalesced_total,
+            llm_rejected_total, llm_hedges_total, speculative_llm_total]
+
+
+class _StageTimer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stage_seconds.observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def set_enabled(value=True):
+    """Turn collection on or off at runtime (the default comes from METRICS_ENABLED)"""
+    global enabled
+    enabled = bool(value)
+
+
+def timed(stage):
+    """Context manager recording how long a block took under a stage name"""
+    if not enabled:
+        return _NULL_TIMER
+    return _StageTimer(stage)
+
+
+def observe_stage(stage, seconds):
+    if enabled:
+        stage_seconds.observe(stage, seconds)
+
+
+def count_response(route):
+    if enabled:
+        responses_total.inc(route)
+
+
+def count_llm_error(code):
+    if enabled:
+        llm_errors_total.inc(str(code))
+
+
+def count_llm_retry(code):
+    if enabled:
+        llm_retries_total.inc(str(code))
+
+
+def count_llm_coalesced(path):
+    if enabled:
+        llm_coalesced_total.inc(path)
+
+
+def count_llm_rejected(reason):
+    if enabled:
+        llm_rejected_total.inc(reason)
+
+
+def count_llm_hedge(outcome):
+    if enabled:
+        llm_hedges_total.inc(outcome)
+
+
+def count_speculation(outcome):
+    if enabled:
+        speculative_llm_total.inc(outcome)
+
+
+def error_code(exc):
+    """Short label for an exception raised while calling the LLM"""
+    name = type(exc).__name__
+    if "Timeout" in name:
+        return "timeout"
+    if "Connect" in name:
+        return "connection"
+    return name
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.reset()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
@@ -0,0 +1,126 @@
+"""
+Lazy loading of the NLTK components used by AdvancedSupportBot
+
+Nothing here touches NLTK (or the network) at import time. The tokenizer,
+lemmatizer and stopword list are loaded on first use, or up front by calling
+get_nlp_resources() in a pre-fork master so forked workers inherit them.
+NLTK data is only downloaded by setup.py, download_nlp_data() or when
+NLTK_AUTO_DOWNLOAD=1 is set.
+"""
+import importlib.util
+import os
+import threading
+import time
+
+# Checking for the package is cheap; actually importing nltk is not
+NLTK_INSTALLED = importlib.util.find_spec("nltk") is not None
+
+NLTK_DATA_PACKAGES = ["punkt", "punkt_tab", "stopwords", "wordnet"]
+
+# Seconds spent in each start-up step, filled in as steps happen
+startup_timings = {}
+
+_resources = None
+_loaded = False
+_lock = threading.Lock()
+
+
+class NLPResources:
+    """The NLTK pieces needed for preprocessing, loaded and warmed up"""
+
+    __slots__ = ("tokenize", "lemmatize", "stop_words")
+
+    def __init__(self, tokenize, lemmatize, stop_words):
+        self.tokenize = tokenize
+        self.lemmatize = lemmatize
+        self.stop_words = stop_words
+
+
+def record_timing(step, seconds):
+    startup_timings[step] = startup_timings.get(step, 0.0) + seconds
+
+
+def download_nlp_data(quiet=True):
+    """Download the NLTK data packages the bot uses"""
+    import nltk
+    for package in NLTK_DATA_PACKAGES:
+        nltk.download(package, quiet=quiet)
+
+
+def get_nlp_resources():
+    """Return the shared NLPResources, or None when NLTK or its data is unavailable"""
+    global _resources, _loaded
+    if _loaded:
+        return _resources
+    with _lock:
+        if not _loaded:
+            _resources = _load()
+            _loaded = True
+    return _resources
+
+
+def _load():
+    if not NLTK_INSTALLED:
+        print("NLTK is not installed. Basic text matching will be used.")
+        print("To enable advanced features, install NLTK: pip install nltk")
+        return None
+
+    start = time.perf_counter()
+    from nltk.tokenize import word_tokenize
+    from nltk.corpus import stopwords
+    from nltk.stem import WordNetLemmatizer
+    record_timing("nltk_import", time.perf_counter() - start)
+
+    try:
+        return _warm_up(word_tokenize, stopwords, WordNetLemmatizer)
+    except LookupError:
+        if os.getenv("NLTK_AUTO_DOWNLOAD") != "1":
+            print("NLTK data is missing. Basic text matching will be used.")
+            print("To enable advanced features, run: python setup.py")
+            return None
+
+    start = time.perf_counter()
+    download_nlp_data()
+    record_timing("nltk_download", time.perf_counter() - start)
+    try:
+        return _warm_up(word_tokenize, stopwords, WordNetLemmatizer)
+    except LookupError as e:
+        print(f"Could not load NLTK data, basic text matching will be used: {e}")
+        return None
+
+
+def _warm_up(word_tokenize, stopwords, WordNetLemmatizer):
+    # Each corpus is loaded lazily by NLTK, so touch them all now rather than on the first request
+    start = time.perf_counter()
+    stop_words = set(stopwords.words('english'))
+    record_timing("stopwords", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    lemmatizer = WordNetLemmatizer()
+    lemmatizer.lemmatize("warming")
+    record_timing("wordnet", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    word_tokenize("Warm up the tokenizer.")
+    record_timing("punkt", time.perf_counter() - start)
+
+    return NLPResources(word_tokenize, lemmatizer.lemmatize, stop_words)
+
+
+def report_startup(total_seconds=None, budget_ms=None):
+    """Print the measured start-up steps and warn if the total exceeds the budget (milliseconds)
+
+    Steps can overlap (e.g. app_import includes everything loaded during the
+    import), so pass the wall-clock total when it is known.
+    """
+    if budget_ms is None:
+        budget_ms = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+    if total_seconds is None:
+        total_seconds = sum(startup_timings.values())
+
+    total_ms = total_seconds * 1000
+    steps = ", ".join(f"{step}={seconds * 1000:.0f}ms" for step, seconds in startup_timings.items())
+    print(f"Startup took {total_ms:.0f}ms (budget {budget_ms:.0f}ms): {steps}")
+    if total_ms > budget_ms:
+        print(f"Warning: Startup exceeded its {budget_ms:.0f}ms budget")
+    return total_ms
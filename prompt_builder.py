@@ -0,0 +1,131 @@
+"""
+Token-budgeted prompt construction for the LLM fallback
+
+Token counts are estimated locally (about four characters per token for
+English text), which is close enough to keep every request under a fixed
+budget without a tokenizer dependency. The system prompt is one constant
+message so every request starts with the same prefix; the customer's name
+and a rolling summary of older turns follow it in a separate message.
+"""
+import re
+
+SYSTEM_PROMPT = """You are a helpful customer support assistant for a small business.
+Your goal is to be helpful, concise, and friendly. If you don't know the answer to something,
+just say you don't have that information rather than making something up.
+If the user is looking for specific product information you don't have, offer to take their contact details
+to have someone follow up with them."""
+
+CHARS_PER_TOKEN = 4
+# Role and separators that every chat message adds on top of its content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+def estimate_tokens(text):
+    """Rough token count of a piece of text"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(content):
+    return estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text down to roughly max_tokens, on a word boundary where possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - 3)
+    cut = text[:limit]
+    if " " in cut[limit // 2:]:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip() + "..."
+
+
+def _clip_words(text, max_words):
+    words = text.split()
+    if len(words) <= max_words:
+        return " ".join(words)
+    return " ".join(words[:max_words]) + "..."
+
+
+def summarize_exchanges(previous_summary, exchanges, max_tokens=200, max_words=20):
+    """Fold exchanges into a rolling summary that stays under max_tokens
+
+    Each exchange becomes one short line (the question and the first sentence
+    of the answer). The oldest lines are dropped once the budget is reached,
+    so the summary always describes the most recent part of the conversation.
+    """
+    lines = previous_summary.split("\n") if previous_summary else []
+    for exchange in exchanges:
+        answer = _SENTENCE_END.split(exchange["bot_response"].strip(), 1)[0]
+        lines.append(f"Customer: {_clip_words(exchange['user_input'], max_words)} | "
+                     f"You: {_clip_words(answer, max_words)}")
+
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return truncate_to_tokens("\n".join(lines), max_tokens)
+
+
+class PromptBuilder:
+    """Builds chat messages that fit a token budget
+
+    The budget covers the whole prompt. The system prompt and the current
+    question (capped at max_message_tokens) always go in; then the customer's
+    name and the summary; then as many of the last recent_turns exchanges as
+    still fit, newest first.
+    """
+
+    def __init__(self, max_prompt_tokens=1024, max_message_tokens=256, summary_tokens=200,
+                 recent_turns=5, system_prompt=SYSTEM_PROMPT):
+        self.max_prompt_tokens = max_prompt_tokens
+        self.max_message_tokens = max_message_tokens
+        self.summary_tokens = summary_tokens
+        self.recent_turns = recent_turns
+        # Built once and shared, so the prefix of every request is byte-for-byte identical
+        self.system_message = {"role": "system", "content": system_prompt}
+        self.system_tokens = message_tokens(system_prompt)
+
+    def summarize(self, previous_summary, exchanges):
+        return summarize_exchanges(previous_summary, exchanges, self.summary_tokens)
+
+    def build(self, user_query, conversation_history=None, user_name=None, summary=None):
+        """Return the messages list for a chat completion request"""
+        # A budget smaller than the message cap still has room for the system prompt and the question
+        query_tokens = min(self.max_message_tokens, self.max_prompt_tokens - self.system_tokens - MESSAGE_OVERHEAD_TOKENS)
+        query = truncate_to_tokens(user_query, max(1, query_tokens))
+        budget = self.max_prompt_tokens - self.system_tokens - message_tokens(query)
+
+        context = []
+        if user_name:
+            context.append(f"The customer's name is {user_name}.")
+        if summary:
+            context.append("Earlier in this conversation:\n" + truncate_to_tokens(summary, self.summary_tokens))
+        context_messages = []
+        if context:
+            content = "\n".join(context)
+            if message_tokens(content) <= budget:
+                context_messages.append({"role": "system", "content": content})
+                budget -= message_tokens(content)
+
+        turns = []
+        if conversation_history and isinstance(conversation_history, list):
+            for exchange in reversed(conversation_history[-self.recent_turns:]):
+                if not (isinstance(exchange, dict) and "user_input" in exchange and "bot_response" in exchange):
+                    continue
+                question = truncate_to_tokens(exchange["user_input"], self.max_message_tokens)
+                answer = truncate_to_tokens(exchange["bot_response"], self.max_message_tokens)
+                cost = message_tokens(question) + message_tokens(answer)
+                if cost > budget:
+                    break
+                budget -= cost
+                turns.append(({"role": "user", "content": question}, {"role": "assistant", "content": answer}))
+
+        messages = [self.system_message] + context_messages
+        for question, answer in reversed(turns):
+            messages.append(question)
+            messages.append(answer)
+        messages.append({"role": "user", "content": query})
+        return messages
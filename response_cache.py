@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import string
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+def normalize_query(text):
+    """Normalize a query the way basic text analysis does: lowercase, no punctuation, single spaces"""
+    return " ".join(text.lower().translate(_PUNCTUATION).split())
+
+
+def history_fingerprint(conversation_history, window=5):
+    """Hash the exchanges that end up in the prompt, so different contexts never share an answer"""
+    if not conversation_history or not isinstance(conversation_history, list):
+        return ""
+
+    digest = hashlib.sha1()
+    for exchange in conversation_history[-window:]:
+        if isinstance(exchange, dict) and "user_input" in exchange and "bot_response" in exchange:
+            digest.update(exchange["user_input"].encode("utf-8"))
+            digest.update(b"\x00")
+            digest.update(exchange["bot_response"].encode("utf-8"))
+            digest.update(b"\x01")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """LRU + TTL cache of LLM answers with optional JSON persistence
+
+    Keys are built by make_key from the normalized query and a fingerprint of
+    the history window. When path is set, entries are loaded at start-up and
+    written back (atomically) by save().
+    """
+
+    def __init__(self, max_entries=1000, ttl=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(user_query, conversation_history=None, window=5):
+        return normalize_query(user_query) + "|" + history_fingerprint(conversation_history, window)
+
+    def get(self, key):
+        """Return a cached answer or None, counting the hit or miss"""
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and now - item[1] > self.ttl:
+                del self._entries[key]
+                self._dirty = True
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, response):
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def bypass(self):
+        """Count a request that was answered without looking at the cache"""
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def load(self):
+        """Load unexpired entries from the persistence file, if it exists"""
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not load LLM response cache: {e}")
+            return
+
+        if not isinstance(stored, list):
+            print(f"Warning: Could not load LLM response cache: {self.path} doesn't hold a list of entries")
+            return
+
+        cutoff = time.time() - self.ttl
+        skipped = 0
+        with self._lock:
+            # Stored oldest first, so replaying keeps the LRU order
+            for entry in stored:
+                try:
+                    key, response, created = entry
+                    if not isinstance(key, str) or not isinstance(response, str):
+                        raise TypeError("key and response must be strings")
+                    if created >= cutoff:
+                        self._entries[key] = (response, float(created))
+                except (TypeError, ValueError):
+                    skipped += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        if skipped:
+            print(f"Warning: Skipped {skipped} malformed LLM response cache entries")
+
+    def save(self):
+        """Write the cache to the persistence file if it changed"""
+        if not self.path or not self._dirty:
+            return
+
+        with self._lock:
+            stored = [[key, response, created] for key, (response, created) in self._entries.items()]
+            self._dirty = False
+
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not save LLM response cache: {e}")
@@ -0,0 +1,197 @@
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+
+# Rough per-object overheads used to keep the memory estimate honest without
+# walking every object with sys.getsizeof
+SESSION_OVERHEAD_BYTES = 1024
+ENTRY_OVERHEAD_BYTES = 200
+
+# Ids come back from a client cookie, so anything that doesn't look like one we minted is ignored
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+class ConversationEntry(namedtuple("ConversationEntry", ["timestamp", "user_input", "bot_response", "topic"])):
+    """One compact user/bot exchange kept in a session's history"""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {
+            "timestamp": self.timestamp,
+            "user_input": self.user_input,
+            "bot_response": self.bot_response,
+            "topic": self.topic,
+        }
+
+    def estimate_size(self):
+        return ENTRY_OVERHEAD_BYTES + len(self.user_input) + len(self.bot_response)
+
+
+class ConversationState:
+    """Everything the bot remembers about one conversation"""
+
+    __slots__ = ("session_id", "tenant", "user_name", "context", "history", "size", "last_seen",
+                 "summary", "exchanges", "summarized")
+
+    def __init__(self, session_id=None, max_history=20, tenant=None):
+        self.session_id = session_id
+        self.tenant = tenant
+        self.user_name = None
+        self.context = {"topic": None, "last_query": None}
+        self.history = deque(maxlen=max_history)
+        self.size = SESSION_OVERHEAD_BYTES
+        self.last_seen = time.monotonic()
+        # Rolling summary of older exchanges for LLM prompts, and how many exchanges it covers
+        self.summary = ""
+        self.exchanges = 0
+        self.summarized = 0
+
+    def add_exchange(self, timestamp, user_input, bot_response):
+        """Append an exchange, dropping the oldest one once history is full"""
+        entry = ConversationEntry(timestamp, user_input, bot_response, self.context.get("topic"))
+        if self.history.maxlen is not None and len(self.history) == self.history.maxlen:
+            self.size -= self.history[0].estimate_size()
+        self.history.append(entry)
+        self.size += entry.estimate_size()
+        self.exchanges += 1
+        return entry
+
+    def recent_exchanges(self, limit=None):
+        """Return the most recent exchanges as dicts, oldest first"""
+        entries = list(self.history)
+        if limit is not None:
+            entries = entries[-limit:]
+        return [entry.to_dict() for entry in entries]
+
+    def unsummarized_exchanges(self, keep_recent):
+        """Exchanges older than the last keep_recent that the summary doesn't cover yet, as dicts"""
+        pending = self.exchanges - keep_recent - self.summarized
+        if pending <= 0:
+            return []
+        # Anything that already fell out of the history can't be summarized any more
+        older = list(self.history)[:max(0, len(self.history) - keep_recent)]
+        return [entry.to_dict() for entry in older[-pending:]]
+
+    def update_summary(self, summary, keep_recent):
+        """Replace the summary, which now covers everything before the last keep_recent exchanges"""
+        self.size += len(summary) - len(self.summary)
+        self.summary = summary
+        self.summarized = max(self.summarized, self.exchanges - keep_recent)
+
+
+class SessionStore:
+    """In-memory conversation state keyed by session id
+
+    Sessions expire after ttl seconds of inactivity and are evicted least
+    recently used first when either max_sessions or max_memory_bytes is hit.
+    """
+
+    def __init__(self, ttl=1800, max_sessions=10000, max_memory_bytes=64 * 1024 * 1024, max_history=20):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_memory_bytes = max_memory_bytes
+        self.max_history = max_history
+
+        self._sessions = OrderedDict()
+        self._accounted = {}
+        self._memory = 0
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @property
+    def memory_bytes(self):
+        return self._memory
+
+    @staticmethod
+    def new_session_id():
+        return secrets.token_urlsafe(16)
+
+    def get(self, session_id=None, tenant=None):
+        """Return the state for a session, starting a fresh one if it is unknown or expired
+
+        A new session always gets a freshly minted id, never the one asked
+        for, so a client can't plant an id for someone else to use. A session
+        belongs to the tenant that started it; asking for it under another
+        tenant starts a new session instead.
+        """
+        if session_id and not SESSION_ID.match(session_id):
+            session_id = None
+        now = time.monotonic()
+        with self._lock:
+            state = self._sessions.get(session_id) if session_id else None
+            if state is not None and now - state.last_seen > self.ttl:
+                self._remove(session_id)
+                self.expirations += 1
+                state = None
+            if state is not None and state.tenant != tenant:
+                state = None
+
+            if state is None:
+                session_id = self.new_session_id()
+                state = ConversationState(session_id, max_history=self.max_history, tenant=tenant)
+                self._sessions[session_id] = state
+                self._accounted[session_id] = state.size
+                self._memory += state.size
+            else:
+                self._sessions.move_to_end(session_id)
+
+            state.last_seen = now
+            self._enforce_limits(keep=session_id)
+            return state
+
+    def save(self, state):
+        """Account for a session's new size after a request and apply the limits"""
+        with self._lock:
+            if state.session_id not in self._sessions:
+                return
+            self._memory += state.size - self._accounted[state.session_id]
+            self._accounted[state.session_id] = state.size
+            self._enforce_limits(keep=state.session_id)
+
+    def discard(self, session_id):
+        with self._lock:
+            self._remove(session_id)
+
+    def purge_expired(self):
+        """Drop every session idle for longer than the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        with self._lock:
+            # The dict is ordered by last use, so expired sessions are at the front
+            while self._sessions:
+                session_id, state = next(iter(self._sessions.items()))
+                if state.last_seen > cutoff:
+                    break
+                self._remove(session_id)
+                self.expirations += 1
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "memory_bytes": self._memory,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    def _enforce_limits(self, keep=None):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._memory > self.max_memory_bytes):
+            session_id = next(iter(self._sessions))
+            if session_id == keep:
+                # Never evict the session serving the current request
+                if len(self._sessions) == 1:
+                    break
+                self._sessions.move_to_end(session_id)
+                session_id = next(iter(self._sessions))
+            self._remove(session_id)
+            self.evictions += 1
+
+    def _remove(self, session_id):
+        if self._sessions.pop(session_id, None) is not None:
+            self._memory -= self._accounted.pop(session_id)
@@ -26,10 +26,8 @@ def setup():
     # Setup NLTK data
     print("\nDownloading NLTK data...")
     try:
-        import nltk
-        nltk.download('punkt')
-        nltk.download('stopwords')
-        nltk.download('wordnet')
+        from nlp_resources import download_nlp_data
+        download_nlp_data(quiet=False)
         print("NLTK data downloaded successfully!")
     except ImportError:
         print("NLTK not installed. Please run: pip install nltk")
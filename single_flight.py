@@ -0,0 +1,105 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is still running wait for it and get the same result, or
+    the same exception. Nothing is remembered once the call finishes, so this
+    only dedupes work that overlaps in time; ResponseCache handles the rest.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, func, *args):
+        """Return (result, shared): func(*args), or the result of an identical call already running"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func(*args)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight for a single event loop
+
+    The leader's call runs as its own task, so a caller that is cancelled
+    (say, because its client disconnected) doesn't cancel it for the others.
+    Once every caller waiting on it has been cancelled, nobody wants the
+    result any more, so the call itself is cancelled too.
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._waiters = {}
+        self.leaders = 0
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._tasks)
+
+    async def do(self, key, func, *args):
+        """Return (result, shared), awaiting func(*args) or an identical call already running"""
+        task = self._tasks.get(key)
+        shared = task is not None
+        if shared:
+            self.shared += 1
+        else:
+            task = asyncio.ensure_future(func(*args))
+            self._tasks[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+            self.leaders += 1
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    # The last waiter left; later callers start a fresh call instead of joining this one
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# Tenant ids become file names, so only plain names are accepted
+TENANT_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+# Rough sizes used for the memory budget: a bot's fixed overhead, and how many
+# bytes its analyzed tokens, postings and trigrams take per character of FAQ text
+TENANT_OVERHEAD_BYTES = 64 * 1024
+INDEX_BYTES_PER_CHAR = 8
+
+
+def estimate_knowledge_base_size(responses):
+    """Approximate memory used by a bot for a knowledge base, once indexed"""
+    text_length = len(json.dumps(responses))
+    return TENANT_OVERHEAD_BYTES + text_length * INDEX_BYTES_PER_CHAR
+
+
+class TenantRegistry:
+    """One bot per storefront, loaded on first use and evicted least recently used first
+
+    A tenant's knowledge base lives at <directory>/<tenant_id>.json. The bot
+    for it is created by factory(tenant_id, path) the first time the tenant
+    is asked for, and builds its indexes on its first question; every session
+    of the tenant shares it. When more than max_tenants are loaded, or their
+    estimated size goes over max_memory_bytes, the least recently used
+    tenants are closed and dropped, to be loaded again on their next request.
+    """
+
+    def __init__(self, factory, directory="tenants", max_tenants=100, max_memory_bytes=256 * 1024 * 1024):
+        self.factory = factory
+        self.directory = directory
+        self.max_tenants = max_tenants
+        self.max_memory_bytes = max_memory_bytes
+
+        self._bots = OrderedDict()
+        self._sizes = {}
+        self._memory = 0
+        self._loading = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._bots)
+
+    def __contains__(self, tenant_id):
+        return tenant_id in self._bots
+
+    @property
+    def memory_bytes(self):
+        return self._memory
+
+    def path_for(self, tenant_id):
+        return os.path.join(self.directory, f"{tenant_id}.json")
+
+    def exists(self, tenant_id):
+        """Whether a tenant id is valid and has a knowledge base"""
+        return bool(tenant_id and TENANT_ID.match(tenant_id)) and os.path.isfile(self.path_for(tenant_id))
+
+    def get(self, tenant_id):
+        """Return the bot for a tenant, loading it if needed; None for an unknown tenant"""
+        with self._lock:
+            bot = self._touch(tenant_id)
+            if bot is not None:
+                return bot
+        if not self.exists(tenant_id):
+            return None
+
+        with self._lock:
+            loading = self._loading.setdefault(tenant_id, threading.Lock())
+        # Only one thread loads a given tenant, and loading doesn't hold up other tenants
+        try:
+            with loading:
+                with self._lock:
+                    bot = self._touch(tenant_id)
+                    if bot is not None:
+                        return bot
+
+                bot = self.factory(tenant_id, self.path_for(tenant_id))
+                size = estimate_knowledge_base_size(bot.responses)
+                with self._lock:
+                    self._bots[tenant_id] = bot
+                    self._sizes[tenant_id] = size
+                    self._memory += size
+                    self.loads += 1
+                    evicted = self._enforce_limits(keep=tenant_id)
+        finally:
+            # Also when the factory failed, so the next request tries again with a fresh lock
+            with self._lock:
+                if self._loading.get(tenant_id) is loading:
+                    del self._loading[tenant_id]
+
+        for old_bot in evicted:
+            old_bot.close()
+        return bot
+
+    def resize(self, tenant_id):
+        """Re-estimate a tenant's size after its knowledge base changed"""
+        with self._lock:
+            bot = self._bots.get(tenant_id)
+            if bot is None:
+                return
+            size = estimate_knowledge_base_size(bot.responses)
+            self._memory += size - self._sizes[tenant_id]
+            self._sizes[tenant_id] = size
+            evicted = self._enforce_limits(keep=tenant_id)
+        for old_bot in evicted:
+            old_bot.close()
+
+    def evict(self, tenant_id):
+        with self._lock:
+            bot = self._remove(tenant_id)
+        if bot is not None:
+            bot.close()
+
+    def stats(self):
+        return {
+            "tenants": len(self._bots),
+            "memory_bytes": self._memory,
+            "hits": self.hits,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def _touch(self, tenant_id):
+        bot = self._bots.get(tenant_id)
+        if bot is not None:
+            self._bots.move_to_end(tenant_id)
+            self.hits += 1
+        return bot
+
+    def _enforce_limits(self, keep=None):
+        evicted = []
+        while len(self._bots) > 1 and (len(self._bots) > self.max_tenants or self._memory > self.max_memory_bytes):
+            tenant_id = next(iter(self._bots))
+            if tenant_id == keep:
+                # Never evict the tenant serving the current request
+                self._bots.move_to_end(tenant_id)
+                tenant_id = next(iter(self._bots))
+            evicted.append(self._remove(tenant_id))
+            self.evictions += 1
+        return evicted
+
+    def _remove(self, tenant_id):
+        bot = self._bots.pop(tenant_id, None)
+        if bot is not None:
+            self._memory -= self._sizes.pop(tenant_id)
+        return bot
@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import BATCH, INTERACTIVE, AdmissionController, LLMOverloaded, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_token_bucket_refills_at_its_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert bucket.take() and bucket.take()
+    assert not bucket.take()
+    assert bucket.wait_time() == pytest.approx(0.5)
+    clock.now = 0.5
+    assert bucket.take()
+    assert not bucket.take()
+    # Never more than the burst, however long it was idle
+    clock.now = 100
+    assert sum(bucket.take() for _ in range(5)) == 2
+
+
+def test_slots_limit_concurrent_calls():
+    admission = AdmissionController(max_concurrent=2)
+    assert admission.try_acquire() and admission.try_acquire()
+    assert not admission.try_acquire()
+    admission.release()
+    assert admission.try_acquire()
+    assert admission.snapshot()["active"] == 2
+
+
+def test_rate_limit_applies_without_a_free_slot_shortage():
+    clock = FakeClock()
+    admission = AdmissionController(max_concurrent=10, rate=1, burst=1, clock=clock)
+    assert admission.try_acquire()
+    assert not admission.try_acquire()
+    clock.now = 1.0
+    assert admission.try_acquire()
+
+
+def _acquire_in_thread(admission, priority, order, errors):
+    def run():
+        try:
+            admission.acquire(priority)
+            order.append(priority)
+        except LLMOverloaded as e:
+            errors.append((priority, e.reason))
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def test_waiters_are_served_most_important_first():
+    admission = AdmissionController(max_concurrent=1, queue_timeout=5)
+    admission.acquire()
+    order, errors = [], []
+    threads = []
+    for priority in (BATCH, BATCH, INTERACTIVE):
+        threads.append(_acquire_in_thread(admission, priority, order, errors))
+        wait_until(lambda: admission.snapshot()["queued"] == len(threads))
+
+    for served in range(1, len(threads) + 1):
+        admission.release()
+        wait_until(lambda: len(order) == served)
+    for thread in threads:
+        thread.join()
+    assert order == [INTERACTIVE, BATCH, BATCH]
+    assert errors == []
+
+
+def test_full_queue_displaces_a_less_important_waiter():
+    admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+    admission.acquire()
+    order, errors = [], []
+    batch = _acquire_in_thread(admission, BATCH, order, errors)
+    wait_until(lambda: admission.snapshot()["queued"] == 1)
+
+    interactive = _acquire_in_thread(admission, INTERACTIVE, order, errors)
+    batch.join(5)
+    assert errors == [(BATCH, "displaced")]
+
+    # Nothing more important waits behind it, so a newcomer is simply turned away
+    with pytest.raises(LLMOverloaded) as rejected:
+        admission.acquire(BATCH)
+    assert rejected.value.reason == "queue_full"
+
+    admission.release()
+    interactive.join(5)
+    assert order == [INTERACTIVE]
+    assert admission.snapshot()["rejected"] == {"displaced": 1, "queue_full": 1}
+
+
+def test_waiter_gives_up_after_the_queue_timeout():
+    admission = AdmissionController(max_concurrent=1, queue_timeout=0.05)
+    admission.acquire()
+    started = time.monotonic()
+    with pytest.raises(LLMOverloaded) as rejected:
+        admission.acquire()
+    assert rejected.value.reason == "timeout"
+    assert time.monotonic() - started >= 0.05
+
+
+def test_cancelled_async_waiter_leaves_the_queue():
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, queue_timeout=5)
+        await admission.acquire_async()
+        waiter = asyncio.ensure_future(admission.acquire_async())
+        await asyncio.sleep(0.01)
+        assert admission.snapshot()["queued"] == 1
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert admission.snapshot()["queued"] == 0
+        assert admission.snapshot()["rejected"] == {"cancelled": 1}
+
+        admission.release()
+        assert await admission.acquire_async()
+
+    asyncio.run(scenario())
+
+
+def test_occupy_counts_a_running_request_against_the_limit():
+    admission = AdmissionController(max_concurrent=1)
+    admission.occupy()
+    assert not admission.try_acquire()
+    admission.release()
+    assert admission.try_acquire()
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+import pytest
+
+import advanced_chatbot
+from admission import BATCH
+from advanced_chatbot import AdvancedSupportBot
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAQ_QUESTION = "What are your business hours?"
+LLM_QUESTIONS = ["what is the capital of france", "tell me a joke about cats", "is it raining in paris today",
+                 "who painted the mona lisa", "how far away is the moon", "who won the football match"]
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
+
+
+class _FakeLLM:
+    """Answers after a short delay and records how many calls were in flight at once"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.priorities = []
+        self._lock = threading.Lock()
+
+    def __call__(self, user_input, history=None, user_name=None, summary=None, priority=None, overflow=None):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.priorities.append(priority)
+        try:
+            time.sleep(self.delay)
+            return f"LLM: {user_input}"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    llm = _FakeLLM()
+    monkeypatch.setattr(advanced_chatbot, "LLM_AVAILABLE", True)
+    monkeypatch.setattr(advanced_chatbot, "llm_circuit_open", lambda: False)
+    monkeypatch.setattr(advanced_chatbot, "get_llm_response", llm)
+    return llm
+
+
+@pytest.fixture
+def bot(fake_llm):
+    return AdvancedSupportBot(use_llm=True, log_writer=_DiscardLog(),
+                              knowledge_base_path=os.path.join(REPO_DIR, "knowledge_base.json"))
+
+
+def test_responses_come_back_in_input_order(bot, fake_llm):
+    messages = [LLM_QUESTIONS[0], FAQ_QUESTION, "hello", LLM_QUESTIONS[1], FAQ_QUESTION]
+    responses = bot.get_responses(messages)
+
+    assert len(responses) == len(messages)
+    assert responses[0] == f"LLM: {LLM_QUESTIONS[0]}"
+    assert responses[1] in bot.responses["faq"]["hours"]
+    assert responses[2] in [greeting.format(bot_name=bot.name) for greeting in bot.responses["greeting"]]
+    assert responses[3] == f"LLM: {LLM_QUESTIONS[1]}"
+    assert responses[4] in bot.responses["faq"]["hours"]
+    # Only the misses went to the LLM, as batch traffic
+    assert fake_llm.priorities == [BATCH, BATCH]
+
+
+def test_llm_calls_are_capped_at_the_batch_concurrency(bot, fake_llm, monkeypatch):
+    monkeypatch.setenv("BATCH_LLM_CONCURRENCY", "2")
+    responses = bot.get_responses(LLM_QUESTIONS)
+
+    assert responses == [f"LLM: {question}" for question in LLM_QUESTIONS]
+    assert fake_llm.max_in_flight == 2
+
+
+def test_explicit_concurrency_overrides_the_setting(bot, fake_llm):
+    bot.get_responses(LLM_QUESTIONS, max_concurrency=1)
+    assert fake_llm.max_in_flight == 1
+
+
+@pytest.fixture
+def app_module(fake_llm):
+    pytest.importorskip("flask")
+    # app.py loads knowledge_base.json relative to the working directory
+    previous = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(previous)
+
+
+def test_batch_endpoint_answers_in_order(app_module, monkeypatch):
+    monkeypatch.setattr(app_module.bot, "use_llm", True)
+    client = app_module.app.test_client()
+    response = client.post("/api/chat/batch", json={"messages": [LLM_QUESTIONS[0], FAQ_QUESTION]})
+
+    assert response.status_code == 200
+    first, second = response.get_json()["responses"]
+    assert first == f"LLM: {LLM_QUESTIONS[0]}"
+    assert second in app_module.bot.responses["faq"]["hours"]
+
+
+def test_batch_endpoint_rejects_too_many_messages(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MAX_BATCH_SIZE", 2)
+    client = app_module.app.test_client()
+    response = client.post("/api/chat/batch", json={"messages": ["hi", "hello", "hey"]})
+    assert response.status_code == 400
+    assert "At most 2" in response.get_json()["error"]
+
+    assert client.post("/api/chat/batch", json={"messages": ["hi", "hello"]}).status_code == 200
+
+
+@pytest.mark.parametrize("messages", ["hello", None, {"0": "hello"}, ["hello", 42]])
+def test_batch_endpoint_rejects_messages_that_are_not_a_list_of_strings(app_module, messages):
+    client = app_module.app.test_client()
+    response = client.post("/api/chat/batch", json={"messages": messages})
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "messages must be a list of strings"
@@ -0,0 +1,111 @@
+import http.client
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from benchmark import StageTimer, StubLLMServer, load_replay_messages, percentile, synthetic_knowledge_base
+
+BASE = {
+    "greetings": ["Hello!"],
+    "faq": {
+        "business hours": ["We are open from 9am to 5pm."],
+        "payment methods": ["We accept credit cards and PayPal."],
+    },
+    "fallback": ["Sorry?"],
+}
+
+
+def test_percentile_uses_the_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.95) == 95
+    assert percentile(values, 0.99) == 99
+    assert percentile([], 0.5) == 0.0
+    assert percentile([7], 0.99) == 7
+
+
+def test_stage_timer_summarizes_each_stage():
+    timer = StageTimer()
+    timed = timer.wrap("double", lambda value: value * 2)
+    assert [timed(number) for number in range(3)] == [0, 2, 4]
+    assert timer.summary()["double"]["count"] == 3
+
+
+def test_synthetic_knowledge_base_has_the_requested_size():
+    grown = synthetic_knowledge_base(BASE, 50, seed=1)
+    assert len(grown["faq"]) == 50
+    # The real FAQs come first and the other sections are kept
+    assert list(grown["faq"])[:2] == list(BASE["faq"])
+    assert grown["fallback"] == BASE["fallback"]
+    assert synthetic_knowledge_base(BASE, 50, seed=1) == grown
+    assert list(synthetic_knowledge_base(BASE, 1)["faq"]) == ["business hours"]
+
+
+def test_replay_messages_come_from_every_log_format(tmp_path):
+    (tmp_path / "conversation_20240101.json").write_text(json.dumps([{"user_input": "hi"}, {"bot_response": "x"}]))
+    (tmp_path / "conversation_20240102.jsonl").write_text('{"user_input": "hours?"}\n{"user_input": "bye"}\n')
+    assert load_replay_messages(str(tmp_path)) == ["hi", "hours?", "bye"]
+    assert load_replay_messages(str(tmp_path), limit=2) == ["hi", "hours?"]
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.status, response.read().decode()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**profile):
+        server = StubLLMServer(**profile).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_stub_server_answers_like_the_chat_completions_api(stub):
+    server = stub()
+    status, body = _post(server.url, {"messages": []})
+    assert status == 200
+    assert json.loads(body)["choices"][0]["message"]["content"] == "This is a stubbed answer."
+
+    status, body = _post(server.url, {"messages": [], "stream": True})
+    assert body.endswith("data: [DONE]\n\n")
+    assert server.calls == 2
+
+
+def test_stub_server_error_profile(stub):
+    server = stub(error_rate=1.0)
+    with pytest.raises(urllib.error.HTTPError) as failed:
+        _post(server.url, {"messages": []})
+    assert failed.value.code in (429, 500, 503)
+    assert server.errors == 1
+
+
+def test_instant_profile_answers_quickly_on_a_reused_connection(stub):
+    server = stub()
+    host, port = server.server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    timings = []
+    try:
+        for _ in range(5):
+            started = time.perf_counter()
+            connection.request("POST", "/api/v1/chat/completions", body=b'{"messages": []}',
+                               headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            response.read()
+            timings.append(time.perf_counter() - started)
+            assert response.status == 200
+    finally:
+        connection.close()
+    # Delayed ACKs would add about 40 ms to every call after the first
+    assert max(timings[1:]) < 0.02, timings
@@ -0,0 +1,81 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("flask")
+
+import advanced_chatbot  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def app_module():
+    # app.py loads knowledge_base.json relative to the working directory
+    previous = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def logged(app_module, monkeypatch):
+    logged = []
+    monkeypatch.setattr(app_module.bot, "log_conversation",
+                        lambda user_input, response, state=None: logged.append((user_input, response)))
+    return logged
+
+
+def parse_events(body):
+    """Split a server-sent event stream into (event, data) pairs, checking the framing on the way"""
+    assert body.endswith("\n\n")
+    events = []
+    for block in body[:-2].split("\n\n"):
+        event_line, data_line = block.split("\n")
+        assert event_line.startswith("event: ") and data_line.startswith("data: ")
+        events.append((event_line[len("event: "):], json.loads(data_line[len("data: "):])))
+    return events
+
+
+def post_stream(app_module, message):
+    client = app_module.app.test_client()
+    response = client.post("/api/chat/stream", json={"message": message})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.headers["X-Accel-Buffering"] == "no"
+    return parse_events(response.get_data(as_text=True))
+
+
+def test_faq_answer_is_one_token_then_done(app_module, logged):
+    events = post_stream(app_module, "What are your business hours?")
+
+    assert [event for event, _ in events] == ["token", "done"]
+    answer = events[0][1]["token"]
+    assert answer in app_module.bot.responses["faq"]["hours"]
+    assert events[1][1] == {"response": answer, "userName": None}
+    assert logged == [("What are your business hours?", answer)]
+
+
+def test_llm_answer_streams_token_by_token(app_module, logged, monkeypatch):
+    def fake_stream(user_input, history=None, user_name=None, summary=None, priority=None, overflow=None):
+        yield from ["Paris", " is the", " capital.\nOf France."]
+
+    monkeypatch.setattr(advanced_chatbot, "LLM_AVAILABLE", True)
+    monkeypatch.setattr(advanced_chatbot, "llm_circuit_open", lambda: False)
+    monkeypatch.setattr(advanced_chatbot, "stream_llm_response", fake_stream)
+    monkeypatch.setattr(app_module.bot, "use_llm", True)
+    events = post_stream(app_module, "what is the capital of france")
+
+    assert events == [
+        ("token", {"token": "Paris"}),
+        ("token", {"token": " is the"}),
+        # Newlines inside a token are escaped, so they can't end the event early
+        ("token", {"token": " capital.\nOf France."}),
+        ("done", {"response": "Paris is the capital.\nOf France.", "userName": None}),
+    ]
+    assert logged == [("what is the capital of france", "Paris is the capital.\nOf France.")]
@@ -0,0 +1,104 @@
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(clock, **options):
+    settings = dict(window=4, min_calls=4, failure_threshold=0.5, slow_call_seconds=1.0, open_seconds=30.0)
+    settings.update(options)
+    return CircuitBreaker(clock=clock, **settings)
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        assert breaker.allow()
+        breaker.record(False)
+
+
+def test_stays_closed_until_enough_calls_fail():
+    breaker = make_breaker(FakeClock())
+    fail(breaker, 3)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    breaker.record(True)
+    # 3 failures out of the last 4 calls
+    assert breaker.state == OPEN
+
+
+def test_slow_calls_count_as_failures():
+    breaker = make_breaker(FakeClock())
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(True, seconds=2.0)
+    assert breaker.state == OPEN
+
+
+def test_open_breaker_fails_fast_then_half_opens():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    assert breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+    clock.now = 30.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert not breaker.allow()
+    assert breaker.is_open()
+
+
+def test_successful_probe_closes_the_breaker():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert not breaker.is_open()
+    # The old failures are forgotten
+    fail(breaker, 3)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_opens_it_again():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.now = 30.0
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+    clock.now = 59.0
+    assert not breaker.allow()
+    assert breaker.snapshot()["retry_in_seconds"] == 1.0
+
+
+def test_calls_started_before_opening_are_ignored():
+    breaker = make_breaker(FakeClock())
+    assert breaker.allow()
+    fail(breaker, 4)
+    breaker.record(True)
+    assert breaker.state == OPEN
+
+
+def test_cancelled_probe_frees_its_place():
+    clock = FakeClock()
+    breaker = make_breaker(clock)
+    fail(breaker, 4)
+    clock.now = 30.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.cancel()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.is_open()
+    assert breaker.allow()
@@ -0,0 +1,53 @@
+import io
+import json
+
+import pytest
+
+from conversation_log import ConversationLogWriter, _iter_json_array, conversation_log_files, iter_conversation_log
+
+ARRAYS = [
+    "[]",
+    "  [ ]\n",
+    "[1, 2, 3]",
+    "[12.5, -3e10, 1E-2, 0.125, 7]",
+    '[true, false, null, 1.5e+3]',
+    '[{"a": "]"}, [1, [2]], "x,[", 3.25]',
+    '[{"user_input": "hi", "bot_response": "Hello!", "context": {"topic": "greeting"}}]',
+]
+
+
+@pytest.mark.parametrize("text", ARRAYS)
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 7, 64 * 1024])
+def test_incremental_array_matches_json_load(text, chunk_size):
+    assert list(_iter_json_array(io.StringIO(text), chunk_size)) == json.loads(text)
+
+
+def test_every_split_of_a_number_decodes_correctly():
+    text = "[123.456e-7, 98765, -0.5]"
+    for chunk_size in range(1, len(text) + 1):
+        assert list(_iter_json_array(io.StringIO(text), chunk_size)) == json.loads(text), chunk_size
+
+
+def test_truncated_array_raises_after_the_complete_entries():
+    entries = _iter_json_array(io.StringIO('[{"a": 1}, {"b"'), 4)
+    assert next(entries) == {"a": 1}
+    with pytest.raises(json.JSONDecodeError):
+        next(entries)
+
+
+def test_writer_output_is_read_back_in_order(tmp_path):
+    writer = ConversationLogWriter(log_dir=str(tmp_path), fsync="never")
+    for number in range(25):
+        writer.write({"user_input": f"message {number}"})
+    writer.close()
+
+    (tmp_path / "conversation_20240101.json").write_text(json.dumps([{"user_input": "legacy"}]))
+    entries = [entry for path in conversation_log_files(str(tmp_path)) for entry in iter_conversation_log(path)]
+    assert entries[0] == {"user_input": "legacy"}
+    assert [entry["user_input"] for entry in entries[1:]] == [f"message {number}" for number in range(25)]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "conversation_20240101.jsonl"
+    path.write_text('{"user_input": "ok"}\n{"user_input": "to')
+    assert list(iter_conversation_log(str(path))) == [{"user_input": "ok"}]
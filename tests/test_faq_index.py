@@ -0,0 +1,99 @@
+import json
+import os
+import re
+from collections import Counter
+
+import pytest
+
+from faq_index import FAQIndex
+from text_analysis import TextAnalyzer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUESTIONS = [
+    "What are your business hours?",
+    "hours hours hours",
+    "How do I return an item I bought?",
+    "Do you ship internationally and how long does shipping take?",
+    "Which payment methods do you accept? Can I pay with PayPal?",
+    "Is there a discount or a coupon for students?",
+    "How can I contact customer support by phone or email?",
+    "What does the warranty cover?",
+    "Tell me about your return policy and your warranty",
+    "what is the capital of france",
+    "",
+]
+
+
+class _FakeNLP:
+    """Stands in for NLTK: tokens with punctuation, stopwords and a crude plural lemmatizer"""
+    stop_words = frozenset("a an and are can do does how i is it of or the to what which with you your".split())
+
+    def tokenize(self, text):
+        return re.findall(r"\w+|[^\w\s]", text)
+
+    def lemmatize(self, token):
+        return token[:-1] if token.endswith("s") and len(token) > 3 else token
+
+
+@pytest.fixture(scope="module")
+def faqs():
+    with open(os.path.join(REPO_DIR, "knowledge_base.json"), 'r') as f:
+        return json.load(f)["faq"]
+
+
+def brute_force_similarity(tokens1, tokens2, use_sets):
+    """The score the bot used before the index: every FAQ text compared in full"""
+    if use_sets:
+        words1, words2 = set(tokens1), set(tokens2)
+        if not words1 or not words2:
+            return 0.0
+        return len(words1 & words2) / min(len(words1), len(words2))
+
+    if not tokens1 or not tokens2:
+        return 0.0
+    counter1, counter2 = Counter(tokens1), Counter(tokens2)
+    sum_common = sum(min(counter1[word], counter2[word]) for word in set(counter1) & set(counter2))
+    return 2.0 * sum_common / (sum(counter1.values()) + sum(counter2.values()))
+
+
+def brute_force_best_match(analyze, faqs, question, use_sets, threshold=0.2):
+    best_keyword, best_similarity = None, 0.0
+    for keyword, responses in faqs.items():
+        keyword_text = keyword + " " + " ".join(responses)
+        similarity = brute_force_similarity(analyze(question), analyze(keyword_text), use_sets)
+        if similarity > best_similarity and similarity > threshold:
+            best_keyword, best_similarity = keyword, similarity
+    return best_keyword, best_similarity
+
+
+@pytest.mark.parametrize("use_sets,nlp", [(False, _FakeNLP()), (True, None)], ids=["counts", "sets"])
+def test_index_scores_match_brute_force(faqs, use_sets, nlp):
+    analyzer = TextAnalyzer(lambda: nlp)
+    analyze = analyzer.document_tokens
+    index = FAQIndex(analyze, use_sets=use_sets)
+    index.build(faqs)
+
+    for question in QUESTIONS:
+        tokens = analyze(question)
+        for keyword, responses in faqs.items():
+            expected = brute_force_similarity(tokens, analyze(keyword + " " + " ".join(responses)), use_sets)
+            assert index.score(tokens, keyword) == pytest.approx(expected), (question, keyword)
+
+        keyword, similarity = index.best_match(tokens)
+        expected_keyword, expected_similarity = brute_force_best_match(analyze, faqs, question, use_sets)
+        assert keyword == expected_keyword, question
+        assert similarity == pytest.approx(expected_similarity), question
+
+
+def test_counts_path_sees_repeated_terms(faqs):
+    # The Dice score depends on how often a term repeats; the word overlap score doesn't
+    analyze = TextAnalyzer(lambda: _FakeNLP()).document_tokens
+    counts = FAQIndex(analyze)
+    counts.build(faqs)
+    sets = FAQIndex(analyze, use_sets=True)
+    sets.build(faqs)
+
+    once, repeated = analyze("hours"), analyze("hours hours hours")
+    assert counts.score(repeated, "hours") != pytest.approx(counts.score(once, "hours"))
+    assert sets.score(repeated, "hours") == sets.score(once, "hours")
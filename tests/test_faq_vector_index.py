@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+from faq_vector_index import SCORING_METHODS, VectorFAQIndex  # noqa: E402
+
+FAQS = {
+    "business hours": ["We are open from 9am to 5pm, Monday to Friday."],
+    "payment methods": ["We accept credit cards and PayPal."],
+    "shipping policy": ["Shipping is free on orders over $50."],
+}
+
+
+def analyzer(text):
+    return text.lower().replace(",", "").replace(".", "").split()
+
+
+@pytest.mark.parametrize("method", SCORING_METHODS)
+def test_best_match_finds_the_right_faq(method):
+    index = VectorFAQIndex(analyzer, method=method)
+    index.build(FAQS)
+    assert index.best_match(["payment", "paypal"])[0] == "payment methods"
+    assert index.best_match(["weather", "forecast"]) == (None, 0.0)
+
+
+def test_update_adds_new_terms_and_remove_drops_the_faq():
+    index = VectorFAQIndex(analyzer)
+    index.build(FAQS)
+    index.best_match(["hours"])
+    index.update("gift cards", ["Gift cards are sold in any amount."])
+    assert index.best_match(["gift", "cards"])[0] == "gift cards"
+    index.remove("gift cards")
+    assert "gift cards" not in index
+    assert index.best_match(["gift", "cards"])[0] is None
+
+
+class _Vocabulary(dict):
+    """Runs a hook the first time a term is added, i.e. in the middle of an update"""
+
+    hook = None
+
+    def __setitem__(self, term, position):
+        super().__setitem__(term, position)
+        if self.hook is not None:
+            hook, self.hook = self.hook, None
+            hook()
+
+
+def test_query_during_an_update_sees_a_consistent_corpus():
+    index = VectorFAQIndex(analyzer)
+    index.build(FAQS)
+    index.vocabulary = _Vocabulary(index.vocabulary)
+    results = []
+
+    def query():
+        try:
+            results.append(index.best_match(["gift", "cards"]))
+        except Exception as e:
+            results.append(e)
+
+    reader = threading.Thread(target=query)
+
+    def query_mid_update():
+        # The query must either wait for the update or not see it at all
+        reader.start()
+        reader.join(0.2)
+
+    index.vocabulary.hook = query_mid_update
+    index.update("gift cards", ["Gift cards are sold in any amount."])
+    reader.join()
+
+    assert len(results) == 1 and not isinstance(results[0], Exception), results
+    assert index.best_match(["gift", "cards"])[0] == "gift cards"
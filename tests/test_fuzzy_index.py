@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from advanced_chatbot import AdvancedSupportBot
+from fuzzy_index import FuzzyIndex, bounded_edit_distance, is_abbreviation, looks_abbreviated
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FAQS = {
+    "business hours": ["We are open from 9am to 5pm, Monday to Friday."],
+    "payment methods": ["We accept credit cards and PayPal for every item we offer."],
+    "shipping policy": ["Shipping is free on orders over $50. We use tracked delivery."],
+}
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
+
+
+@pytest.fixture
+def index():
+    index = FuzzyIndex(stop_words={"what", "is", "the", "are", "your"})
+    index.build(FAQS)
+    return index
+
+
+def test_edit_distance_counts_swaps_and_stops_at_limit():
+    assert bounded_edit_distance("hours", "huors", 2) == 1
+    assert bounded_edit_distance("shiping", "shipping", 2) == 1
+    assert bounded_edit_distance("payment", "delivery", 2) == 3
+
+
+def test_abbreviations_need_three_letters():
+    assert is_abbreviation("hrs", "hours")
+    assert is_abbreviation("pmt", "payment")
+    assert not looks_abbreviated("of")
+    assert not is_abbreviation("it", "item")
+
+
+def test_typos_and_abbreviations_are_corrected(index):
+    assert index.correct("what are your busness hrs") == ("what are your business hours", 2)
+    assert index.match_keyword("what are your business hours") == "business hours"
+
+
+def test_two_letter_words_are_left_alone(index):
+    corrected, changed = index.correct("what is the capital of france")
+    assert corrected == "what is the capital of france"
+    assert changed == 0
+    assert index.match_keyword(corrected) is None
+
+
+@pytest.mark.parametrize("question", [
+    "what is the capital of france",
+    "is it raining in paris today",
+    "tell us a joke about cats",
+])
+def test_off_topic_questions_still_fall_back(question):
+    bot = AdvancedSupportBot(use_llm=False, log_writer=_DiscardLog(),
+                             knowledge_base_path=os.path.join(REPO_DIR, "knowledge_base.json"))
+    assert bot.get_response(question) in bot.responses["fallback"]
+    assert bot.conversation_context.get("topic") is None
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import llm_integration
+from admission import AdmissionController
+from hedging import Hedger
+
+
+@pytest.fixture
+def executor():
+    executor = ThreadPoolExecutor(max_workers=4)
+    yield executor
+    executor.shutdown(wait=True)
+
+
+def test_fast_first_attempt_is_not_hedged(executor):
+    hedger = Hedger(initial_delay=0.5)
+    hedges = []
+    result = hedger.run(lambda: "first", lambda: hedges.append(1) or "hedge", executor)
+    assert result == ("first", None)
+    assert hedges == []
+    assert hedger.hedges == 0
+
+
+def test_hedge_fires_only_after_the_delay_and_can_win(executor):
+    hedger = Hedger(initial_delay=0.05)
+    release = threading.Event()
+    hedge_started = []
+
+    def slow():
+        release.wait(5)
+        return "first"
+
+    def hedge():
+        hedge_started.append(time.perf_counter())
+        return "hedge"
+
+    started = time.perf_counter()
+    abandoned = []
+    assert hedger.run(slow, hedge, executor, on_abandoned=abandoned.append) == ("hedge", "won")
+    assert hedge_started[0] - started >= 0.05
+    assert hedger.hedges_won == 1
+    # The first attempt is still running and is handed back to the caller
+    assert len(abandoned) == 1 and not abandoned[0].done()
+    release.set()
+    assert abandoned[0].result(5) == "first"
+
+
+def test_first_attempt_winning_after_the_hedge_started(executor):
+    hedger = Hedger(initial_delay=0.02)
+    release_hedge = threading.Event()
+
+    def first():
+        time.sleep(0.05)
+        return "first"
+
+    def hedge():
+        release_hedge.wait(5)
+        return "hedge"
+
+    abandoned = []
+    try:
+        assert hedger.run(first, hedge, executor, on_abandoned=abandoned.append) == ("first", "lost")
+    finally:
+        release_hedge.set()
+    # Only the first attempt is ever reported as abandoned
+    assert abandoned == []
+
+
+def test_hedge_budget_limits_extra_requests(executor):
+    hedger = Hedger(initial_delay=0.01, max_ratio=0.0, burst=1)
+
+    def slow():
+        time.sleep(0.03)
+        return "first"
+
+    assert hedger.run(slow, lambda: "hedge", executor)[1] == "won"
+    assert hedger.run(slow, lambda: "hedge", executor) == ("first", "skipped")
+    assert hedger.hedges_skipped == 1
+
+
+def test_delay_follows_the_latency_percentile():
+    hedger = Hedger(percentile=0.9, min_samples=10, initial_delay=2.0, min_delay=0.0)
+    assert hedger.delay() == 2.0
+    for milliseconds in range(1, 11):
+        hedger.record(milliseconds / 1000)
+    assert hedger.delay() == pytest.approx(0.01)
+
+
+def test_async_losing_attempt_is_cancelled():
+    async def scenario():
+        hedger = Hedger(initial_delay=0.02)
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def hedge():
+            return "hedge"
+
+        assert await hedger.run_async(slow, hedge) == ("hedge", "won")
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(scenario())
+
+
+class _Response:
+    status_code = 200
+    text = ""
+
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return {"choices": [{"message": {"content": self.content}}]}
+
+
+class _SlowFirstClient:
+    """The first request hangs until released; later ones answer at once"""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def post(self, payload):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            self.release.wait(5)
+            return _Response("first")
+        return _Response("hedge")
+
+
+def test_abandoned_first_attempt_keeps_its_admission_slot(monkeypatch, executor):
+    admission = AdmissionController(max_concurrent=2, max_queue=0)
+    client = _SlowFirstClient()
+    monkeypatch.setattr(llm_integration, "get_hedger", lambda: Hedger(initial_delay=0.02))
+    monkeypatch.setattr(llm_integration, "_hedge_executor", executor)
+    monkeypatch.setattr(llm_integration, "get_admission_controller", lambda: admission)
+    monkeypatch.setattr(llm_integration, "get_llm_client", lambda: client)
+
+    # The caller's own slot, as _call_llm_api_admitted takes it
+    admission.acquire()
+    try:
+        assert llm_integration._request_completion({"messages": []}) == "hedge"
+    finally:
+        admission.release()
+
+    # The first request is still upstream, so it still counts
+    assert admission.active == 1
+    client.release.set()
+    deadline = time.monotonic() + 5
+    while admission.active and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert admission.active == 0
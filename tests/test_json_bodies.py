@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("asgiref")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BAD_BODIES = [b"[1, 2]", b'"x"', b"42", b"null", b"{not json"]
+
+
+@pytest.fixture(scope="module")
+def asgi_module():
+    # app.py loads knowledge_base.json relative to the working directory
+    previous = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        import asgi
+        yield asgi
+    finally:
+        os.chdir(previous)
+
+
+def call_asgi(asgi_module, body):
+    scope = {"type": "http", "method": "POST", "path": "/api/chat", "headers": [], "query_string": b""}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_module.application(scope, receive, send))
+    status = sent[0]["status"]
+    payload = json.loads(b"".join(message.get("body", b"") for message in sent[1:]))
+    return status, payload
+
+
+@pytest.mark.parametrize("body", BAD_BODIES + [b'{"message": ["hi"]}'])
+def test_asgi_chat_rejects_bodies_that_are_not_objects(asgi_module, body):
+    status, payload = call_asgi(asgi_module, body)
+    assert status == 400
+    assert "error" in payload
+
+
+@pytest.mark.parametrize("route", ["/api/chat", "/api/chat/stream", "/api/chat/batch", "/api/add-faq"])
+@pytest.mark.parametrize("body", BAD_BODIES)
+def test_flask_json_routes_reject_bodies_that_are_not_objects(asgi_module, route, body):
+    client = asgi_module.app.test_client()
+    response = client.post(route, data=body, content_type="application/json")
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_asgi_chat_logs_off_the_event_loop(asgi_module, monkeypatch):
+    logged = []
+
+    def log_conversation(user_input, bot_response, state=None):
+        logged.append((user_input, threading.current_thread()))
+        state.add_exchange("2025-01-01 00:00:00", user_input, bot_response)
+
+    monkeypatch.setattr(asgi_module.select_bot(None), "log_conversation", log_conversation)
+    status, payload = call_asgi(asgi_module, b'{"message": "hello"}')
+
+    assert status == 200
+    assert [user_input for user_input, _ in logged] == ["hello"]
+    assert logged[0][1] is not threading.main_thread()
@@ -0,0 +1,112 @@
+import json
+import os
+from collections import Counter
+
+import pytest
+
+from kb_snapshot import KnowledgeBaseSnapshot, build_snapshot, load_snapshot
+
+KNOWLEDGE_BASE = {
+    "greetings": ["Hello!"],
+    "faq": {
+        "business hours": ["We are open from 9am to 5pm."],
+        "payment methods": ["We accept credit cards and PayPal, and cards again."],
+    },
+    "fallback": ["Sorry?"],
+}
+
+
+def analyzer(text):
+    return text.lower().replace(",", "").replace(".", "").split()
+
+
+def write_knowledge_base(tmp_path, knowledge_base=KNOWLEDGE_BASE):
+    path = tmp_path / "knowledge_base.json"
+    path.write_text(json.dumps(knowledge_base))
+    return str(path)
+
+
+def test_snapshot_round_trips_responses_and_term_counts(tmp_path):
+    path = write_knowledge_base(tmp_path)
+    snapshot = KnowledgeBaseSnapshot(build_snapshot(path, analyzer, "basic"))
+    assert snapshot.responses() == KNOWLEDGE_BASE
+    assert snapshot.analyzer == "basic"
+    expected = {keyword: Counter(analyzer(keyword + " " + " ".join(responses)))
+                for keyword, responses in KNOWLEDGE_BASE["faq"].items()}
+    assert snapshot.term_counts() == expected
+
+
+def test_edited_knowledge_base_makes_the_snapshot_stale(tmp_path, capsys):
+    path = write_knowledge_base(tmp_path)
+    build_snapshot(path, analyzer, "basic")
+    assert load_snapshot(path) is not None
+
+    edited = dict(KNOWLEDGE_BASE, fallback=["Pardon?"])
+    write_knowledge_base(tmp_path, edited)
+    assert load_snapshot(path) is None
+    assert "out of date" in capsys.readouterr().out
+
+
+def test_touched_but_unchanged_file_is_still_current(tmp_path):
+    path = write_knowledge_base(tmp_path)
+    build_snapshot(path, analyzer, "basic")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert load_snapshot(path) is not None
+    assert load_snapshot(path, analyzer_label="nltk") is None
+
+
+def test_changed_faqs_are_left_out_of_the_term_counts(tmp_path):
+    path = write_knowledge_base(tmp_path)
+    snapshot = KnowledgeBaseSnapshot(build_snapshot(path, analyzer, "basic"))
+    faqs = dict(KNOWLEDGE_BASE["faq"], **{"payment methods": ["Cash only."]})
+    assert set(snapshot.term_counts(faqs)) == {"business hours"}
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path, capsys):
+    path = write_knowledge_base(tmp_path)
+    (tmp_path / "knowledge_base.kbsnap").write_bytes(b"not a snapshot")
+    assert load_snapshot(path) is None
+    assert "ignoring" in capsys.readouterr().out
+
+
+def _corrupt(path, transform):
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(transform(data))
+
+
+@pytest.mark.parametrize("keep", [8, 12, 40, -1, -5, -200])
+def test_truncated_snapshot_falls_back_to_json(tmp_path, capsys, keep):
+    path = write_knowledge_base(tmp_path)
+    snapshot = build_snapshot(path, analyzer, "basic")
+    _corrupt(snapshot, lambda data: data[:keep])
+    assert load_snapshot(path) is None
+    assert "ignoring" in capsys.readouterr().out
+
+
+def test_damaged_header_falls_back_to_json(tmp_path, capsys):
+    path = write_knowledge_base(tmp_path)
+    snapshot = build_snapshot(path, analyzer, "basic")
+    # An indptr section whose length isn't a whole number of uint32s
+    _corrupt(snapshot, lambda data: data.replace(b'"indptr": [', b'"indptr": [1', 1))
+    assert load_snapshot(path) is None
+    assert "ignoring" in capsys.readouterr().out
+
+
+def test_bot_falls_back_to_json_for_a_truncated_snapshot(tmp_path):
+    from advanced_chatbot import AdvancedSupportBot
+
+    path = write_knowledge_base(tmp_path)
+    snapshot = build_snapshot(path, analyzer, "basic")
+    _corrupt(snapshot, lambda data: data[:len(data) // 2])
+    bot = AdvancedSupportBot(use_llm=False, knowledge_base_path=path, log_writer=_DiscardLog())
+    assert bot._snapshot is None
+    assert set(bot.responses["faq"]) == set(KNOWLEDGE_BASE["faq"])
+    assert len(bot.faq_index.term_counts) == 2
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
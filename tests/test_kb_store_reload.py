@@ -0,0 +1,77 @@
+import os
+import threading
+
+import pytest
+
+from advanced_chatbot import AdvancedSupportBot
+from kb_store import KnowledgeBaseStore
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GIFT_WRAP = "Gift wrapping is available for $5 per order."
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
+
+
+def make_bot(db_path):
+    # Every bot gets its own store, like a separate worker process would
+    return AdvancedSupportBot(use_llm=False, log_writer=_DiscardLog(), kb_store=KnowledgeBaseStore(db_path),
+                              knowledge_base_path=os.path.join(REPO_DIR, "knowledge_base.json"))
+
+
+@pytest.fixture
+def bots(tmp_path):
+    db_path = str(tmp_path / "knowledge_base.db")
+    return make_bot(db_path), make_bot(db_path)
+
+
+def test_faq_added_by_one_bot_is_answered_by_the_other(bots):
+    writer, reader = bots
+    assert reader.get_response("do you offer gift wrapping") in reader.responses["fallback"]
+    assert reader._faq_index is not None
+
+    writer.add_faq("gift wrapping", GIFT_WRAP)
+    # has_changed() notices the other connection's commit and only that FAQ is pulled
+    assert reader.get_response("do you offer gift wrapping") == GIFT_WRAP
+    assert reader.kb_version == writer.kb_version
+    # Nothing changed since, so the next check is cheap and finds nothing to pull
+    assert not reader.refresh_knowledge_base()
+
+
+def test_replaced_store_forces_a_full_reload(bots):
+    writer, reader = bots
+    assert reader.get_response("what are your business hours") in reader.responses["faq"]["hours"]
+    faq_index = reader._faq_index
+
+    writer.kb_store.import_json({
+        "greeting": ["Hi!"],
+        "goodbye": ["Bye!"],
+        "name_acknowledge": ["Hi {name}!"],
+        "fallback": ["Sorry, I can't help with that."],
+        "faq": {"gift wrapping": [GIFT_WRAP]},
+    })
+    assert reader.refresh_knowledge_base()
+    assert reader._faq_index is None
+    assert set(reader.responses["faq"]) == {"gift wrapping"}
+    assert reader.get_response("do you offer gift wrapping") == GIFT_WRAP
+    assert reader.get_response("what are your business hours") == "Sorry, I can't help with that."
+    assert reader._faq_index is not faq_index
+
+
+def test_pulled_changes_wait_for_an_index_build(bots):
+    writer, reader = bots
+    writer.add_faq("gift wrapping", GIFT_WRAP)
+
+    # A lazy index build holds the index lock while it iterates the FAQs
+    pulled = threading.Event()
+    with reader._index_lock:
+        thread = threading.Thread(target=lambda: reader.refresh_knowledge_base() and pulled.set())
+        thread.start()
+        assert not pulled.wait(0.2)
+        assert "gift wrapping" not in reader.responses["faq"]
+    assert pulled.wait(5)
+    thread.join()
+    assert reader.responses["faq"]["gift wrapping"] == [GIFT_WRAP]
@@ -0,0 +1,54 @@
+from keyword_matcher import KeywordMatcher
+
+
+def make_matcher():
+    matcher = KeywordMatcher()
+    matcher.add("hi", "greeting", priority=0)
+    matcher.add("shipping", "faq:shipping", priority=2)
+    matcher.add("shipping cost", "faq:shipping cost", priority=1)
+    matcher.add("return policy", "faq:returns", priority=3)
+    return matcher
+
+
+def test_finds_every_overlapping_pattern():
+    found = {(pattern, start) for start, _, pattern, _, _ in make_matcher().find_all("Shipping cost and return policy")}
+    assert found == {("shipping", 0), ("shipping cost", 0), ("return policy", 18)}
+
+
+def test_matches_whole_words_only():
+    matcher = make_matcher()
+    assert matcher.classify("this is shipping") == ("faq:shipping", "shipping")
+    assert matcher.classify("chipping") == (None, None)
+    assert matcher.classify("hi!") == ("greeting", "hi")
+
+
+def test_lowest_priority_value_wins_then_earliest_match():
+    matcher = make_matcher()
+    assert matcher.classify("what is the shipping cost") == ("faq:shipping cost", "shipping cost")
+    matcher.add("refund", "faq:refund", priority=3)
+    assert matcher.classify("refund or return policy") == ("faq:refund", "refund")
+
+
+def test_patterns_added_after_a_search_are_found():
+    matcher = make_matcher()
+    assert matcher.classify("gift cards") == (None, None)
+    matcher.add("gift cards", "faq:gift", priority=5)
+    assert matcher.classify("do you sell gift cards?") == ("faq:gift", "gift cards")
+    assert "Gift Cards" in matcher
+    assert len(matcher) == 5
+
+
+def test_re_adding_keeps_the_best_priority():
+    matcher = KeywordMatcher()
+    matcher.add("help", "low", priority=5)
+    matcher.add("help", "high", priority=1)
+    matcher.add("help", "ignored", priority=9)
+    assert matcher.classify("help") == ("high", "help")
+
+
+def test_failure_links_find_suffix_patterns():
+    matcher = KeywordMatcher()
+    matcher.add("order status", "status", priority=1)
+    matcher.add("der", "never a word", priority=0)
+    matcher.add("status", "plain", priority=2)
+    assert matcher.classify("my order status") == ("status", "order status")
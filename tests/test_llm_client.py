@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+import llm_integration
+from llm_integration import LLMClient
+
+API_URL = "http://llm.test/v1/chat/completions"
+
+
+class _ScriptedAdapter(BaseAdapter):
+    """Transport that plays back a list of (status, headers) responses or exceptions"""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.timeouts.append(timeout)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        status, headers = outcome
+        response = requests.Response()
+        response.status_code = status
+        response.headers.update(headers)
+        response._content = b'{"choices": []}'
+        response.request = request
+        response.url = request.url
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(llm_integration.time, "sleep", sleeps.append)
+    return sleeps
+
+
+def make_client(outcomes, **options):
+    client = LLMClient("key", api_url=API_URL, connect_timeout=1.5, read_timeout=7.0, **options)
+    adapter = _ScriptedAdapter(outcomes)
+    client.session.mount("http://", adapter)
+    return client, adapter
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_transient_statuses_are_retried_with_backoff(sleeps, status):
+    client, adapter = make_client([(status, {}), (status, {}), (200, {})], backoff_base=0.5)
+    response = client.post({"messages": []})
+
+    assert response.status_code == 200
+    assert len(adapter.timeouts) == 3
+    # Full jitter: each delay is at most the exponential cap for its attempt
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5 and 0 <= sleeps[1] <= 1.0
+
+
+def test_retries_stop_at_max_retries(sleeps):
+    client, adapter = make_client([(503, {})] * 5, max_retries=2)
+    assert client.post({}).status_code == 503
+    assert len(adapter.timeouts) == 3
+    assert len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(sleeps):
+    client, adapter = make_client([(400, {}), (200, {})])
+    assert client.post({}).status_code == 400
+    assert len(adapter.timeouts) == 1
+    assert sleeps == []
+
+
+def test_retry_after_is_honoured_up_to_the_cap(sleeps):
+    client, _ = make_client([(429, {"Retry-After": "2"}), (429, {"Retry-After": "600"}), (200, {})],
+                            backoff_max=8.0)
+    assert client.post({}).status_code == 200
+    assert sleeps == [2.0, 8.0]
+
+
+def test_connection_failures_are_retried_but_read_timeouts_are_not(sleeps):
+    client, adapter = make_client([requests.exceptions.ConnectionError("refused"), (200, {})])
+    assert client.post({}).status_code == 200
+    assert len(sleeps) == 1
+
+    client, adapter = make_client([requests.exceptions.ReadTimeout("slow"), (200, {})])
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.post({})
+    assert len(adapter.timeouts) == 1
+    # Only the earlier connection failure was backed off
+    assert len(sleeps) == 1
+
+
+def test_every_attempt_uses_the_connect_and_read_timeouts(sleeps):
+    client, adapter = make_client([(502, {}), (200, {})])
+    client.post({})
+    assert adapter.timeouts == [(1.5, 7.0), (1.5, 7.0)]
+
+
+def test_async_client_retries_and_keeps_its_timeouts(monkeypatch):
+    httpx = pytest.importorskip("httpx")
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+
+    monkeypatch.setattr(llm_integration.asyncio, "sleep", fake_sleep)
+    statuses = [429, 500, 200]
+    seen = []
+
+    def handler(request):
+        seen.append(request.extensions.get("timeout"))
+        return httpx.Response(statuses.pop(0), json={"choices": []})
+
+    async def run():
+        client = llm_integration.AsyncLLMClient("key", api_url=API_URL, connect_timeout=1.5, read_timeout=7.0)
+        client.client._transport = httpx.MockTransport(handler)
+        try:
+            return await client.post({})
+        finally:
+            await client.aclose()
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+    assert len(sleeps) == 2
+    assert all(timeout["connect"] == 1.5 and timeout["read"] == 7.0 for timeout in seen)
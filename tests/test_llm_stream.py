@@ -0,0 +1,123 @@
+import pytest
+
+import llm_integration
+from admission import AdmissionController
+from circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.calls = 0
+
+    def __call__(self, user_query, conversation_history=None, user_name=None, summary=None):
+        self.calls += 1
+        yield from self.chunks
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(window=2, min_calls=2, failure_threshold=0.5, open_seconds=30.0, clock=clock)
+
+
+@pytest.fixture
+def admission():
+    return AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.0)
+
+
+@pytest.fixture
+def upstream(monkeypatch, breaker, admission):
+    stream = _FakeStream([" Hello", " there", "!"])
+    monkeypatch.setattr(llm_integration, "get_response_cache", lambda: None)
+    monkeypatch.setattr(llm_integration, "get_circuit_breaker", lambda: breaker)
+    monkeypatch.setattr(llm_integration, "get_admission_controller", lambda: admission)
+    monkeypatch.setattr(llm_integration, "_stream_llm_api", stream)
+    return stream
+
+
+def open_breaker(breaker, clock):
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.is_open()
+
+
+def test_streamed_answer_releases_its_slot(upstream, admission):
+    assert list(llm_integration.stream_llm_response("hi")) == ["Hello", " there", "!"]
+    assert admission.snapshot()["active"] == 0
+
+
+def test_open_breaker_fails_fast_without_waiting_for_a_slot(upstream, breaker, clock, admission):
+    open_breaker(breaker, clock)
+    # Every slot is busy; an open breaker must not queue for one (or be turned away as overloaded)
+    admission.acquire()
+    overflow_calls = []
+    chunks = list(llm_integration.stream_llm_response("hi", overflow=lambda: overflow_calls.append(1)))
+
+    assert len(chunks) == 1 and chunks[0] != "Hello"
+    assert upstream.calls == 0
+    assert overflow_calls == []
+    assert admission.snapshot()["active"] == 1
+    admission.release()
+
+
+def test_overloaded_probe_is_handed_back_to_the_breaker(upstream, breaker, clock, admission):
+    open_breaker(breaker, clock)
+    clock.now = 30.0
+    admission.acquire()
+    chunks = list(llm_integration.stream_llm_response("hi", overflow=lambda: "closest FAQ"))
+    admission.release()
+
+    assert chunks == ["closest FAQ"]
+    assert upstream.calls == 0
+    # The probe never went upstream, so the next call may still probe
+    assert breaker.state == HALF_OPEN
+    assert not breaker.is_open()
+    assert list(llm_integration.stream_llm_response("hi")) == ["Hello", " there", "!"]
+    assert breaker.state == CLOSED
+
+
+def test_client_going_away_is_not_an_upstream_failure(upstream, breaker, admission):
+    for _ in range(3):
+        stream = llm_integration.stream_llm_response("hi")
+        assert next(stream) == "Hello"
+        stream.close()
+
+    assert breaker.snapshot()["failure_rate"] == 0.0
+    assert breaker.state == CLOSED
+    assert admission.snapshot()["active"] == 0
+
+
+def test_disconnect_is_neutral_for_a_probe(upstream, breaker, clock):
+    open_breaker(breaker, clock)
+    clock.now = 30.0
+    upstream.chunks = ["  ", "Hello"]
+    stream = llm_integration.stream_llm_response("hi")
+    assert next(stream) == "Hello"
+    stream.close()
+    assert breaker.state == CLOSED
+
+
+def test_failed_stream_counts_against_the_breaker(upstream, breaker, monkeypatch):
+    def broken(*args):
+        raise ConnectionError("reset")
+        yield
+
+    monkeypatch.setattr(llm_integration, "_stream_llm_api", broken)
+    for _ in range(2):
+        chunks = list(llm_integration.stream_llm_response("hi"))
+        assert len(chunks) == 1 and chunks[0] != "Hello"
+    assert breaker.is_open()
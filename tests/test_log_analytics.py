@@ -0,0 +1,62 @@
+import json
+import os
+
+import log_analytics
+from log_analytics import analyze_log_file, classify, rule_response_pattern
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(REPO_DIR, "knowledge_base.json"), 'r') as f:
+    KNOWLEDGE_BASE = json.load(f)
+
+FALLBACKS = set(KNOWLEDGE_BASE["fallback"])
+RULE_RESPONSES = [text for category in log_analytics.RULE_CATEGORIES for text in KNOWLEDGE_BASE[category]]
+
+
+def entry(user_input, bot_response, topic):
+    return {"user_input": user_input, "bot_response": bot_response, "context": {"topic": topic}}
+
+
+def test_name_acknowledgment_after_an_llm_turn_is_not_counted():
+    pattern = rule_response_pattern(RULE_RESPONSES)
+    acknowledgment = KNOWLEDGE_BASE["name_acknowledge"][0].format(user_name="Ada")
+    # The name reply leaves the previous turn's topic in place
+    assert classify(entry("call me Ada", acknowledgment, "llm_response"), FALLBACKS, pattern) is None
+    assert classify(entry("what is the meaning of life", "42, probably.", "llm_response"), FALLBACKS, pattern) == "llm"
+
+
+def test_fallback_and_faq_answers_are_classified_as_before():
+    pattern = rule_response_pattern(RULE_RESPONSES)
+    fallback = KNOWLEDGE_BASE["fallback"][0]
+    assert classify(entry("asdf", fallback, "hours"), FALLBACKS, pattern) == "fallback"
+    assert classify(entry("asdf", fallback, "llm_response"), FALLBACKS, pattern) == "fallback"
+    faq_answer = KNOWLEDGE_BASE["faq"]["hours"][0]
+    assert classify(entry("when are you open", faq_answer, "hours"), FALLBACKS, pattern) is None
+
+
+def test_templates_only_match_whole_responses():
+    pattern = rule_response_pattern(["Nice to meet you, {user_name}!"])
+    assert pattern.fullmatch("Nice to meet you, Grace Hopper!")
+    assert not pattern.fullmatch("Nice to meet you, Ada")
+    assert not pattern.fullmatch("We ship worldwide. Nice to meet you, Ada!")
+    assert rule_response_pattern([]) is None
+
+
+def test_log_file_skips_rule_replies(tmp_path):
+    path = tmp_path / "conversation_20250101.jsonl"
+    acknowledgment = KNOWLEDGE_BASE["name_acknowledge"][1].format(user_name="Ada")
+    entries = [
+        entry("what is the capital of france", "Paris.", "llm_response"),
+        entry("call me Ada", acknowledgment, "llm_response"),
+        entry("do you sell gift cards", KNOWLEDGE_BASE["fallback"][0], None),
+    ]
+    path.write_text("".join(json.dumps(item) + "\n" for item in entries))
+
+    result = analyze_log_file(str(path), FALLBACKS, RULE_RESPONSES)
+    assert result["entries"] == 3
+    outcomes = sorted(list(query["volume"].items()) for query in result["queries"].values())
+    assert outcomes == [[("fallback", 1)], [("llm", 1)]]
+
+    # Without the rule templates the name reply would pass for an LLM answer
+    result = analyze_log_file(str(path), FALLBACKS)
+    assert sum(query["volume"]["llm"] for query in result["queries"].values()) == 2
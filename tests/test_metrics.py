@@ -0,0 +1,88 @@
+import os
+import re
+
+import pytest
+
+import metrics
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One sample line of the Prometheus text format: name{labels} value
+SAMPLE = re.compile(r'^[a-z_]+\{[a-z_]+="(?:[^"\\\n]|\\.)*"(,le="[^"]+")?\} [0-9.e+]+$')
+
+
+@pytest.fixture
+def collecting():
+    previous = metrics.enabled
+    metrics.reset()
+    metrics.set_enabled(True)
+    yield
+    metrics.set_enabled(previous)
+    metrics.reset()
+
+
+@pytest.fixture
+def client():
+    pytest.importorskip("flask")
+    # app.py loads knowledge_base.json relative to the working directory
+    previous = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        import app
+        yield app.app.test_client()
+    finally:
+        os.chdir(previous)
+
+
+def test_metrics_are_rendered_in_the_prometheus_text_format(client, collecting):
+    metrics.observe_stage("faq_match", 0.003)
+    metrics.observe_stage("faq_match", 0.2)
+    metrics.count_response("faq")
+    metrics.count_llm_error('bad "quote"\n')
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert text.endswith("\n")
+
+    lines = text.splitlines()
+    for line in lines:
+        assert line.startswith("# HELP ") or line.startswith("# TYPE ") or SAMPLE.match(line), line
+    assert "# TYPE supportbot_stage_seconds histogram" in lines
+    assert "# TYPE supportbot_responses_total counter" in lines
+    assert 'supportbot_responses_total{route="faq"} 1' in lines
+    assert 'supportbot_llm_errors_total{code="bad \\"quote\\"\\n"} 1' in lines
+
+    # Buckets are cumulative and end with +Inf, matching the count
+    assert 'supportbot_stage_seconds_bucket{stage="faq_match",le="0.0025"} 0' in lines
+    assert 'supportbot_stage_seconds_bucket{stage="faq_match",le="0.005"} 1' in lines
+    assert 'supportbot_stage_seconds_bucket{stage="faq_match",le="0.25"} 2' in lines
+    assert 'supportbot_stage_seconds_bucket{stage="faq_match",le="+Inf"} 2' in lines
+    assert 'supportbot_stage_seconds_sum{stage="faq_match"} 0.203000' in lines
+    assert 'supportbot_stage_seconds_count{stage="faq_match"} 2' in lines
+
+
+def test_metrics_endpoint_is_404_when_disabled(client):
+    previous = metrics.enabled
+    metrics.set_enabled(False)
+    try:
+        response = client.get("/metrics")
+    finally:
+        metrics.set_enabled(previous)
+    assert response.status_code == 404
+    assert "METRICS_ENABLED=1" in response.get_json()["error"]
+
+
+def test_nothing_is_recorded_while_disabled():
+    previous = metrics.enabled
+    metrics.set_enabled(False)
+    try:
+        metrics.reset()
+        metrics.count_response("faq")
+        with metrics.timed("faq_match"):
+            pass
+        assert metrics.responses_total.value("faq") == 0
+        assert metrics.stage_seconds.count("faq_match") == 0
+    finally:
+        metrics.set_enabled(previous)
@@ -0,0 +1,88 @@
+import pytest
+
+import advanced_chatbot
+from advanced_chatbot import AdvancedSupportBot
+from prompt_builder import SYSTEM_PROMPT, PromptBuilder, message_tokens
+from session_store import ConversationState
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
+
+
+def prompt_tokens(messages):
+    return sum(message_tokens(message["content"]) for message in messages)
+
+
+def exchange(number, words=10):
+    return {
+        "user_input": f"question{number} " + "about the order " * words,
+        "bot_response": f"answer{number}. " + "Here is what we know. " * words,
+    }
+
+
+@pytest.mark.parametrize("max_prompt_tokens", [150, 300, 1024])
+def test_long_histories_stay_within_the_budget(max_prompt_tokens):
+    builder = PromptBuilder(max_prompt_tokens=max_prompt_tokens)
+    history = [exchange(number, words=40) for number in range(50)]
+    messages = builder.build("where is my parcel?", history, user_name="Ada", summary="Customer: hi | You: hello\n" * 40)
+
+    assert prompt_tokens(messages) <= max_prompt_tokens
+    assert messages[-1] == {"role": "user", "content": "where is my parcel?"}
+
+
+@pytest.mark.parametrize("max_prompt_tokens", [150, 300, 1024])
+def test_an_oversized_message_is_cut_to_the_budget(max_prompt_tokens):
+    builder = PromptBuilder(max_prompt_tokens=max_prompt_tokens)
+    messages = builder.build("please help " * 5000, [exchange(1)])
+
+    assert prompt_tokens(messages) <= max_prompt_tokens
+    assert messages[-1]["content"].startswith("please help")
+    assert messages[-1]["content"].endswith("...")
+
+
+def test_system_prompt_is_always_first_and_unchanged():
+    builder = PromptBuilder(max_prompt_tokens=300)
+    for history, user_name, summary in [(None, None, None), ([exchange(1)], "Ada", "Customer: hi | You: hello"),
+                                        ([exchange(number, words=200) for number in range(10)], None, None)]:
+        messages = builder.build("x " * 2000, history, user_name, summary)
+        assert messages[0] is builder.system_message
+        assert messages[0] == {"role": "system", "content": SYSTEM_PROMPT}
+
+
+def test_recent_turns_fit_newest_first():
+    builder = PromptBuilder(max_prompt_tokens=1024, recent_turns=3)
+    history = [exchange(number) for number in range(6)]
+    questions = [message["content"].split()[0] for message in builder.build("next?", history)[1:]
+                 if message["role"] == "user"]
+
+    # Oldest first, right before the new question
+    assert questions == ["question3", "question4", "question5", "next?"]
+
+
+def test_older_turns_go_into_the_summary_and_are_not_sent_again(monkeypatch):
+    builder = PromptBuilder(max_prompt_tokens=1024, recent_turns=2)
+    monkeypatch.setattr(advanced_chatbot, "get_prompt_builder", lambda: builder)
+    bot = AdvancedSupportBot(use_llm=False, log_writer=_DiscardLog())
+    state = ConversationState(max_history=20)
+
+    for number in range(5):
+        state.add_exchange("2025-01-01 00:00:00", f"question{number} about my order",
+                           f"answer{number}. More details follow.")
+        summary = bot._conversation_summary(state)
+        messages = builder.build("next?", state.recent_exchanges(), summary=summary)
+        sent = [message["content"] for message in messages if message["role"] in ("user", "assistant")]
+
+        kept = range(max(0, number - 1), number + 1)
+        assert [content.split()[0] for content in sent[:-1]] == \
+            [word for kept_number in kept for word in (f"question{kept_number}", f"answer{kept_number}.")]
+        summarized = range(0, max(0, number - 1))
+        for old in summarized:
+            assert f"question{old} about my order" in summary
+            assert not any(content.startswith(f"question{old} ") for content in sent)
+        if not summarized:
+            assert summary is None
+    # Each exchange is folded in once, however often the summary is asked for
+    assert state.summarized == 3
+    assert bot._conversation_summary(state).count("question0 ") == 1
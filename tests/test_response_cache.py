@@ -0,0 +1,96 @@
+import json
+import threading
+import time
+
+from response_cache import ResponseCache, normalize_query
+
+
+def test_key_ignores_case_punctuation_and_spacing():
+    assert normalize_query("  What ARE your hours?? ") == "what are your hours"
+    assert ResponseCache.make_key("Hours?") == ResponseCache.make_key("hours")
+
+
+def test_key_depends_on_the_history_window():
+    history = [{"user_input": "hi", "bot_response": "Hello!"}]
+    other = [{"user_input": "hey", "bot_response": "Hello!"}]
+    assert ResponseCache.make_key("hours", history) != ResponseCache.make_key("hours", other)
+    # Only the last `window` exchanges matter
+    older = [{"user_input": "old", "bot_response": "old"}] + history
+    assert ResponseCache.make_key("hours", older, window=1) == ResponseCache.make_key("hours", history, window=1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"
+    cache.set("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A" and cache.get("c") == "C"
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    cache = ResponseCache(ttl=60)
+    cache.set("a", "A")
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_saved_entries_are_loaded_back(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = ResponseCache(path=path)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    cache.save()
+
+    restored = ResponseCache(max_entries=1, path=path)
+    # Oldest first on disk, so the limit keeps the newest
+    assert restored.get("b") == "B"
+    assert restored.get("a") is None
+
+
+def test_corrupt_cache_file_is_ignored(tmp_path, capsys):
+    path = tmp_path / "cache.json"
+    path.write_text("{not json")
+    assert len(ResponseCache(path=str(path))) == 0
+    assert "Could not load" in capsys.readouterr().out
+
+
+def test_malformed_entries_are_skipped(tmp_path, capsys):
+    path = tmp_path / "cache.json"
+    now = time.time()
+    path.write_text(json.dumps([
+        ["a", "A", now],
+        ["too", "short"],
+        "not an entry",
+        ["b", "B", "yesterday"],
+        [["c"], "C", now],
+        ["d", None, now],
+        ["e", "E", now],
+    ]))
+    cache = ResponseCache(path=str(path))
+    assert len(cache) == 2
+    assert cache.get("a") == "A"
+    assert cache.get("e") == "E"
+    assert "Skipped 5 malformed" in capsys.readouterr().out
+
+
+def test_file_without_a_list_is_ignored(tmp_path, capsys):
+    path = tmp_path / "cache.json"
+    path.write_text(json.dumps({"a": "A"}))
+    assert len(ResponseCache(path=str(path))) == 0
+    assert "Could not load" in capsys.readouterr().out
+
+
+def test_bypassed_requests_are_counted_from_many_threads():
+    cache = ResponseCache()
+    threads = [threading.Thread(target=lambda: [cache.bypass() for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["bypassed"] == 8000
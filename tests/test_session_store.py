@@ -0,0 +1,69 @@
+import time
+
+from session_store import SessionStore
+
+
+def test_unknown_session_id_is_replaced_with_a_new_one():
+    store = SessionStore()
+    planted = "attacker-chosen-session-id"
+    state = store.get(planted)
+    assert state.session_id != planted
+    assert store.get(planted) is not state
+
+
+def test_known_session_is_returned():
+    store = SessionStore()
+    state = store.get()
+    state.user_name = "Sam"
+    assert store.get(state.session_id) is state
+
+
+def test_malformed_and_oversized_ids_are_ignored():
+    store = SessionStore()
+    for session_id in ("x" * 100000, "short", "has spaces in it!!!!"):
+        state = store.get(session_id)
+        assert state.session_id != session_id
+        assert len(state.session_id) < 64
+
+
+def test_expired_session_starts_over_with_a_new_id(monkeypatch):
+    store = SessionStore(ttl=10)
+    state = store.get()
+    state.user_name = "Sam"
+    later = time.monotonic() + 11
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    fresh = store.get(state.session_id)
+    assert fresh.session_id != state.session_id
+    assert fresh.user_name is None
+    assert store.expirations == 1
+
+
+def test_session_of_another_tenant_is_not_shared():
+    store = SessionStore()
+    state = store.get(tenant="acme")
+    other = store.get(state.session_id, tenant="globex")
+    assert other is not state
+    assert other.session_id != state.session_id
+    assert store.get(state.session_id, tenant="acme") is state
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(max_sessions=2)
+    first = store.get()
+    second = store.get()
+    store.get(first.session_id)
+    store.get()
+    assert len(store) == 2
+    assert store.evictions == 1
+    assert store.get(first.session_id) is first
+    assert store.get(second.session_id) is not second
+
+
+def test_memory_budget_evicts_sessions():
+    store = SessionStore(max_memory_bytes=5000)
+    states = [store.get() for _ in range(3)]
+    for state in states:
+        state.add_exchange("now", "q" * 1000, "a" * 1000)
+        store.save(state)
+    assert store.memory_bytes <= 5000
+    assert store.evictions >= 1
@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import pytest
+
+import advanced_chatbot
+from advanced_chatbot import AdvancedSupportBot
+from session_store import ConversationState
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scores between SPECULATIVE_FAQ_THRESHOLD and the match threshold against "hours", with nothing to correct
+BORDERLINE_QUESTION = "when are you around on the weekend"
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
+
+
+def overloaded(user_input, history=None, user_name=None, summary=None, priority=None, overflow=None):
+    # What get_llm_response does when admission control turns the request away
+    return overflow()
+
+
+def answered(user_input, history=None, user_name=None, summary=None, priority=None, overflow=None):
+    return "LLM answer"
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    monkeypatch.setattr(advanced_chatbot, "LLM_AVAILABLE", True)
+    monkeypatch.setattr(advanced_chatbot, "llm_circuit_open", lambda: False)
+    bot = AdvancedSupportBot(use_llm=True, log_writer=_DiscardLog(),
+                             knowledge_base_path=os.path.join(REPO_DIR, "knowledge_base.json"))
+    keyword, similarity = bot._find_best_faq_match(bot.analyze(BORDERLINE_QUESTION), bot.speculative_faq_threshold)
+    assert keyword == "hours" and bot.speculative_faq_threshold < similarity <= bot.faq_threshold
+    yield bot
+    bot.close()
+
+
+@pytest.mark.parametrize("llm,topic", [(overloaded, "hours"), (answered, "llm_response")])
+def test_topic_follows_the_answer_served(bot, monkeypatch, llm, topic):
+    monkeypatch.setattr(advanced_chatbot, "get_llm_response", llm)
+    state = ConversationState()
+    response = bot.get_response(BORDERLINE_QUESTION, state)
+
+    if llm is overloaded:
+        assert response in bot.responses["faq"]["hours"]
+    else:
+        assert response == "LLM answer"
+    assert state.context["topic"] == topic
+
+
+@pytest.mark.parametrize("llm,topic", [(overloaded, "hours"), (answered, "llm_response")])
+def test_async_topic_follows_the_answer_served(bot, monkeypatch, llm, topic):
+    async def llm_async(*args, **kwargs):
+        return llm(*args, **kwargs)
+
+    monkeypatch.setattr(advanced_chatbot, "get_llm_response_async", llm_async)
+    state = ConversationState()
+    response = asyncio.run(bot.get_response_async(BORDERLINE_QUESTION, state))
+
+    assert (response in bot.responses["faq"]["hours"]) == (llm is overloaded)
+    assert state.context["topic"] == topic
@@ -0,0 +1,123 @@
+import json
+import os
+
+import pytest
+
+from tenants import TenantRegistry, estimate_knowledge_base_size
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _FakeBot:
+    def __init__(self, tenant_id, path):
+        self.tenant_id = tenant_id
+        with open(path, 'r') as f:
+            self.responses = json.load(f)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def write_tenant(directory, tenant_id, faq_text="We are open from 9am to 5pm."):
+    with open(os.path.join(directory, f"{tenant_id}.json"), 'w') as f:
+        json.dump({"fallback": ["Sorry."], "faq": {"hours": [faq_text]}}, f)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    for tenant_id in ("alpha", "beta", "gamma"):
+        write_tenant(tmp_path, tenant_id)
+    return str(tmp_path)
+
+
+def test_least_recently_used_tenant_is_evicted_by_count(directory):
+    registry = TenantRegistry(_FakeBot, directory=directory, max_tenants=2)
+    alpha = registry.get("alpha")
+    registry.get("beta")
+    assert registry.get("alpha") is alpha
+
+    registry.get("gamma")
+    assert "beta" not in registry
+    assert "alpha" in registry and "gamma" in registry
+    assert registry.stats() == {"tenants": 2, "memory_bytes": registry.memory_bytes,
+                                "hits": 1, "loads": 3, "evictions": 1}
+
+    # An evicted tenant is loaded again on its next request
+    beta = registry.get("beta")
+    assert beta.tenant_id == "beta"
+    assert "alpha" not in registry and alpha.closed
+
+
+def test_tenants_are_evicted_to_stay_within_the_memory_budget(directory):
+    write_tenant(directory, "large", "x" * 100000)
+    small = estimate_knowledge_base_size(_FakeBot("alpha", os.path.join(directory, "alpha.json")).responses)
+    registry = TenantRegistry(_FakeBot, directory=directory, max_tenants=100, max_memory_bytes=small * 2)
+
+    registry.get("alpha")
+    registry.get("beta")
+    assert registry.memory_bytes == small * 2
+
+    # A tenant over the budget on its own is still served, with everything else evicted
+    large = registry.get("large")
+    assert "large" in registry and len(registry) == 1
+    assert registry.memory_bytes > registry.max_memory_bytes
+    assert registry.evictions == 2
+
+    registry.get("alpha")
+    assert "large" not in registry and large.closed
+    assert registry.memory_bytes == small
+
+
+@pytest.mark.parametrize("tenant_id", ["missing", "../alpha", "alpha/../alpha", "..", ".hidden", "", None,
+                                       "a" * 65, "alpha.json"])
+def test_unknown_and_unsafe_tenant_ids_are_not_loaded(directory, tenant_id):
+    registry = TenantRegistry(_FakeBot, directory=os.path.join(directory, "nested"))
+    os.makedirs(registry.directory)
+    write_tenant(registry.directory, "real")
+    assert registry.get(tenant_id) is None
+    assert registry.loads == 0
+
+
+def test_factory_failure_is_retried_and_leaves_nothing_behind(directory):
+    calls = []
+
+    def factory(tenant_id, path):
+        calls.append(tenant_id)
+        if len(calls) == 1:
+            raise RuntimeError("knowledge base is broken")
+        return _FakeBot(tenant_id, path)
+
+    registry = TenantRegistry(factory, directory=directory)
+    with pytest.raises(RuntimeError):
+        registry.get("alpha")
+    assert registry._loading == {}
+    assert "alpha" not in registry and registry.memory_bytes == 0
+
+    assert registry.get("alpha").tenant_id == "alpha"
+    assert calls == ["alpha", "alpha"]
+    assert registry._loading == {}
+
+
+@pytest.fixture
+def app_module():
+    pytest.importorskip("flask")
+    # app.py loads knowledge_base.json relative to the working directory
+    previous = os.getcwd()
+    os.chdir(REPO_DIR)
+    try:
+        import app
+        yield app
+    finally:
+        os.chdir(previous)
+
+
+@pytest.mark.parametrize("tenant_id", ["no-such-store", "../knowledge_base", "..%2Fknowledge_base"])
+def test_unknown_tenants_get_a_404(app_module, tenant_id):
+    client = app_module.app.test_client()
+    response = client.post("/api/chat", json={"message": "hello"}, headers={"X-Tenant": tenant_id})
+    assert response.status_code == 404
+    assert response.get_json() == {"error": f"Unknown tenant '{tenant_id}'"}
+
+    response = client.post(f"/api/chat/batch?tenant={tenant_id}", json={"messages": ["hello"]})
+    assert response.status_code == 404
@@ -0,0 +1,109 @@
+import os
+import re
+
+from advanced_chatbot import AdvancedSupportBot
+from text_analysis import AnalyzedQuery, TextAnalyzer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class _FakeNLP:
+    stop_words = frozenset(["the", "are", "what", "your"])
+
+    def __init__(self):
+        self.lemmatized = []
+
+    def tokenize(self, text):
+        return re.findall(r"\w+|[^\w\s]", text)
+
+    def lemmatize(self, token):
+        self.lemmatized.append(token)
+        return token[:-1] if token.endswith("s") else token
+
+
+class _DiscardLog:
+    def write(self, entry):
+        return True
+
+
+def test_repeated_queries_hit_the_query_cache():
+    analyzer = TextAnalyzer(lambda: None, query_cache_size=2)
+    assert analyzer.query_tokens("what are your hours?") == ("what", "are", "your", "hours")
+    analyzer.query_tokens("what are your hours?")
+    analyzer.query_tokens("shipping")
+
+    stats = analyzer.stats()["query_cache"]
+    assert stats == {"hits": 1, "misses": 2, "size": 2, "max_size": 2, "hit_rate": 0.333}
+    # Without NLTK there is no lemma cache
+    assert "lemma_cache" not in analyzer.stats()
+
+
+def test_least_recently_used_query_is_evicted():
+    analyzer = TextAnalyzer(lambda: None, query_cache_size=2)
+    analyzer.query_tokens("a")
+    analyzer.query_tokens("b")
+    analyzer.query_tokens("a")
+    analyzer.query_tokens("c")  # evicts "b", the least recently used
+
+    analyzer.query_tokens("a")
+    analyzer.query_tokens("b")
+    stats = analyzer.stats()["query_cache"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 4
+    assert stats["size"] == 2
+
+
+def test_lemmas_are_cached_across_queries_and_documents():
+    nlp = _FakeNLP()
+    analyzer = TextAnalyzer(lambda: nlp, lemma_cache_size=3)
+    assert analyzer.query_tokens("what are your hours") == ("hour",)
+    assert analyzer.document_tokens("Hours and hours, shipping days") == ["hour", "and", "hour", "shipping", "day"]
+
+    # "hours" was lemmatized once, then served from the cache
+    assert nlp.lemmatized == ["hours", "and", "shipping", "days"]
+    stats = analyzer.stats()["lemma_cache"]
+    assert stats["hits"] == 2
+    assert stats["misses"] == 4
+    assert stats["size"] == 3
+
+    # "and" is the least recently used lemma, so it was the one evicted
+    analyzer.query_tokens("hours?")
+    assert nlp.lemmatized == ["hours", "and", "shipping", "days"]
+    analyzer.query_tokens("and?")
+    assert nlp.lemmatized[-1] == "and"
+
+    # Documents don't go through (or fill) the query cache
+    assert analyzer.stats()["query_cache"]["misses"] == 3
+
+
+def test_clear_empties_both_caches():
+    analyzer = TextAnalyzer(lambda: _FakeNLP())
+    analyzer.query_tokens("hours")
+    analyzer.clear()
+    stats = analyzer.stats()
+    assert stats["query_cache"]["size"] == 0
+    assert stats["lemma_cache"]["size"] == 0
+
+
+def test_a_query_is_analyzed_once_per_request():
+    analyzer = TextAnalyzer(lambda: None)
+    query = analyzer.analyze("What are your HOURS?")
+    assert isinstance(query, AnalyzedQuery)
+    assert analyzer.analyze(query) is query
+    assert query.lower == "what are your hours?"
+    assert query.tokens is query.tokens
+    assert analyzer.stats()["query_cache"]["misses"] == 1
+
+
+def test_bot_reports_the_analysis_cache_counters():
+    bot = AdvancedSupportBot(use_llm=False, log_writer=_DiscardLog(),
+                             knowledge_base_path=os.path.join(REPO_DIR, "knowledge_base.json"),
+                             text_analyzer=TextAnalyzer(lambda: None, query_cache_size=10))
+    bot.get_response("what are your business hours")
+    bot.get_response("what are your business hours")
+
+    stats = bot.analysis_stats()["query_cache"]
+    assert stats["max_size"] == 10
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 1
+    assert stats["hit_rate"] == round(stats["hits"] / (stats["hits"] + stats["misses"]), 3)
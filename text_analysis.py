@@ -0,0 +1,104 @@
+"""
+Memoized text preprocessing for AdvancedSupportBot
+
+A user message is wrapped once per request in an AnalyzedQuery, which holds
+the lowercased text and computes the matching tokens on first use, so every
+stage (name extraction, greetings, FAQ matching, typo correction) shares the
+same work. Tokens of recent queries and individual lemma lookups are kept in
+bounded LRU caches, whose hit/miss counts are available from stats().
+"""
+import functools
+import string
+import threading
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+
+
+class AnalyzedQuery:
+    """One user message with its lowercased form and (lazily) its matching tokens"""
+
+    __slots__ = ("text", "lower", "_tokens", "_analyzer")
+
+    def __init__(self, text, analyzer):
+        self.text = text
+        self.lower = text.lower()
+        self._tokens = None
+        self._analyzer = analyzer
+
+    def __str__(self):
+        return self.text
+
+    @property
+    def tokens(self):
+        """Lemmatized, stopword-free tokens, as a tuple"""
+        if self._tokens is None:
+            self._tokens = self._analyzer.query_tokens(self.lower)
+        return self._tokens
+
+
+class TextAnalyzer:
+    """Tokenizes and lemmatizes text with LRU caches in front of NLTK
+
+    get_nlp returns the loaded NLP resources, or None for basic matching;
+    it is only called when text is first analyzed, so NLTK stays lazy.
+    """
+
+    def __init__(self, get_nlp, lemma_cache_size=10000, query_cache_size=1000):
+        self.get_nlp = get_nlp
+        self.lemma_cache_size = lemma_cache_size
+        self.query_cache_size = query_cache_size
+        self._lemmatize = None
+        self._lock = threading.Lock()
+        # lru_cache is thread-safe and keeps its own hit/miss counts
+        self.query_tokens = functools.lru_cache(maxsize=query_cache_size)(self._tokens)
+
+    def analyze(self, text):
+        """Wrap a message in an AnalyzedQuery (already analyzed queries are returned as they are)"""
+        if isinstance(text, AnalyzedQuery):
+            return text
+        return AnalyzedQuery(text, self)
+
+    def document_tokens(self, text):
+        """Tokens for a knowledge base text; shares the lemma cache but not the query cache"""
+        return list(self._tokens(text.lower()))
+
+    def _tokens(self, lower):
+        nlp = self.get_nlp()
+        if nlp is None:
+            # Basic preprocessing if NLTK is not available
+            return tuple(lower.translate(_PUNCTUATION).split())
+
+        # Tokenize, remove stopwords and lemmatize
+        lemmatize = self._lemmatize or self._cached_lemmatizer(nlp)
+        return tuple(lemmatize(token) for token in nlp.tokenize(lower)
+                     if token.isalnum() and token not in nlp.stop_words)
+
+    def _cached_lemmatizer(self, nlp):
+        with self._lock:
+            if self._lemmatize is None:
+                self._lemmatize = functools.lru_cache(maxsize=self.lemma_cache_size)(nlp.lemmatize)
+        return self._lemmatize
+
+    def clear(self):
+        self.query_tokens.cache_clear()
+        if self._lemmatize is not None:
+            self._lemmatize.cache_clear()
+
+    def stats(self):
+        """Hit/miss counts and sizes of the query and lemma caches"""
+        stats = {"query_cache": _cache_stats(self.query_tokens)}
+        if self._lemmatize is not None:
+            stats["lemma_cache"] = _cache_stats(self._lemmatize)
+        return stats
+
+
+def _cache_stats(cached):
+    info = cached.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0,
+    }